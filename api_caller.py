@@ -1,8 +1,14 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import logging
-import json
-from urllib.parse import urlencode
+import orjson
 import os
+import concurrent.futures # 페이지 병렬 조회를 위해 추가
+from file_cache import make_cache_key, load_json, save_json
+
+logger = logging.getLogger(__name__)
 
 # API 엔드포인트 기본 URL
 PROPERTY_LIST_API_URL = "https://api.peterpanz.com/houses/area"
@@ -10,6 +16,7 @@ PROPERTY_LIST_API_URL = "https://api.peterpanz.com/houses/area"
 # 요청 헤더 설정 (CURL과 일치하도록 수정)
 HEADERS = {
     'accept': 'application/json, text/plain, */*',
+    'accept-encoding': ACCEPT_ENCODING,  # urllib3가 해제할 수 있는 압축 방식만 요청 (brotli 설치 시 br 포함)
     'accept-language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
     'content-type': 'application/json;charset=utf-8',
     'origin': 'https://www.peterpanz.com',
@@ -25,6 +32,43 @@ HEADERS = {
     'x-peterpanz-version': '3.52.0'
 }
 
+# 목록 조회 기본 파라미터 (CURL 명령어 형식, 페이지 관련 값만 호출마다 바뀜)
+_BASE_PARAMS = {
+    'zoomLevel': 12,
+    'center': orjson.dumps({
+        'y': 37.566628,
+        '_lat': 37.566628,
+        'x': 126.978038,
+        '_lng': 126.978038
+    }).decode(),  # orjson은 공백 없는 compact JSON을 생성
+    'dong': '',
+    'gungu': '',
+    'filter': 'latitude:37.4495189~37.6835533||longitude:126.8736678~127.2746689||checkDeposit:100000000~200000000||roomCount_etc;["2층~5층","6층~9층","10층 이상"]||contractType;["전세"]||additional_options;["전세자금대출"]||buildingType;["원/투룸"]',
+    'pageSize': 20,
+    'pageIndex': 1,
+    'order_id': os.getenv('PETERPANZ_ORDER_ID', 'your_order_id_here'),  # 환경변수로 변경
+    'search': '',
+    'filter_version': '5.1',
+    'response_version': '5.2',
+    'order_by': 'random'
+}
+
+# 페이지 조회 간 TCP/TLS 연결을 재사용하기 위한 세션 (keep-alive + 커넥션 풀)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# 여러 페이지를 동시에 조회할 때 최대 작업자 수 (세션 커넥션 풀 크기 이하로 유지)
+MAX_WORKERS_PAGE_FETCH = 8
+
+# 페이지 응답 캐시 설정 (디렉토리를 지정한 경우에만 사용, 재실행 시 이미 받은 페이지 요청 생략)
+PAGE_CACHE_DIR = os.getenv('PETERPANZ_PAGE_CACHE_DIR')
+PAGE_CACHE_TTL_SEC = float(os.getenv('PETERPANZ_PAGE_CACHE_TTL_SEC', 6 * 60 * 60))
+
 def fetch_property_list(page_index=1, page_size=20):
     """
     피터팬 API에서 지정된 조건에 맞는 매물 목록을 가져옵니다.
@@ -36,79 +80,108 @@ def fetch_property_list(page_index=1, page_size=20):
     Returns:
         dict: 요청 성공 시 API 응답 데이터, 실패 시 오류 정보
     """
-    # CURL 명령어 형식의 파라미터로 수정
-    params = {
-        'zoomLevel': 12,
-        'center': json.dumps({
-            'y': 37.566628,
-            '_lat': 37.566628,
-            'x': 126.978038,
-            '_lng': 126.978038
-        }).replace(' ', ''),
-        'dong': '',
-        'gungu': '',
-        'filter': 'latitude:37.4495189~37.6835533||longitude:126.8736678~127.2746689||checkDeposit:100000000~200000000||roomCount_etc;["2층~5층","6층~9층","10층 이상"]||contractType;["전세"]||additional_options;["전세자금대출"]||buildingType;["원/투룸"]',
-        'pageSize': page_size,
-        'pageIndex': page_index,
-        'order_id': os.getenv('PETERPANZ_ORDER_ID', 'your_order_id_here'),  # 환경변수로 변경
-        'search': '',
-        'filter_version': '5.1',
-        'response_version': '5.2',
-        'order_by': 'random'
-    }
+    # 페이지 관련 값만 바꿔서 요청 파라미터 구성
+    params = {**_BASE_PARAMS, 'pageSize': page_size, 'pageIndex': page_index}
+    
+    # 같은 필터+페이지 조합을 이미 받아둔 경우 캐시된 응답 사용
+    cache_key = make_cache_key(PROPERTY_LIST_API_URL, params) if PAGE_CACHE_DIR else None
+    if cache_key:
+        cached_data = load_json(PAGE_CACHE_DIR, cache_key, max_age_sec=PAGE_CACHE_TTL_SEC)
+        if cached_data is not None:
+            logger.info("피터팬 API 캐시 사용: pageIndex=%s, pageSize=%s", page_index, page_size)
+            return cached_data
     
-    logging.info(f"피터팬 API 요청: pageIndex={page_index}, pageSize={page_size}")
+    logger.info("피터팬 API 요청: pageIndex=%s, pageSize=%s", page_index, page_size)
     
     try:
-        # GET 방식으로 API 요청 (POST에서 GET으로 변경)
-        full_url = f"{PROPERTY_LIST_API_URL}?{urlencode(params)}"
-        logging.info(f"요청 URL: {full_url[:100]}...")  # URL이 너무 길면 일부만 로깅
-        
-        response = requests.get(
-            full_url,
-            headers=HEADERS,
+        # GET 방식으로 API 요청 (쿼리 문자열 인코딩은 requests에 위임)
+        response = SESSION.get(
+            PROPERTY_LIST_API_URL,
+            params=params,
             timeout=30
         )
+        logger.info("요청 URL: %.100s...", response.url)  # URL이 너무 길면 일부만 로깅
+        logger.debug("응답 압축 방식: %s", response.headers.get('content-encoding', 'none'))
         response.raise_for_status()  # HTTP 오류 발생 시 예외 발생
         
-        # 응답 JSON 파싱
-        response_data = response.json()
+        # 응답 JSON 파싱 (압축 해제된 바이트를 그대로 orjson으로 파싱)
+        response_data = orjson.loads(response.content)
         
         # 데이터 존재 여부 확인
         houses_data = response_data.get('houses', {})
         
+        # 응답 구조/매물 개수 로그는 INFO 레벨이 켜져 있을 때만 계산
+        log_info = logger.isEnabledFor(logging.INFO)
+        
         # API 응답 구조 확인 (최상위 레벨)
-        logging.info(f"API 응답 최상위 키: {', '.join(response_data.keys())}")
+        if log_info:
+            logger.info("API 응답 최상위 키: %s", ', '.join(response_data.keys()))
         
         # 'houses' 내 카테고리 확인
         if houses_data:
-            houses_categories = houses_data.keys()
-            logging.info(f"houses 카테고리: {', '.join(houses_categories)}")
-            
-            # 매물 개수 확인
-            houses_count = 0
-            for category in houses_categories:
-                if category in houses_data and 'image' in houses_data[category]:
-                    houses_count += len(houses_data[category]['image'])
+            if log_info:
+                logger.info("houses 카테고리: %s", ', '.join(houses_data.keys()))
+                logger.info("API 응답 성공: 총 %d개 매물 데이터 수신", len(extract_properties(response_data)))
             
-            logging.info(f"API 응답 성공: 총 {houses_count}개 매물 데이터 수신")
+            if cache_key:
+                save_json(PAGE_CACHE_DIR, cache_key, response_data)
         else:
-            logging.warning("API 응답에 houses 데이터가 없습니다.")
+            logger.warning("API 응답에 houses 데이터가 없습니다.")
         
         return response_data
     
     except requests.exceptions.RequestException as e:
-        logging.error(f"API 요청 중 오류 발생: {e}")
+        logger.error("API 요청 중 오류 발생: %s", e)
         return {"error": str(e)}
     
-    except json.JSONDecodeError as e:
-        logging.error(f"API 응답 JSON 파싱 오류: {e}")
+    except orjson.JSONDecodeError as e:
+        logger.error("API 응답 JSON 파싱 오류: %s", e)
         return {"error": f"API 응답 JSON 파싱 오류: {e}"}
     
     except Exception as e:
-        logging.error(f"API 호출 중 예기치 않은 오류: {e}")
+        logger.error("API 호출 중 예기치 않은 오류: %s", e)
         return {"error": f"API 호출 중 예기치 않은 오류: {e}"}
 
+def extract_properties(response_data):
+    """
+    API 응답에서 매물 목록(houses 카테고리별 'image' 리스트)만 꺼내 하나의 리스트로 합칩니다.
+    
+    Args:
+        response_data (dict): fetch_property_list의 응답 데이터
+    
+    Returns:
+        list: 매물 딕셔너리 리스트 (매물이 없거나 오류 응답이면 빈 리스트)
+    """
+    houses_data = response_data.get('houses')
+    if not isinstance(houses_data, dict):
+        return []
+    
+    properties = []
+    for category_data in houses_data.values():
+        if isinstance(category_data, dict) and 'image' in category_data:
+            properties.extend(category_data['image'])
+    return properties
+
+def fetch_property_pages(page_indices, page_size=20, max_workers=MAX_WORKERS_PAGE_FETCH):
+    """
+    여러 페이지의 매물 목록을 동시에 조회합니다.
+    
+    Args:
+        page_indices (iterable): 조회할 페이지 번호 목록
+        page_size (int): 페이지당 조회할 매물 수 (기본값: 20)
+        max_workers (int): 동시에 요청할 최대 스레드 수
+    
+    Returns:
+        list: (페이지 번호, API 응답 데이터) 튜플 리스트 (요청한 페이지 순서 유지)
+    """
+    page_indices = list(page_indices)
+    if not page_indices:
+        return []
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(page_indices))) as executor:
+        responses = executor.map(lambda page: fetch_property_list(page_index=page, page_size=page_size), page_indices)
+        return list(zip(page_indices, responses))
+
 if __name__ == "__main__":
     # 테스트용 코드
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,209 @@
+"""
+파일 기반 JSON 캐시 유틸리티
+
+API 응답처럼 같은 입력에 대해 같은 결과를 돌려주는 데이터를 디스크에 저장해 두고,
+재실행 시 네트워크 요청 없이 바로 재사용하기 위한 간단한 캐시입니다.
+항목이 많고 자주 쓰이는 캐시는 키마다 파일을 만드는 대신 SQLite 파일 하나(SqliteCache)에 모아 저장합니다.
+"""
+
+import os
+import time
+import threading
+import hashlib
+import logging
+import sqlite3
+import orjson
+
+def make_cache_key(*parts):
+    """
+    캐시 키를 생성합니다. 딕셔너리는 키 순서와 관계없이 같은 키가 나오도록 정렬해서 직렬화합니다.
+
+    Args:
+        *parts: 캐시 키를 구성하는 JSON 직렬화 가능한 값들
+
+    Returns:
+        str: SHA-256 해시 문자열
+    """
+    return hashlib.sha256(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _cache_path(cache_dir, key, ext='json'):
+    return os.path.join(cache_dir, f"{key}.{ext}")
+
+def _read_cache_file(path, max_age_sec=None):
+    """캐시 파일의 내용을 바이트로 읽어옵니다. 파일이 없거나 만료/읽기 실패 시 None."""
+    try:
+        if max_age_sec is not None and time.time() - os.path.getmtime(path) > max_age_sec:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logging.warning(f"캐시 파일 읽기 실패 ({path}): {e}")
+        return None
+
+def _write_cache_file(cache_dir, path, content):
+    """바이트를 캐시 파일에 저장합니다. 임시 파일에 쓴 뒤 교체하므로 동시에 읽어도 깨진 파일이 보이지 않습니다."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logging.warning(f"캐시 파일 저장 실패 ({path}): {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+def load_json(cache_dir, key, max_age_sec=None):
+    """
+    캐시 파일에서 데이터를 읽어옵니다.
+
+    Args:
+        cache_dir (str): 캐시 디렉토리
+        key (str): make_cache_key로 만든 캐시 키
+        max_age_sec (float, optional): 이 시간(초)보다 오래된 캐시는 무시
+
+    Returns:
+        캐시된 데이터, 캐시가 없거나 만료/손상된 경우 None
+    """
+    path = _cache_path(cache_dir, key)
+    content = _read_cache_file(path, max_age_sec)
+    if content is None:
+        return None
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError as e:
+        logging.warning(f"캐시 파일 읽기 실패 ({path}): {e}")
+        return None
+
+def save_json(cache_dir, key, data):
+    """
+    데이터를 캐시 파일에 저장합니다. 임시 파일에 쓴 뒤 교체하므로 동시에 읽어도 깨진 파일이 보이지 않습니다.
+
+    Args:
+        cache_dir (str): 캐시 디렉토리
+        key (str): make_cache_key로 만든 캐시 키
+        data: JSON 직렬화 가능한 데이터
+
+    Returns:
+        bool: 저장 성공 여부
+    """
+    path = _cache_path(cache_dir, key)
+    try:
+        content = orjson.dumps(data)
+    except TypeError as e:
+        logging.warning(f"캐시 파일 저장 실패 ({path}): {e}")
+        return False
+    return _write_cache_file(cache_dir, path, content)
+
+def load_bytes(cache_dir, key, max_age_sec=None, ext='bin'):
+    """
+    캐시 파일에서 원문 바이트(HTML 페이지 등)를 그대로 읽어옵니다.
+
+    Args:
+        cache_dir (str): 캐시 디렉토리
+        key (str): make_cache_key로 만든 캐시 키
+        max_age_sec (float, optional): 이 시간(초)보다 오래된 캐시는 무시
+        ext (str): 캐시 파일 확장자
+
+    Returns:
+        bytes: 캐시된 바이트, 캐시가 없거나 만료된 경우 None
+    """
+    return _read_cache_file(_cache_path(cache_dir, key, ext), max_age_sec)
+
+def save_bytes(cache_dir, key, content, ext='bin'):
+    """
+    원문 바이트를 캐시 파일에 그대로 저장합니다.
+
+    Args:
+        cache_dir (str): 캐시 디렉토리
+        key (str): make_cache_key로 만든 캐시 키
+        content (bytes): 저장할 바이트
+        ext (str): 캐시 파일 확장자
+
+    Returns:
+        bool: 저장 성공 여부
+    """
+    return _write_cache_file(cache_dir, _cache_path(cache_dir, key, ext), content)
+
+class SqliteCache:
+    """
+    SQLite 파일 하나에 JSON 값을 저장하는 키-값 캐시입니다.
+
+    WAL 모드로 열어 읽기와 쓰기가 서로 막지 않고, 여러 항목을 한 트랜잭션으로 저장하므로
+    항목마다 파일을 만드는 load_json/save_json보다 항목이 많을 때 훨씬 빠릅니다.
+    연결 하나를 잠금으로 보호해 여러 스레드에서 함께 사용할 수 있습니다.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): SQLite 데이터베이스 파일 경로 (상위 디렉토리가 없으면 생성)
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache(k TEXT PRIMARY KEY, v BLOB)')
+
+    def get_many(self, keys):
+        """
+        여러 키의 값을 한 번에 읽어옵니다.
+
+        Args:
+            keys (list): make_cache_key로 만든 캐시 키들
+
+        Returns:
+            dict: {키: 캐시된 데이터} (캐시가 없거나 손상된 키는 제외)
+        """
+        keys = list(dict.fromkeys(key for key in keys if key))
+        if not keys:
+            return {}
+        results = {}
+        try:
+            with self._lock:
+                # SQLite 바인딩 변수 개수 제한을 넘지 않도록 나눠서 조회
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT k, v FROM cache WHERE k IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, value in rows:
+                        try:
+                            results[key] = orjson.loads(value)
+                        except orjson.JSONDecodeError as e:
+                            logging.warning(f"캐시 항목 읽기 실패 ({self.db_path}, {key}): {e}")
+        except sqlite3.Error as e:
+            logging.warning(f"캐시 DB 조회 실패 ({self.db_path}): {e}")
+        return results
+
+    def put_many(self, items):
+        """
+        여러 항목을 한 트랜잭션으로 저장합니다. 이미 있는 키는 덮어씁니다.
+
+        Args:
+            items (dict): {키: JSON 직렬화 가능한 데이터}
+
+        Returns:
+            bool: 저장 성공 여부
+        """
+        if not items:
+            return True
+        try:
+            rows = [(key, orjson.dumps(data)) for key, data in items.items()]
+            with self._lock:
+                with self._conn:
+                    self._conn.execute('BEGIN')
+                    self._conn.executemany('INSERT OR REPLACE INTO cache(k, v) VALUES (?, ?)', rows)
+            return True
+        except (sqlite3.Error, TypeError) as e:
+            logging.warning(f"캐시 DB 저장 실패 ({self.db_path}): {e}")
+            return False
@@ -1,12 +1,20 @@
 import logging
-import json # JSON 파싱을 위해 추가
-import requests # geopy 거리 계산 실패 시 대체 경로 등에 사용될 수 있으므로 유지
-from geopy.distance import geodesic
-import time # RateLimit 대비용
+import os
+import orjson # JSON 파싱을 위해 추가 (표준 json보다 빠름)
+from geographiclib.geodesic import Geodesic
 import random # 무작위 지연을 위해 추가
 import re # JSON 추출을 위해 추가
+import concurrent.futures # 여러 매물 동시 분석을 위해 추가
+import datetime # 사전 평가에서 건물 연식 계산을 위해 추가
+import functools # 클라이언트 캐시를 위해 추가
 from google import genai
 from google.genai import types
+from google.genai import errors as genai_errors
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from tenacity import Retrying, stop_after_attempt, wait_exponential_jitter, retry_if_exception
+from rate_limiter import RateLimiter
+from file_cache import make_cache_key, load_json, save_json
+from json_stream import JsonStreamScanner
 
 # 사용할 Gemini 모델명
 GEMINI_MODEL = "gemini-2.5-flash-preview-05-20"
@@ -18,8 +26,169 @@ GWANGHWAMUN_TRANSIT_TIME_MINUTES = 60
 API_MAX_CALLS_PER_MINUTE = 200  # 분당 최대 API 호출 수를 200개로 증가
 API_MIN_DELAY_SECONDS = 0.3  # 연속 API 호출 사이 최소 지연 시간을 0.3초로 단축
 
-# 마지막 API 호출 시간을 추적하기 위한 전역 변수
-last_api_call_time = 0
+# WGS84 타원체 측지선 계산기 (광화문 거리 계산용)
+_GEOD = Geodesic.WGS84
+
+class AnalysisFailed(Exception):
+    """Gemini 매물 분석 실패. 대체 점수를 만들지 않고 호출자가 처리 방식을 결정합니다."""
+    def __init__(self, message, raw_response=None):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+def mark_analysis_failed(property_data, error):
+    """분석 실패 정보를 매물 데이터에 기록합니다 (점수 필드는 추가하지 않음)."""
+    property_data['ai_analysis_error'] = str(error)
+    if error.raw_response:
+        property_data['ai_analysis_raw_response'] = error.raw_response
+    return property_data
+
+# 분석 결과 디스크 캐시 디렉토리 (같은 프롬프트는 재실행 시 API 호출 없이 재사용, 빈 값이면 사용 안 함)
+ANALYSIS_CACHE_DIR = os.getenv('GEMINI_ANALYSIS_CACHE_DIR', '.gemini_cache')
+
+# 휴리스틱 사전 평가 사용 여부 (점수가 명확한 매물은 Gemini 호출 없이 규칙 기반 점수 사용, 기본 비활성)
+TRIAGE_ENABLED = os.getenv('GEMINI_TRIAGE_ENABLED', '').lower() in ('1', 'true', 'yes')
+# 사전 평가 총점이 50점 ± 이 값 안이면 애매한 매물로 보고 Gemini로 분석
+TRIAGE_AMBIGUOUS_MARGIN = 15
+
+# 여러 매물을 동시에 분석할 때 최대 동시 요청 수
+MAX_CONCURRENT_ANALYSES = 25
+
+# 매물 분석 응답 스키마 (Gemini structured output으로 이 형식의 JSON을 바로 받음)
+class LocationAccessibility(BaseModel):
+    gwanghwamun_score: int
+    gwanghwamun_comment: str
+    amenities_score: int
+    amenities_comment: str
+    transportation_score: int
+    transportation_comment: str
+    location_total: int
+
+class BuildingQuality(BaseModel):
+    condition_score: int
+    condition_comment: str
+    space_score: int
+    space_comment: str
+    floor_score: int
+    floor_comment: str
+    building_total: int
+
+class LivingConvenience(BaseModel):
+    appliances_score: int
+    appliances_comment: str
+    furniture_score: int
+    furniture_comment: str
+    convenience_total: int
+
+class PriceValue(BaseModel):
+    market_score: int
+    market_comment: str
+    extra_cost_score: int
+    extra_cost_comment: str
+    price_total: int
+
+class Credibility(BaseModel):
+    fake_possibility: str  # 낮음/보통/높음 중 하나
+    credibility_comment: str
+
+class AnalysisSummary(BaseModel):
+    pros: list[str]
+    cons: list[str]
+    recommendation: str
+
+class PropertyAnalysis(BaseModel):
+    total_score: int
+    location_accessibility: LocationAccessibility
+    building_quality: BuildingQuality
+    living_convenience: LivingConvenience
+    price_value: PriceValue
+    credibility: Credibility
+    summary: AnalysisSummary
+
+class BatchPropertyAnalysis(PropertyAnalysis):
+    hidx: str  # 일괄 분석 응답 항목을 입력 매물과 짝짓기 위한 매물 ID
+
+_BATCH_ANALYSIS_ADAPTER = TypeAdapter(list[BatchPropertyAnalysis])
+
+# 정수로 변환해야 하는 점수 키 (스키마에서 int로 선언된 필드)
+_INT_KEYS = frozenset(
+    name
+    for model in (PropertyAnalysis, LocationAccessibility, BuildingQuality, LivingConvenience, PriceValue)
+    for name, field in model.model_fields.items()
+    if field.annotation is int
+)
+
+# 매물 분석 응답 토큰 한도 (스키마상 응답 크기가 제한되므로 최악의 경우가 아닌 실측 기준으로 설정)
+# max_output_tokens에는 사고(thinking) 토큰도 포함되므로 매물당 응답 상한(약 1500) + THINKING_BUDGET으로 잡음
+# 실제 사용량은 DEBUG 로그의 토큰 사용량으로 확인
+THINKING_BUDGET = 512
+RESPONSE_TOKENS_PER_PROPERTY = 1536
+MAX_OUTPUT_TOKENS = RESPONSE_TOKENS_PER_PROPERTY + THINKING_BUDGET
+
+# 여러 매물을 한 요청으로 분석할 때 요청당 최대 매물 수와 매물 정보 블록의 총 길이(문자 수) 상한
+ANALYSIS_BATCH_SIZE = 8
+MAX_BATCH_PROMPT_CHARS = 40000
+
+# 매물 분석 요청 공통 설정 (호출마다 새로 만들지 않도록 모듈 로드 시 한 번만 생성)
+SYSTEM_INSTRUCTION = "당신은 한국의 부동산 시장에 정통한 전문가입니다. 제공된 매물 정보를 객관적으로 분석하고 점수를 매깁니다."
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_INSTRUCTION,
+    response_mime_type="application/json",
+    response_schema=PropertyAnalysis,
+    temperature=0.1,
+    max_output_tokens=MAX_OUTPUT_TOKENS,
+    thinking_config=types.ThinkingConfig(thinking_budget=THINKING_BUDGET)
+)
+
+@functools.lru_cache(maxsize=4)
+def get_gemini_client(api_key):
+    """API 키별 Gemini 클라이언트를 한 번만 생성해 재사용합니다 (커넥션 재사용)."""
+    return genai.Client(api_key=api_key)
+
+# 응답 텍스트에서 ```json ... ``` 블록을 찾기 위한 정규식
+_JSON_FENCE_RE = re.compile(r"```json\s*([\s\S]*?)\s*```")
+
+# JSON 자동 수정용 정규식 (후행 쉼표, 작은따옴표 값)
+_TRAILING_COMMA_OBJ_RE = re.compile(r',\s*}')
+_TRAILING_COMMA_ARR_RE = re.compile(r',\s*]')
+_SINGLE_QUOTED_VALUE_RE = re.compile(r':\s*\'([^\']*?)\'')
+
+# 재시도할 서버 오류 HTTP 상태 코드 (그 외 5xx는 일시적인 오류가 아니라고 보고 바로 실패 처리)
+_RETRYABLE_SERVER_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+# 429 오류 메시지에서 retryDelay 값을 추출하기 위한 정규식
+_RETRY_DELAY_RE = re.compile(r"retryDelay': '(\d+)s'")
+
+# API 호출 재시도 설정 (할당량 초과 시에는 retryDelay 또는 기본 지연만큼 공유 쿨다운)
+MAX_API_RETRIES = 5
+DEFAULT_QUOTA_RETRY_DELAY_SEC = 30
+_BACKOFF_WAIT = wait_exponential_jitter(initial=5, max=120, jitter=5)
+
+# 관리비 정보가 없음을 나타내는 키워드
+_MISSING_KW_RE = re.compile("확인 불가|정보 없음|미제공")
+
+# 사전 평가용 키워드/정규식 (설명에 의심 키워드가 있으면 사전 평가를 건너뛰고 Gemini로 분석)
+_TRIAGE_RED_FLAG_RE = re.compile(r"급매|특가|파격|무조건|허위|미끼|선착순|전화\s*문의")
+_TRIAGE_APPLIANCES = ('냉장고', '세탁기', '에어컨', '인덕션', '가스레인지', '전자레인지')
+_TRIAGE_FURNITURE = ('옷장', '신발장', '침대', '책상', '붙박이장', '식탁')
+_YEAR_RE = re.compile(r"(?:19|20)\d{2}")
+_FLOOR_NUMBER_RE = re.compile(r"-?\d+")
+_TRIAGE_NOTE = "휴리스틱 사전 평가 (Gemini 분석 생략)"
+
+# 프롬프트 구성에 쓰는 매물 필드별 후보 경로 (앞에서부터 처음으로 값이 있는 경로 사용)
+_FIELD_PATHS = {
+    'address': [('location', 'address', 'text'), ('location_text',), ('address',), ('addr',)],
+    'description': [('parsed_description',), ('info', 'subject'), ('description',)],
+    'deposit': [('price', 'deposit'), ('info', 'deposit')],
+    'maintenance_cost': [('price', 'maintenance_cost'), ('price', 'monthly_rent')],
+    'building_type': [('type', 'building_type')],
+    'room_count': [('info', 'room_count')],
+    'supplied_size': [('info', 'supplied_size'), ('size', 'supplied_size')],
+    'real_size': [('info', 'real_size'), ('size', 'real_size')],
+    'user_type': [('parsed_user_type',), ('attribute', 'userType')],
+}
+
+# 모든 분석 스레드가 공유하는 API 호출 속도 제한기
+_RATE_LIMITER = RateLimiter(API_MAX_CALLS_PER_MINUTE, API_MIN_DELAY_SECONDS)
 
 # JSON 파싱 오류 수정 기능 추가
 def fix_json_string(json_str):
@@ -28,16 +197,13 @@ def fix_json_string(json_str):
         return json_str
     
     # 1. 후행 쉼표 제거 (객체 및 배열)
-    fixed_json = re.sub(r',\s*}', '}', json_str)
-    fixed_json = re.sub(r',\s*]', ']', fixed_json)
-    
-    # 2. 속성 이름 쌍따옴표 확인 - 작은따옴표를 큰따옴표로
-    fixed_json = re.sub(r'(\w+):\s*', r'"\1": ', fixed_json) 
+    fixed_json = _TRAILING_COMMA_OBJ_RE.sub('}', json_str)
+    fixed_json = _TRAILING_COMMA_ARR_RE.sub(']', fixed_json)
     
-    # 3. 작은따옴표로 묶인 문자열을 큰따옴표로 변환
+    # 2. 작은따옴표로 묶인 문자열을 큰따옴표로 변환
     # (단, 큰따옴표 내부의 작은따옴표는 보존해야 하므로 복잡한 처리 필요)
     # 간단한 접근법으로 시작 - 모든 값부분만 조정
-    fixed_json = re.sub(r':\s*\'([^\']*?)\'', r': "\1"', fixed_json)
+    fixed_json = _SINGLE_QUOTED_VALUE_RE.sub(r': "\1"', fixed_json)
     
     return fixed_json
 
@@ -46,23 +212,27 @@ def extract_and_parse_json(response_text, hidx=None):
     if not response_text:
         return None
     
-    # 1. JSON 블록 추출
-    json_match = re.search(r"```json\s*([\s\S]*?)\s*```", response_text)
-    if not json_match:
-        logging.error(f"JSON 블록을 찾을 수 없습니다 (hidx={hidx}).")
-        return None
+    # 1. JSON 블록 추출 (```json 블록이 없으면 첫 '{'부터 마지막 '}'까지 사용)
+    json_match = _JSON_FENCE_RE.search(response_text)
+    if json_match:
+        json_str = json_match.group(1).strip()
+    else:
+        start = response_text.find('{')
+        end = response_text.rfind('}')
+        if start == -1 or end < start:
+            logging.error(f"JSON 블록을 찾을 수 없습니다 (hidx={hidx}).")
+            return None
+        json_str = response_text[start:end + 1]
     
-    json_str = json_match.group(1).strip()
     if not json_str:
         logging.error(f"추출된 JSON 문자열이 비어있습니다 (hidx={hidx}).")
         return None
     
     # 2. 기본 JSON 파싱 시도
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError as e:
         logging.warning(f"JSON 파싱 오류 발생 (hidx={hidx}): {e}. 자동 수정 시도 중...")
-        error_msg = str(e)
         
         # 3. 오류 수정 시도
         fixed_json = fix_json_string(json_str)
@@ -70,24 +240,50 @@ def extract_and_parse_json(response_text, hidx=None):
             logging.info(f"JSON 문자열을 수정했습니다 (hidx={hidx}).")
             
             try:
-                return json.loads(fixed_json)
-            except json.JSONDecodeError as fix_e:
+                return orjson.loads(fixed_json)
+            except orjson.JSONDecodeError as fix_e:
                 logging.error(f"수정된 JSON도 파싱 실패 (hidx={hidx}): {fix_e}")
                 
                 # 4. 디버그를 위한 로깅 
                 logging.debug(f"원본 JSON (hidx={hidx}):\n{json_str}\n")
                 logging.debug(f"수정된 JSON (hidx={hidx}):\n{fixed_json}\n")
-                
-                # 5. 마지막 시도: 아주 단순하게 후행 쉼표만 제거 
-                if "Trailing comma" in str(fix_e) or "trailing comma" in str(fix_e):
-                    very_simple_fix = json_str.replace(",}", "}").replace(",\n}", "\n}")
-                    try:
-                        return json.loads(very_simple_fix)
-                    except:
-                        pass
         
         return None
 
+def _stream_response_text(client, prompt, config=GENERATION_CONFIG):
+    """
+    generate_content_stream으로 응답을 받아 최상위 JSON 값이 닫히는 즉시 스트림을 끊고 텍스트를 반환합니다.
+    (JSON 뒤에 이어지는 불필요한 문장이나 비정상적으로 긴 응답을 기다리지 않음)
+    """
+    stream = client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=[
+            {"role": "user", "parts": [{"text": prompt}]},
+        ],
+        config=config
+    )
+    scanner = JsonStreamScanner()
+    pieces = []
+    usage = None
+    try:
+        for chunk in stream:
+            usage = chunk.usage_metadata or usage
+            text = chunk.text
+            if not text:
+                continue
+            scanner.feed(text)
+            if scanner.done:
+                pieces.append(text[:scanner.end_index + 1])
+                break
+            pieces.append(text)
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+    if usage:
+        logging.debug(f"Gemini 토큰 사용량: 응답 {usage.candidates_token_count}, 사고 {usage.thoughts_token_count}, 입력 {usage.prompt_token_count}")
+    return ''.join(pieces) or None
+
 def get_distance_to_gwanghwamun(lat, lon, gwanghwamun_coords):
     """주어진 위도, 경도와 광화문 좌표 사이의 직선 거리를 계산합니다."""
     if lat is None or lon is None:
@@ -109,103 +305,298 @@ def get_distance_to_gwanghwamun(lat, lon, gwanghwamun_coords):
             return None
     
     try:
-        property_coords = (lat, lon)
-        distance = geodesic(property_coords, gwanghwamun_coords).kilometers
+        ref_lat, ref_lon = gwanghwamun_coords
+        distance = _GEOD.Inverse(lat, lon, ref_lat, ref_lon, Geodesic.DISTANCE)['s12'] / 1000.0
         logging.info(f"광화문까지의 직선 거리: {distance:.2f} km (좌표: {lat}, {lon})")
         return distance
     except Exception as e:
         logging.error(f"거리 계산 중 오류 발생: {e}")
         return None
 
-def analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords):
+# 매물 분석 프롬프트 구성 요소 (매물 정보 자리에 값을 채워 사용, 응답 형식은 PropertyAnalysis 스키마로 지정)
+_PROPERTY_INFO_TEMPLATE = """- 주소: {address}
+- 설명: {description}
+- 가격: {price_info_str}
+- 사용승인일: {approval_date_val}
+- 건물 유형: {building_type_val}
+- 방/욕실 수: {room_count_val}개/{bathroom_count_val}개
+- 면적: {size_text_str}
+- 층수: {floor_info_str}
+- 옵션: {options_string_val}
+- 매물 등록인: {agent_name_val} ({agent_office_val}) ({user_type_display})
+{distance_line}
+"""
+
+_ANALYSIS_GUIDE = """## 분석 항목 (총 100점 만점)
+
+1. 위치 및 접근성 (40점 만점)
+   a. 광화문 접근성 (15점): 광화문까지의 직선거리 및 대중교통 이용 편의성
+   b. 주변 편의시설 (15점): 마트, 병원, 공원, 상가 등 생활편의시설 접근성
+   c. 교통 편의성 (10점): 지하철역, 버스정류장 접근성, 교통 연결성
+
+2. 건물 및 시설 품질 (30점 만점)
+   a. 건물 상태 및 연식 (15점): 사용승인일, 리모델링 여부, 건물 관리상태
+   b. 공간 효율성 (10점): 구조, 면적 대비 활용도, 수납공간
+   c. 층수 및 향 (5점): 저층/고층 여부, 일조량, 조망권
+
+3. 옵션 및 생활 편의성 (15점 만점)
+   a. 가전제품 (8점): 냉장고, 세탁기, 에어컨 등 필수 가전 보유 여부
+   b. 가구 및 시설 (7점): 붙박이장, 신발장, 인테리어 품질
+
+4. 가격 경쟁력 (15점 만점)
+   a. 동일 지역 시세 대비 가격 (10점): 주변 유사 매물 대비 가격 경쟁력
+   b. 관리비 및 추가비용 (5점): 관리비, 주차비 등 추가 비용 요소
+      ※ 중요: 관리비 정보가 "확인 불가", "정보 없음" 또는 누락된 경우, 이는 투명성 부족으로 간주하여 점수를 낮게 부여하세요 (1-2점).
+      관리비가 명확히 제시된 경우에만 적정 점수(3-5점)를 부여하세요.
+
+## 추가 분석
+1. 매물 신뢰도 평가
+   - 허위매물 가능성: 낮음/보통/높음 중 하나를 선택하고 그 이유 설명
+   - 매물 정보의 일관성, 상세함, 사진 제공 여부
+   - 중개사/판매자 정보의 투명성
+
+2. 종합 의견
+   - 장점 요약 (3가지 이상)
+   - 단점 요약 (2가지 이상)
+   - 추천 대상 (어떤 사람에게 적합한지)
+
+## 응답 형식
+응답은 지정된 JSON 스키마에 맞춰 제공해주세요. 각 *_comment 항목에는 해당 점수의 평가 근거를, credibility.fake_possibility에는 낮음/보통/높음 중 하나를 작성해주세요.
+각 점수는 반드시 배점 범위 내에서 정수로 부여해주세요. 각 카테고리의 총합은 하위 항목들의 합과 일치해야 합니다.
+total_score는 모든 카테고리 점수의 합으로, 100점 만점입니다.
+"""
+
+# 단일 매물 분석 프롬프트 템플릿
+_PROMPT_TEMPLATE = """
+당신은 부동산 전문가입니다. 아래 제공된 매물 정보를 바탕으로 상세 분석을 수행하고, 점수를 매겨주세요. 
+총 100점 만점 기준으로 각 카테고리별 점수와 근거를 구체적으로 설명해주세요.
+
+## 매물 기본 정보
+""" + _PROPERTY_INFO_TEMPLATE + _ANALYSIS_GUIDE
+
+# 여러 매물 일괄 분석 프롬프트 (매물별 정보 블록 뒤에 공통 분석 기준과 배열 응답 안내를 붙임)
+_BATCH_PROMPT_INTRO = """
+당신은 부동산 전문가입니다. 아래 제공된 {count}개 매물을 각각 독립적으로 분석하고, 점수를 매겨주세요. 
+매물마다 총 100점 만점 기준으로 각 카테고리별 점수와 근거를 구체적으로 설명해주세요.
+
+"""
+_BATCH_PROPERTY_HEADER = "## 매물 {index} (hidx: {hidx})\n"
+_BATCH_RESPONSE_NOTE = """
+응답은 매물마다 하나씩, 위에 나열된 순서대로 JSON 배열로 제공해주세요. 각 항목의 hidx에는 해당 매물의 hidx를 그대로 적어주세요.
+"""
+
+def _convert_scores_to_int(value_dict):
+    """_INT_KEYS에 해당하는 문자열 점수를 정수로 변환합니다 (카테고리 딕셔너리는 재귀적으로 처리)."""
+    for key, value in value_dict.items():
+        if isinstance(value, dict):
+            _convert_scores_to_int(value)
+        elif key in _INT_KEYS and isinstance(value, str):
+            try:
+                value_dict[key] = int(value)
+            except ValueError:
+                logging.warning(f"점수 변환 실패 (정수 아님): {key}={value}")
+
+def _dig(data, path):
+    """중첩 딕셔너리에서 경로(키 튜플)를 따라 값을 꺼냅니다. 중간에 딕셔너리가 아니면 None."""
+    for key in path:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+def _first_value(data, field):
+    """_FIELD_PATHS의 후보 경로 중 처음으로 값이 있는 경로의 값을 반환합니다."""
+    for path in _FIELD_PATHS[field]:
+        value = _dig(data, path)
+        if value:
+            return value
+    return None
+
+def get_property_coordinates(property_data):
+    """매물 데이터에서 위도, 경도를 찾아 (lat, lon) 튜플로 반환합니다 (HTML 파싱 결과 우선)."""
+    lat = property_data.get('parsed_latitude')
+    lon = property_data.get('parsed_longitude')
+    if lat is None or lon is None:
+        location = property_data.get('location', {})
+        if location:
+            lat = location.get('latitude') or location.get('lat') or location.get('y') or (location.get('address', {}) or {}).get('latitude')
+            lon = location.get('longitude') or location.get('lon') or location.get('lng') or location.get('x') or (location.get('address', {}) or {}).get('longitude')
+    return lat, lon
+
+def _to_float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def _scale_score(value, worst, best, max_score):
+    """value가 worst이면 0점, best이면 max_score점이 되도록 선형 환산합니다 (범위 밖은 잘라냄)."""
+    ratio = (value - worst) / (best - worst)
+    return int(round(max_score * min(max(ratio, 0.0), 1.0)))
+
+def _triage_floor_score(floor_text):
+    """층 정보로 층수 점수(5점 만점)를 매깁니다. 반지하/지하/1층은 낮게, 2층 이상/고층은 높게 봅니다."""
+    floor_text = str(floor_text or '')
+    if '지하' in floor_text:
+        return 1
+    if '고층' in floor_text:
+        return 4
+    if '저층' in floor_text:
+        return 2
+    floor_match = _FLOOR_NUMBER_RE.search(floor_text)
+    if floor_match:
+        return 1 if int(floor_match.group(0)) <= 1 else 4
+    return 3
+
+def triage_property(property_data, distance_km):
     """
-    Google Gemini API를 사용하여 매물 데이터를 분석하고 점수를 매깁니다.
+    규칙 기반으로 매물 점수를 미리 계산합니다.
+    거리, 연식, 전용면적, 층, 옵션처럼 데이터로 정해지는 항목은 계산하고, 주변 편의시설/교통/시세처럼
+    판단이 필요한 항목은 배점의 중간값을 줍니다.
     
     Args:
-        property_data (dict): 매물의 기본 정보와 HTML 파싱 결과를 포함한 데이터
-        api_key (str): Google AI API 키
-        gwanghwamun_coords (tuple): 광화문의 위도, 경도 튜플 (예: (37.5759, 126.9780))
+        property_data (dict): 매물 데이터
+        distance_km (float): 광화문까지의 직선거리(km)
         
     Returns:
-        dict: 분석 결과와 기존 매물 정보를 병합한 데이터
+        dict: 총점이 명확한 구간(50 ± TRIAGE_AMBIGUOUS_MARGIN 밖)이면 PropertyAnalysis 형식의 결과,
+              애매하거나 정보가 부족하거나 설명에 의심 키워드가 있으면 None (Gemini로 분석해야 함)
     """
-    if not property_data:
-        logging.warning("분석할 매물 데이터가 없습니다.")
+    if distance_km is None:
         return None
     
-    if not api_key:
-        logging.error("Google AI API 키가 없습니다. GEMINI_API_KEY 환경변수를 확인하세요.")
-        property_data['ai_analysis_error'] = "Google AI API 키 없음"
-        return property_data 
+    description = _first_value(property_data, 'description') or ''
+    if _TRIAGE_RED_FLAG_RE.search(str(description)):
+        return None
     
-    hidx = property_data.get('hidx')
-    if not hidx:
-        logging.warning("매물 ID(hidx)가 없습니다.")
-        return property_data
+    approval_year = _YEAR_RE.search(str(property_data.get('parsed_approval_date') or ''))
+    real_size = _to_float_or_nan(_first_value(property_data, 'real_size'))
+    if not approval_year or real_size != real_size:
+        return None
+    building_age = datetime.date.today().year - int(approval_year.group(0))
     
-    logging.info(f"Gemini API 분석 시작: hidx={hidx} (모델: {GEMINI_MODEL})")
+    options_text = str(property_data.get('parsed_options_string') or '')
+    appliance_count = sum(1 for name in _TRIAGE_APPLIANCES if name in options_text)
+    furniture_count = sum(1 for name in _TRIAGE_FURNITURE if name in options_text)
     
-    try:
-        client = genai.Client(api_key=api_key)
-        
-        system_instruction = "당신은 한국의 부동산 시장에 정통한 전문가입니다. 제공된 매물 정보를 객관적으로 분석하고 점수를 매깁니다."
-        
-        generation_config = types.GenerateContentConfig(
-            temperature=0.1,
-            max_output_tokens=3000,
-            thinking_config=types.ThinkingConfig(thinking_budget=1024)
-        )
-    except Exception as e:
-        logging.error(f"Gemini API 클라이언트 초기화 중 오류 발생: {e}")
-        property_data['ai_analysis_error'] = f"Gemini API 클라이언트 초기화 실패: {e}"
-        return property_data
+    maintenance_cost = _first_value(property_data, 'maintenance_cost')
+    has_maintenance_info = isinstance(maintenance_cost, (int, float)) and maintenance_cost > 0
+    
+    location = {
+        'gwanghwamun_score': _scale_score(distance_km, 20.0, 3.0, 15),
+        'gwanghwamun_comment': f"{_TRIAGE_NOTE}: 광화문까지 직선거리 {distance_km:.1f}km",
+        'amenities_score': 8,
+        'amenities_comment': _TRIAGE_NOTE,
+        'transportation_score': 5,
+        'transportation_comment': _TRIAGE_NOTE,
+    }
+    location['location_total'] = location['gwanghwamun_score'] + 8 + 5
+    
+    building = {
+        'condition_score': _scale_score(building_age, 30, 3, 15),
+        'condition_comment': f"{_TRIAGE_NOTE}: 사용승인 후 약 {building_age}년",
+        'space_score': _scale_score(real_size, 12.0, 33.0, 10),
+        'space_comment': f"{_TRIAGE_NOTE}: 전용 {real_size:g}㎡",
+        'floor_score': _triage_floor_score(property_data.get('parsed_floor')),
+        'floor_comment': _TRIAGE_NOTE,
+    }
+    building['building_total'] = building['condition_score'] + building['space_score'] + building['floor_score']
+    
+    convenience = {
+        'appliances_score': _scale_score(appliance_count, 0, len(_TRIAGE_APPLIANCES), 8),
+        'appliances_comment': f"{_TRIAGE_NOTE}: 주요 가전 {appliance_count}개",
+        'furniture_score': _scale_score(furniture_count, 0, len(_TRIAGE_FURNITURE), 7),
+        'furniture_comment': f"{_TRIAGE_NOTE}: 주요 가구 {furniture_count}개",
+    }
+    convenience['convenience_total'] = convenience['appliances_score'] + convenience['furniture_score']
+    
+    price = {
+        'market_score': 5,
+        'market_comment': _TRIAGE_NOTE,
+        'extra_cost_score': 3 if has_maintenance_info else 1,
+        'extra_cost_comment': f"{_TRIAGE_NOTE}: 관리비 정보 {'있음' if has_maintenance_info else '없음'}",
+    }
+    price['price_total'] = price['market_score'] + price['extra_cost_score']
+    
+    total_score = location['location_total'] + building['building_total'] + convenience['convenience_total'] + price['price_total']
+    if abs(total_score - 50) < TRIAGE_AMBIGUOUS_MARGIN:
+        return None
+    
+    return PropertyAnalysis.model_validate({
+        'total_score': total_score,
+        'location_accessibility': location,
+        'building_quality': building,
+        'living_convenience': convenience,
+        'price_value': price,
+        'credibility': {'fake_possibility': '보통', 'credibility_comment': _TRIAGE_NOTE},
+        'summary': {'pros': [], 'cons': [], 'recommendation': _TRIAGE_NOTE},
+    }).model_dump()
+
+class _EmptyResponse(Exception):
+    """스트림이 끝났지만 응답 텍스트가 비어 있는 경우 (재시도 대상)"""
+
+def _is_quota_error(error):
+    return isinstance(error, genai_errors.ClientError) and error.code == 429
+
+def _is_retryable(error):
+    """
+    할당량 초과, 일시적인 서버/네트워크 오류, 빈 응답만 재시도합니다.
+    API 오류는 메시지 문자열이 아니라 HTTP 상태 코드(APIError.code)로 판단합니다.
+    """
+    if isinstance(error, (_EmptyResponse, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, genai_errors.ServerError):
+        return error.code in _RETRYABLE_SERVER_STATUS_CODES
+    return _is_quota_error(error)
 
-    lat = property_data.get('parsed_latitude')
-    lon = property_data.get('parsed_longitude')
-    if lat is None or lon is None:
-        location = property_data.get('location', {})
-        if location:
-            lat = location.get('latitude') or location.get('lat') or location.get('y') or (location.get('address', {}) or {}).get('latitude')
-            lon = location.get('longitude') or location.get('lon') or location.get('lng') or location.get('x') or (location.get('address', {}) or {}).get('longitude')
+def _wait_for_retry(retry_state):
+    """
+    재시도 전 대기 시간을 정합니다. 할당량 초과면 모든 작업자가 함께 쉬도록 공유 쿨다운을 걸고
+    (실제 대기는 다음 _RATE_LIMITER.acquire()에서 이루어짐), 그 외에는 지수 백오프를 적용합니다.
+    """
+    error = retry_state.outcome.exception()
+    if _is_quota_error(error):
+        retry_delay = DEFAULT_QUOTA_RETRY_DELAY_SEC
+        retry_delay_match = _RETRY_DELAY_RE.search(str(error))
+        if retry_delay_match:
+            retry_delay = int(retry_delay_match.group(1)) + random.randint(5, 10)  # 여유 있게 몇 초 더 기다림
+        logging.warning(f"할당량 제한에 도달했습니다. {retry_delay}초 후 재시도합니다.")
+        _RATE_LIMITER.cooldown(retry_delay)
+        return 0
+    return _BACKOFF_WAIT(retry_state)
+
+def _log_retry(retry_state):
+    logging.error(f"Gemini API 호출 중 오류 발생 (시도: {retry_state.attempt_number}): {retry_state.outcome.exception()}")
+
+# 매물 분석 API 호출 재시도 정책 (호출마다 copy()로 복제해서 사용)
+_API_RETRYING = Retrying(
+    stop=stop_after_attempt(MAX_API_RETRIES),
+    wait=_wait_for_retry,
+    retry=retry_if_exception(_is_retryable),
+    before_sleep=_log_retry,
+    reraise=True
+)
+
+def _build_prompt_fields(property_data, gwanghwamun_coords, distance_to_gwanghwamun=None):
+    """
+    매물 데이터에서 프롬프트의 매물 정보 자리에 채울 값들을 만듭니다.
+    일괄 분석(analyze_properties_with_gemini)에서 미리 계산한 거리가 있으면 distance_to_gwanghwamun으로 받아 재사용합니다.
+    """
+    if distance_to_gwanghwamun is None:
+        lat, lon = get_property_coordinates(property_data)
+        distance_to_gwanghwamun = get_distance_to_gwanghwamun(lat, lon, gwanghwamun_coords)
     
-    distance_to_gwanghwamun = get_distance_to_gwanghwamun(lat, lon, gwanghwamun_coords)
-    
-    address_from_api = None
-    location_data = property_data.get('location', {})
-    if location_data and isinstance(location_data, dict):
-        address_obj = location_data.get('address', {})
-        if address_obj and isinstance(address_obj, dict):
-            address_from_api = address_obj.get('text')
-
-    if not address_from_api:
-        for field in ['location_text', 'address', 'addr', 'location.address.text']:
-            parts = field.split('.')
-            temp_data = property_data
-            valid_path = True
-            for part in parts:
-                if isinstance(temp_data, dict) and part in temp_data:
-                    temp_data = temp_data[part]
-                else:
-                    valid_path = False
-                    break
-            if valid_path and isinstance(temp_data, str):
-                address_from_api = temp_data
-                break
-    address = address_from_api or '주소 정보 없음'
+    address = _first_value(property_data, 'address')
+    if not isinstance(address, str):
+        address = '주소 정보 없음'
 
-    description = property_data.get('parsed_description') or \
-                  (property_data.get('info') or {}).get('subject') or \
-                  property_data.get('description') or '상세 설명 없음'
+    description = _first_value(property_data, 'description') or '상세 설명 없음'
 
-    price_data = property_data.get('price', {})
-    if not isinstance(price_data, dict): price_data = {}
-    price_deposit_val = price_data.get('deposit') or (property_data.get('info', {}) or {}).get('deposit')
+    price_deposit_val = _first_value(property_data, 'deposit')
     price_info_str = f"보증금: {price_deposit_val / 10000 if isinstance(price_deposit_val, (int, float)) else price_deposit_val}만원"
     
     # 관리비 정보 추가
-    maintenance_cost_val = price_data.get('maintenance_cost') or price_data.get('monthly_rent')
+    maintenance_cost_val = _first_value(property_data, 'maintenance_cost')
     if maintenance_cost_val:
-        if isinstance(maintenance_cost_val, str) and any(keyword in maintenance_cost_val for keyword in ['확인 불가', '정보 없음', '미제공']):
+        if isinstance(maintenance_cost_val, str) and _MISSING_KW_RE.search(maintenance_cost_val):
             price_info_str += f", 관리비: {maintenance_cost_val}"
         elif isinstance(maintenance_cost_val, (int, float)) and maintenance_cost_val > 0:
             price_info_str += f", 관리비: {maintenance_cost_val / 10000}만원"
@@ -216,19 +607,14 @@ def analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords):
 
     approval_date_val = property_data.get('parsed_approval_date', '정보 없음')
     
-    building_type_val = (property_data.get('type', {}) or {}).get('building_type', '정보 없음')
-    if isinstance(building_type_val, list) and len(building_type_val) > 0: building_type_val = building_type_val[0]
+    building_type_val = _first_value(property_data, 'building_type') or '정보 없음'
+    if isinstance(building_type_val, list): building_type_val = building_type_val[0]
     
-    room_count_val = (property_data.get('info', {}) or {}).get('room_count')
+    room_count_val = _first_value(property_data, 'room_count')
     bathroom_count_val = property_data.get('parsed_bathroom_count')
     
-    size_info_data = {}
-    for field in ['info', 'size']:
-        if field in property_data and isinstance(property_data[field], dict):
-            size_info_data = property_data[field]
-            break
-    supplied_size_val = size_info_data.get('supplied_size')
-    real_size_val = size_info_data.get('real_size')
+    supplied_size_val = _first_value(property_data, 'supplied_size')
+    real_size_val = _first_value(property_data, 'real_size')
     size_text_str = f"{supplied_size_val}㎡(공급) / {real_size_val}㎡(전용)" if supplied_size_val and real_size_val else "정보 없음"
     
     floor_val = property_data.get('parsed_floor')
@@ -239,7 +625,7 @@ def analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords):
     
     agent_name_val = property_data.get('parsed_agent_name', '정보 없음')
     agent_office_val = property_data.get('parsed_agent_office', '')
-    user_type_val = property_data.get('parsed_user_type') or (property_data.get('attribute', {}) or {}).get('userType')
+    user_type_val = _first_value(property_data, 'user_type')
 
     # 사용자 유형을 '중개사' 또는 '세입자'로 명확히 표시
     user_type_display = '정보 없음'
@@ -248,268 +634,337 @@ def analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords):
     elif user_type_val == 'user' or user_type_val == '세입자':
         user_type_display = '세입자'
 
-    prompt = f"""
-당신은 부동산 전문가입니다. 아래 제공된 매물 정보를 바탕으로 상세 분석을 수행하고, 점수를 매겨주세요. 
-총 100점 만점 기준으로 각 카테고리별 점수와 근거를 구체적으로 설명해주세요.
+    distance_line = f"- 광화문까지 직선거리: {distance_to_gwanghwamun:.2f}km\n" if distance_to_gwanghwamun else ""
+    return {
+        'address': address,
+        'description': description,
+        'price_info_str': price_info_str,
+        'approval_date_val': approval_date_val,
+        'building_type_val': building_type_val,
+        'room_count_val': room_count_val,
+        'bathroom_count_val': bathroom_count_val,
+        'size_text_str': size_text_str,
+        'floor_info_str': floor_info_str,
+        'options_string_val': options_string_val,
+        'agent_name_val': agent_name_val,
+        'agent_office_val': agent_office_val,
+        'user_type_display': user_type_display,
+        'distance_line': distance_line,
+    }
 
-## 매물 기본 정보
-- 주소: {address}
-- 설명: {description}
-- 가격: {price_info_str}
-- 사용승인일: {approval_date_val}
-- 건물 유형: {building_type_val}
-- 방/욕실 수: {room_count_val}개/{bathroom_count_val}개
-- 면적: {size_text_str}
-- 층수: {floor_info_str}
-- 옵션: {options_string_val}
-- 매물 등록인: {agent_name_val} ({agent_office_val}) ({user_type_display})
-"""
-    if distance_to_gwanghwamun:
-        prompt += f"- 광화문까지 직선거리: {distance_to_gwanghwamun:.2f}km\\n"
+def _analysis_cache_key(prompt):
+    """단일 매물 분석 프롬프트에 대한 캐시 키 (캐시를 사용하지 않으면 None)"""
+    return make_cache_key(GEMINI_MODEL, SYSTEM_INSTRUCTION, prompt) if ANALYSIS_CACHE_DIR else None
 
-    prompt += """
-## 분석 항목 (총 100점 만점)
+def _call_gemini(client, prompt, config, label):
+    """
+    공유 속도 제한기와 재시도 정책을 적용해 Gemini API를 호출하고 응답 텍스트를 반환합니다.
+    
+    Args:
+        client: Gemini API 클라이언트
+        prompt (str): 요청 프롬프트
+        config (types.GenerateContentConfig): 요청 설정
+        label (str): 로그에 표시할 요청 설명 (예: "hidx=123")
+        
+    Returns:
+        str: 응답 텍스트
+    
+    Raises:
+        AnalysisFailed: 재시도 후에도 응답을 받지 못한 경우
+    """
+    try:
+        for attempt in _API_RETRYING.copy():
+            with attempt:
+                logging.info(f"Gemini API 요청 시작 (모델: {GEMINI_MODEL}, {label}, 시도: {attempt.retry_state.attempt_number})")
+                
+                # 공유 속도 제한기로 호출 시점 배정 (429 쿨다운 중이면 함께 대기)
+                _RATE_LIMITER.acquire()
+                
+                # 스트리밍으로 받아 JSON이 닫히면 바로 종료 (응답 꼬리 대기 시간 단축)
+                response_text = _stream_response_text(client, prompt, config)
+                if not response_text:
+                    raise _EmptyResponse("Gemini API 응답이 비어 있습니다.")
+        logging.info("Gemini API로부터 분석 결과를 성공적으로 받았습니다.")
+        return response_text
+    except Exception as e:
+        logging.error(f"Gemini API 호출 실패 ({label}): {e}")
+        raise AnalysisFailed(f"Gemini API 호출 실패: {e}") from e
 
-1. 위치 및 접근성 (40점 만점)
-   a. 광화문 접근성 (15점): 광화문까지의 직선거리 및 대중교통 이용 편의성
-   b. 주변 편의시설 (15점): 마트, 병원, 공원, 상가 등 생활편의시설 접근성
-   c. 교통 편의성 (10점): 지하철역, 버스정류장 접근성, 교통 연결성
+def _parse_analysis(response_text, hidx):
+    """
+    단일 매물 분석 응답을 스키마로 검증해 딕셔너리로 반환합니다.
+    스키마에 맞지 않으면 텍스트에서 JSON을 추출/수정하는 경로로 한 번 더 시도합니다.
+    
+    Raises:
+        AnalysisFailed: 응답에서 분석 결과를 얻지 못한 경우
+    """
+    try:
+        # structured output 응답을 스키마로 바로 검증 (점수는 이미 정수)
+        analysis_result = PropertyAnalysis.model_validate_json(response_text).model_dump()
+        logging.info("Gemini API 응답 JSON 파싱 성공.")
+        return analysis_result
+    except ValidationError as validation_error:
+        logging.warning(f"Gemini API 응답 스키마 검증 실패 (hidx={hidx}): {validation_error}. 텍스트에서 JSON 추출 시도 중...")
+    
+    try:
+        analysis_result = extract_and_parse_json(response_text, hidx)
+    except Exception as e:
+        logging.error(f"Gemini API 응답 처리 중 예기치 않은 오류: {e}")
+        raise AnalysisFailed(f"응답 처리 오류: {e}", raw_response=response_text) from e
+    
+    if not analysis_result:
+        logging.error("Gemini API 응답에서 JSON 파싱 실패.")
+        raise AnalysisFailed("JSON 파싱 실패", raw_response=response_text)
+    
+    logging.info("Gemini API 응답 JSON 추출 성공.")
+    _convert_scores_to_int(analysis_result)
+    return analysis_result
 
-2. 건물 및 시설 품질 (30점 만점)
-   a. 건물 상태 및 연식 (15점): 사용승인일, 리모델링 여부, 건물 관리상태
-   b. 공간 효율성 (10점): 구조, 면적 대비 활용도, 수납공간
-   c. 층수 및 향 (5점): 저층/고층 여부, 일조량, 조망권
+def analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords):
+    """
+    Google Gemini API를 사용하여 매물 데이터를 분석하고 점수를 매깁니다.
+    
+    Args:
+        property_data (dict): 매물의 기본 정보와 HTML 파싱 결과를 포함한 데이터
+        api_key (str): Google AI API 키
+        gwanghwamun_coords (tuple): 광화문의 위도, 경도 튜플 (예: (37.5759, 126.9780))
+        
+    Returns:
+        dict: 분석 결과와 기존 매물 정보를 병합한 데이터
+    
+    Raises:
+        AnalysisFailed: API 키 누락, API 호출 실패, 응답 파싱 실패 등으로 분석 결과를 얻지 못한 경우
+    """
+    if not property_data:
+        logging.warning("분석할 매물 데이터가 없습니다.")
+        return None
+    
+    if not api_key:
+        logging.error("Google AI API 키가 없습니다. GEMINI_API_KEY 환경변수를 확인하세요.")
+        raise AnalysisFailed("Google AI API 키 없음")
+    
+    hidx = property_data.get('hidx')
+    if not hidx:
+        logging.warning("매물 ID(hidx)가 없습니다.")
+        return property_data
+    
+    logging.info(f"Gemini API 분석 시작: hidx={hidx} (모델: {GEMINI_MODEL})")
+    
+    try:
+        client = get_gemini_client(api_key)
+    except Exception as e:
+        logging.error(f"Gemini API 클라이언트 초기화 중 오류 발생: {e}")
+        raise AnalysisFailed(f"Gemini API 클라이언트 초기화 실패: {e}") from e
 
-3. 옵션 및 생활 편의성 (15점 만점)
-   a. 가전제품 (8점): 냉장고, 세탁기, 에어컨 등 필수 가전 보유 여부
-   b. 가구 및 시설 (7점): 붙박이장, 신발장, 인테리어 품질
+    prompt = _PROMPT_TEMPLATE.format_map(_build_prompt_fields(property_data, gwanghwamun_coords))
 
-4. 가격 경쟁력 (15점 만점)
-   a. 동일 지역 시세 대비 가격 (10점): 주변 유사 매물 대비 가격 경쟁력
-   b. 관리비 및 추가비용 (5점): 관리비, 주차비 등 추가 비용 요소
-      ※ 중요: 관리비 정보가 "확인 불가", "정보 없음" 또는 누락된 경우, 이는 투명성 부족으로 간주하여 점수를 낮게 부여하세요 (1-2점).
-      관리비가 명확히 제시된 경우에만 적정 점수(3-5점)를 부여하세요.
+    # 같은 모델/프롬프트로 이미 분석한 결과가 있으면 API 호출 없이 재사용
+    cache_key = _analysis_cache_key(prompt)
+    if cache_key:
+        cached_result = load_json(ANALYSIS_CACHE_DIR, cache_key)
+        if cached_result is not None:
+            logging.info(f"캐시된 분석 결과 사용: hidx={hidx}")
+            return _merge_analysis_result(property_data, cached_result)
 
-## 추가 분석
-1. 매물 신뢰도 평가
-   - 허위매물 가능성: 낮음/보통/높음 중 하나를 선택하고 그 이유 설명
-   - 매물 정보의 일관성, 상세함, 사진 제공 여부
-   - 중개사/판매자 정보의 투명성
+    response_text = _call_gemini(client, prompt, GENERATION_CONFIG, f"hidx={hidx}")
+    analysis_result = _parse_analysis(response_text, hidx)
 
-2. 종합 의견
-   - 장점 요약 (3가지 이상)
-   - 단점 요약 (2가지 이상)
-   - 추천 대상 (어떤 사람에게 적합한지)
+    if cache_key:
+        save_json(ANALYSIS_CACHE_DIR, cache_key, analysis_result)
+    
+    return _merge_analysis_result(property_data, analysis_result)
 
-## 응답 형식
-응답은 반드시 아래 JSON 형식으로 제공해주세요:
-
-```json
-{
-  "total_score": "점수(0-100 숫자)",
-  
-  "location_accessibility": {
-    "gwanghwamun_score": "점수(0-15 숫자)",
-    "gwanghwamun_comment": "광화문 접근성에 대한 평가",
-    "amenities_score": "점수(0-15 숫자)",
-    "amenities_comment": "주변 편의시설 평가",
-    "transportation_score": "점수(0-10 숫자)",
-    "transportation_comment": "교통 편의성 평가",
-    "location_total": "총합(0-40 숫자)"
-  },
-  
-  "building_quality": {
-    "condition_score": "점수(0-15 숫자)",
-    "condition_comment": "건물 상태 평가",
-    "space_score": "점수(0-10 숫자)",
-    "space_comment": "공간 효율성 평가",
-    "floor_score": "점수(0-5 숫자)",
-    "floor_comment": "층수 및 향 평가",
-    "building_total": "총합(0-30 숫자)"
-  },
-  
-  "living_convenience": {
-    "appliances_score": "점수(0-8 숫자)",
-    "appliances_comment": "가전제품 평가",
-    "furniture_score": "점수(0-7 숫자)",
-    "furniture_comment": "가구 및 시설 평가",
-    "convenience_total": "총합(0-15 숫자)"
-  },
-  
-  "price_value": {
-    "market_score": "점수(0-10 숫자)",
-    "market_comment": "시세 대비 가격 평가",
-    "extra_cost_score": "점수(0-5 숫자)",
-    "extra_cost_comment": "관리비 및 추가비용 평가",
-    "price_total": "총합(0-15 숫자)"
-  },
-  
-  "credibility": {
-    "fake_possibility": "낮음/보통/높음 중 하나",
-    "credibility_comment": "신뢰도 평가 근거"
-  },
-  
-  "summary": {
-    "pros": ["장점1", "장점2", "장점3"],
-    "cons": ["단점1", "단점2"],
-    "recommendation": "추천 대상 및 종합 의견"
-  }
-}
-```
-각 점수는 반드시 배점 범위 내에서 정수로 부여해주세요. 각 카테고리의 총합은 하위 항목들의 합과 일치해야 합니다.
-total_score는 모든 카테고리 점수의 합으로, 100점 만점입니다. JSON 내부의 값은 모두 문자열로 반환해주세요. 숫자인 경우에도 따옴표로 감싸주세요.
-"""
+def _merge_analysis_result(property_data, analysis_result):
+    """분석 결과를 매물 데이터와 병합합니다."""
+    result = {**property_data, **analysis_result}
+    if 'reanalysis_comment' not in result:
+        result['reanalysis_comment'] = "개별 분석 완료. 재평가 대기 중."
 
-    MAX_RETRY = 5  # 최대 재시도 횟수 증가
-    retry_count = 0
-    response_text = None
-    
-    # API 분석 실패 시 반환할 기본 결과
-    fallback_result = {
-        "total_score": "50", 
-        "location_accessibility": {
-            "gwanghwamun_score": "8", "gwanghwamun_comment": "API 분석 실패",
-            "amenities_score": "8", "amenities_comment": "API 분석 실패",
-            "transportation_score": "8", "transportation_comment": "API 분석 실패",
-            "location_total": "24"
-        },
-        "building_quality": {
-            "condition_score": "8", "condition_comment": "API 분석 실패",
-            "space_score": "5", "space_comment": "API 분석 실패",
-            "floor_score": "3", "floor_comment": "API 분석 실패",
-            "building_total": "16"
-        },
-        "living_convenience": {
-            "appliances_score": "4", "appliances_comment": "API 분석 실패",
-            "furniture_score": "3", "furniture_comment": "API 분석 실패",
-            "convenience_total": "7"
-        },
-        "price_value": {
-            "market_score": "5", "market_comment": "API 분석 실패",
-            "extra_cost_score": "3", "extra_cost_comment": "API 분석 실패",
-            "price_total": "8"
-        },
-        "credibility": {"fake_possibility": "보통", "credibility_comment": "API 분석 실패"},
-        "summary": {
-            "pros": ["API 분석 실패"], "cons": ["API 분석 실패"],
-            "recommendation": "API 분석 실패"
-        },
-        "reanalysis_comment": "개별 분석 실패로 재평가 정보 없음"
-    }
+    logging.info(f"매물 ID: {property_data.get('hidx')} 분석 완료. 총점: {analysis_result.get('total_score', 'N/A')}/100점")
     
-    while retry_count < MAX_RETRY:
+    return result
+
+def _batch_generation_config(count):
+    """매물 count개를 한 번에 분석하는 요청 설정 (배열 스키마, 매물 수에 비례한 응답 토큰 한도)"""
+    return GENERATION_CONFIG.model_copy(update={
+        'response_schema': list[BatchPropertyAnalysis],
+        'max_output_tokens': RESPONSE_TOKENS_PER_PROPERTY * count + THINKING_BUDGET,
+    })
+
+def _parse_batch_analysis(response_text):
+    """
+    일괄 분석 응답을 hidx별 분석 결과로 변환합니다. 배열 전체가 스키마에 맞지 않으면
+    항목별로 검증해서 맞는 항목만 사용합니다.
+    
+    Returns:
+        dict: hidx(str) → 분석 결과 딕셔너리
+    """
+    try:
+        items = [item.model_dump() for item in _BATCH_ANALYSIS_ADAPTER.validate_json(response_text)]
+    except ValidationError as validation_error:
+        logging.warning(f"일괄 분석 응답 스키마 검증 실패: {validation_error}. 항목별 검증 시도 중...")
+        start = response_text.find('[')
+        end = response_text.rfind(']')
+        if start == -1 or end < start:
+            return {}
         try:
-            logging.info(f"Gemini API 요청 시작 (모델: {GEMINI_MODEL}, 시도: {retry_count + 1})")
-            
-            # API 속도 제한을 위한 지연 로직
-            global last_api_call_time
-            current_time = time.time()
-            elapsed_time = current_time - last_api_call_time
-            
-            # 연속 API 호출 사이에 최소한의 지연 시간 적용
-            if last_api_call_time > 0 and elapsed_time < API_MIN_DELAY_SECONDS:
-                wait_time = API_MIN_DELAY_SECONDS - elapsed_time
-                logging.info(f"API 속도 제한 준수를 위해 {wait_time:.2f}초 대기 중...")
-                time.sleep(wait_time + random.uniform(0.1, 1.0))  # 약간의 무작위성 추가
-            
-            # 재시도 시 지수 백오프 적용 (첫 번째 시도에는 적용 안 함)
-            if retry_count > 0:
-                # 지수 백오프: 2^retry_count * (10~15초) 의 지연 시간
-                backoff_time = (2 ** retry_count) * (10 + random.uniform(0, 5))
-                logging.info(f"재시도 #{retry_count}: {backoff_time:.2f}초 대기 중...")
-                time.sleep(backoff_time)
-            
-            # API 호출 시간 기록
-            last_api_call_time = time.time()
-            
-            response = client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=[
-                    {"role": "user", "parts": [{"text": prompt}]},
-                ],
-                config=generation_config
-            )
-            
-            if response and hasattr(response, 'text'):
-                response_text = response.text
-                logging.info("Gemini API로부터 분석 결과를 성공적으로 받았습니다.")
-                break
-            else:
-                logging.warning(f"Gemini API 응답이 비정상적입니다: {response}")
-                retry_count += 1
+            raw_items = orjson.loads(fix_json_string(response_text[start:end + 1]))
+        except orjson.JSONDecodeError as e:
+            logging.error(f"일괄 분석 응답 JSON 파싱 실패: {e}")
+            return {}
+        items = []
+        for raw_item in raw_items if isinstance(raw_items, list) else []:
+            try:
+                items.append(BatchPropertyAnalysis.model_validate(raw_item).model_dump())
+            except ValidationError:
+                continue
+    return {item.pop('hidx'): item for item in items}
+
+def _analyze_batch(client, batch):
+    """
+    여러 매물을 하나의 요청으로 분석합니다.
+    
+    Args:
+        client: Gemini API 클라이언트
+        batch (list): (매물 데이터, 프롬프트 필드) 튜플 리스트
         
+    Returns:
+        dict: hidx(str) → 분석 결과 (응답에서 빠졌거나 스키마에 맞지 않는 매물은 포함되지 않음)
+    
+    Raises:
+        AnalysisFailed: 재시도 후에도 응답을 받지 못한 경우
+    """
+    prompt_parts = [_BATCH_PROMPT_INTRO.format(count=len(batch))]
+    for index, (property_data, fields) in enumerate(batch, 1):
+        prompt_parts.append(_BATCH_PROPERTY_HEADER.format(index=index, hidx=property_data['hidx']))
+        prompt_parts.append(_PROPERTY_INFO_TEMPLATE.format_map(fields))
+    prompt_parts.append(_ANALYSIS_GUIDE)
+    prompt_parts.append(_BATCH_RESPONSE_NOTE)
+    
+    label = f"일괄 분석 {len(batch)}건"
+    response_text = _call_gemini(client, ''.join(prompt_parts), _batch_generation_config(len(batch)), label)
+    return _parse_batch_analysis(response_text)
+
+def _split_batches(pending, batch_size):
+    """
+    분석 대상을 batch_size개씩 묶습니다. 매물 정보가 길어 프롬프트가 MAX_BATCH_PROMPT_CHARS를
+    넘으면 그 전에 묶음을 끊습니다.
+    """
+    batches = []
+    batch = []
+    batch_chars = 0
+    for entry in pending:
+        entry_chars = len(_PROPERTY_INFO_TEMPLATE.format_map(entry[2]))
+        if batch and (len(batch) >= batch_size or batch_chars + entry_chars > MAX_BATCH_PROMPT_CHARS):
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(entry)
+        batch_chars += entry_chars
+    if batch:
+        batches.append(batch)
+    return batches
+
+def analyze_properties_with_gemini(properties, api_key, gwanghwamun_coords, max_workers=MAX_CONCURRENT_ANALYSES, batch_size=ANALYSIS_BATCH_SIZE):
+    """
+    여러 매물을 batch_size개씩 묶어 요청 하나로 분석하고, 묶음들은 스레드 풀에서 동시에 요청합니다.
+    일괄 분석 응답에서 빠진 매물은 매물별 개별 분석으로 다시 시도합니다.
+    
+    Args:
+        properties (list): 분석할 매물 데이터 리스트
+        api_key (str): Google AI API 키
+        gwanghwamun_coords (tuple): 광화문의 위도, 경도 튜플
+        max_workers (int): 동시에 요청할 최대 스레드 수
+        batch_size (int): 요청 하나에 담을 최대 매물 수 (1이면 매물별 개별 분석)
+        
+    Returns:
+        list: 입력 순서와 같은 순서의 분석 결과 리스트 (분석 실패 시 원본 데이터에 오류 정보 포함)
+    """
+    properties = list(properties)
+    if not properties:
+        return []
+    
+    # 광화문까지의 거리는 사전 평가와 프롬프트 구성에서 함께 쓰도록 매물마다 한 번만 계산 (입력 매물 딕셔너리에는 저장하지 않음)
+    distances = [
+        get_distance_to_gwanghwamun(*get_property_coordinates(property_data), gwanghwamun_coords)
+        for property_data in properties
+    ]
+    
+    def analyze_one(property_data):
+        try:
+            return analyze_property_with_gemini(property_data, api_key, gwanghwamun_coords) or property_data
+        except AnalysisFailed as e:
+            # 대체 점수를 채우지 않고 실패 정보만 기록 (점수 집계에서 가짜 점수가 섞이지 않도록)
+            logging.error(f"Gemini 분석 실패: {e} (hidx={property_data.get('hidx')})")
+            return mark_analysis_failed(property_data, e)
         except Exception as e:
-            error_message = str(e)
-            logging.error(f"Gemini API 호출 중 오류 발생: {error_message}")
-            
-            # 429 에러 (할당량 초과) 처리 로직
-            if "429" in error_message or "RESOURCE_EXHAUSTED" in error_message:
-                retry_delay = 30  # 기본 재시도 지연 시간(초)
-                
-                # 에러 메시지에서 retryDelay 값 추출 시도
-                retry_delay_match = re.search(r"retryDelay': '(\d+)s'", error_message)
-                if retry_delay_match:
-                    retry_delay = int(retry_delay_match.group(1)) + random.randint(5, 10)  # 여유 있게 몇 초 더 기다림
-                
-                logging.warning(f"할당량 제한에 도달했습니다. {retry_delay}초 후 재시도합니다.")
-                time.sleep(retry_delay)
-            else:
-                # 다른 오류일 경우 기본 지수 백오프 적용
-                backoff_time = (2 ** retry_count) * (5 + random.uniform(0, 5))
-                time.sleep(backoff_time)
-            
-            retry_count += 1
-            
-            if retry_count >= MAX_RETRY:
-                property_data['ai_analysis_error'] = f"Gemini API 호출 실패: {error_message}"
-                return {**property_data, **fallback_result}
+            logging.error(f"Gemini 분석 중 오류: {e} (hidx={property_data.get('hidx')})")
+            property_data['ai_analysis_error'] = f"분석 중 오류: {e}"
+            return property_data
     
-    analysis_result = None
-    if response_text:
+    client = None
+    if api_key and batch_size > 1:
         try:
-            # 새로운 JSON 추출 및 파싱 함수 사용
-            analysis_result = extract_and_parse_json(response_text, hidx)
-            
-            if analysis_result:
-                logging.info("Gemini API 응답 JSON 파싱 성공.")
-                
-                def convert_to_int_safe(value_dict, key):
-                    if key in value_dict and isinstance(value_dict[key], str):
-                        try:
-                            value_dict[key] = int(value_dict[key])
-                        except ValueError:
-                            logging.warning(f"점수 변환 실패 (정수 아님): {key}={value_dict[key]}")
-                
-                if 'total_score' in analysis_result: convert_to_int_safe(analysis_result, 'total_score')
-                for category_key in ['location_accessibility', 'building_quality', 'living_convenience', 'price_value']:
-                    if category_key in analysis_result and isinstance(analysis_result[category_key], dict):
-                        category_data = analysis_result[category_key]
-                        for score_key in category_data:
-                            if 'score' in score_key or 'total' in score_key :
-                                convert_to_int_safe(category_data, score_key)
-            else:
-                logging.error("Gemini API 응답에서 JSON 파싱 실패.")
-                property_data['ai_analysis_error'] = "JSON 파싱 실패"
-                property_data['ai_analysis_raw_response'] = response_text
-                return {**property_data, **fallback_result}
-
+            client = get_gemini_client(api_key)
         except Exception as e:
-            logging.error(f"Gemini API 응답 처리 중 예기치 않은 오류: {e}")
-            property_data['ai_analysis_error'] = f"응답 처리 오류: {e}"
-            property_data['ai_analysis_raw_response'] = response_text
-            return {**property_data, **fallback_result}
-
-    if not analysis_result:
-        property_data['ai_analysis_error'] = property_data.get('ai_analysis_error', "Gemini 분석 결과 없음")
-        return {**property_data, **fallback_result}
-
-    result = {**property_data, **analysis_result}
-    if 'reanalysis_comment' not in result:
-        result['reanalysis_comment'] = "개별 분석 완료. 재평가 대기 중."
-
-    logging.info(f"매물 ID: {hidx} 분석 완료. 총점: {analysis_result.get('total_score', 'N/A')}/100점")
+            logging.error(f"Gemini API 클라이언트 초기화 중 오류 발생: {e}")
     
-    return result
+    results = [None] * len(properties)
+    pending = []
+    for index, (property_data, distance) in enumerate(zip(properties, distances)):
+        if TRIAGE_ENABLED and property_data.get('hidx'):
+            # 규칙 기반 점수가 명확한 매물은 Gemini 호출 없이 사전 평가 결과 사용
+            triage_result = triage_property(property_data, distance)
+            if triage_result is not None:
+                logging.info(f"사전 평가로 Gemini 분석 생략: hidx={property_data['hidx']}, 총점 {triage_result['total_score']}")
+                results[index] = _merge_analysis_result(property_data, triage_result)
+                continue
+        
+        if client is None or not property_data.get('hidx'):
+            # 일괄 분석을 할 수 없으면 개별 분석 경로에서 오류/누락을 처리
+            pending.append((index, property_data, None))
+            continue
+        
+        fields = _build_prompt_fields(property_data, gwanghwamun_coords, distance)
+        cache_key = _analysis_cache_key(_PROMPT_TEMPLATE.format_map(fields))
+        cached_result = load_json(ANALYSIS_CACHE_DIR, cache_key) if cache_key else None
+        if cached_result is not None:
+            logging.info(f"캐시된 분석 결과 사용: hidx={property_data['hidx']}")
+            results[index] = _merge_analysis_result(property_data, cached_result)
+        else:
+            pending.append((index, property_data, fields))
+    
+    def analyze_batch(batch):
+        analyses = {}
+        if len(batch) > 1:
+            try:
+                analyses = _analyze_batch(client, [(property_data, fields) for _, property_data, fields in batch])
+            except AnalysisFailed as e:
+                logging.warning(f"일괄 분석 실패, 매물별 개별 분석으로 전환합니다: {e}")
+        
+        batch_results = []
+        for index, property_data, fields in batch:
+            analysis_result = analyses.get(str(property_data.get('hidx')))
+            if analysis_result is None:
+                batch_results.append((index, analyze_one(property_data)))
+                continue
+            # 개별 분석과 같은 캐시 키로 저장해서 재실행 시 어느 경로로든 재사용
+            cache_key = _analysis_cache_key(_PROMPT_TEMPLATE.format_map(fields))
+            if cache_key:
+                save_json(ANALYSIS_CACHE_DIR, cache_key, analysis_result)
+            batch_results.append((index, _merge_analysis_result(property_data, analysis_result)))
+        return batch_results
+    
+    batchable = [entry for entry in pending if entry[2] is not None]
+    batches = _split_batches(batchable, batch_size) if batchable else []
+    batches.extend([entry] for entry in pending if entry[2] is None)
+    
+    if batches:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            for batch_results in executor.map(analyze_batch, batches):
+                for index, result in batch_results:
+                    results[index] = result
+    return results
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -538,7 +993,7 @@ if __name__ == "__main__":
         gwanghwamun_coords_test = (37.5759, 126.9780)
         # test_result = analyze_property_with_gemini(test_property, test_api_key, gwanghwamun_coords_test)
         # if test_result:
-        #     print(json.dumps(test_result, indent=2, ensure_ascii=False))
+        #     print(orjson.dumps(test_result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
         # else:
         #     print("테스트 분석 실패")
         logging.info("테스트 실행은 analyze_property_with_gemini 함수 호출 부분을 주석 해제하고 API 키를 GEMINI_API_KEY 환경변수에 설정해야 합니다.") 
\ No newline at end of file
@@ -1,156 +1,336 @@
 import logging
-import json
+import orjson
+import json_repair
 import time
 import random
 import re
 import os
+import math
+import concurrent.futures
+import functools
+import numpy as np
 from google import genai
 from google.genai import types
+from rate_limiter import QuotaRateLimiter
+from file_cache import make_cache_key, SqliteCache
+from json_stream import JsonStreamScanner
 
 # 사용할 Gemini 모델명
 GEMINI_MODEL_REANALYZER = "gemini-2.5-flash-preview-05-20"  # 더 빠른 모델로 변경
 
 # API 호출 속도 제한 관련 설정
 API_MAX_CALLS_PER_MINUTE_REANALYZER = 100  # 분당 호출 수를 대폭 줄임
-API_MIN_DELAY_SECONDS_REANALYZER = 2.0  # API 호출 간 최소 지연 시간 (초)
+API_MAX_TOKENS_PER_MINUTE_REANALYZER = 1000000  # 분당 입력 토큰 한도 (TPM)
+API_MAX_CALLS_PER_DAY_REANALYZER = 10000  # 일일 호출 한도 (RPD)
+API_QUOTA_SAFETY_MARGIN = 0.9  # 각 한도의 90%까지만 사용
+CHARS_PER_TOKEN_ESTIMATE = 3  # 프롬프트 토큰 수 추정용 (JSON + 한글 혼합 기준 대략적인 값)
 
 # 재평가 시 한 번에 처리할 매물 수 (배치 크기)
-REANALYSIS_BATCH_SIZE = 15  # 한 번에 재평가할 매물 수 (API 안정성 향상을 위해 감소)
+REANALYSIS_BATCH_SIZE = 75  # 한 번에 재평가할 매물 수 (압축된 표 형식 입력 기준, 응답이 잘리면 배치를 자동으로 반으로 나눔)
+REANALYSIS_MAX_OUTPUT_TOKENS = 60000  # 재평가 응답 최대 토큰 수 (75개 매물 응답 + 여유)
+
+# 여러 재평가 배치를 동시에 요청할 때 최대 동시 요청 수
+# (분당 호출 수 / 60 × 배치 응답 시간(초) × 0.7 정도가 적당, 실제 호출 간격은 공유 속도 제한기가 맞춤)
+MAX_CONCURRENT_REANALYSES = 8
 
 # 다중 라운드 재평가 설정
 NUM_REANALYSIS_ROUNDS = 5  # 재평가 라운드 수 (더 안정적인 수렴을 위해 증가)
 CONVERGENCE_THRESHOLD = 5.0  # 점수 수렴 임계값
 
-# 마지막 API 호출 시간을 추적하기 위한 전역 변수
-last_api_call_time_reanalyzer = 0
+# 재평가 응답에서 JSON을 찾기 위한 정규식 (모듈 로드 시 한 번만 컴파일)
+_JSON_FENCE_RE = re.compile(r"```json\s*([\s\S]*?)\s*```", re.DOTALL | re.IGNORECASE)
+_JSON_ARRAY_RE = re.compile(r'\[\s*\{[\s\S]*?\}\s*\]', re.DOTALL)
+
+# 재평가 응답에서 점수를 정수로 맞출 카테고리
+_SCORE_CATEGORIES = ('location_accessibility', 'building_quality', 'living_convenience', 'price_value')
+
+# 재평가 프롬프트에 넣는 매물 표 형식 (매물당 한 줄, '|'로 구분)
+_REANALYSIS_TABLE_HEADER = "hidx|loc|bld|conv|price|total|summary"
+_REANALYSIS_TABLE_COLUMNS = (
+    ('location_accessibility', 'location_total'),
+    ('building_quality', 'building_total'),
+    ('living_convenience', 'convenience_total'),
+    ('price_value', 'price_total'),
+)
+_TABLE_CELL_CLEAN = str.maketrans({'|': '/', '\n': ' ', '\r': ' '})
+
+# 종합 백분율 점수 가중치 (위치, 건물, 편의성, 가격 백분율 순)
+_PERCENTILE_WEIGHTS = np.array([0.4, 0.3, 0.15, 0.15])
+
+# 재평가 결과 디스크 캐시 디렉토리 (같은 점수로 들어온 매물은 다음 라운드/재실행 시 API 호출 없이 재사용, 빈 값이면 사용 안 함)
+# 점수 변화가 CONVERGENCE_THRESHOLD 미만으로 수렴한 결과만 디렉토리 안의 SQLite 파일 하나에 저장
+REANALYSIS_CACHE_DIR = os.getenv('GEMINI_REANALYSIS_CACHE_DIR', '.reanalysis_cache')
+REANALYSIS_CACHE_DB_NAME = 'reanalysis_cache.db'
+# 재평가 캐시 키를 구성하는 매물 필드 (재평가 입력으로 쓰이는 점수들, 추천 의견은 _reanalysis_cache_key에서 따로 추가)
+_REANALYSIS_KEY_FIELDS = ('hidx', 'total_score', 'location_accessibility', 'building_quality', 'living_convenience', 'price_value')
+# 재평가 프롬프트 버전 (_build_reanalysis_prompt나 매물 표 형식을 바꾸면 올려서 이전 캐시를 무효화)
+REANALYSIS_PROMPT_VERSION = 1
+
+# 재평가 스레드가 공유하는 할당량 기반 속도 제한기 (RPM/TPM/RPD 슬라이딩 윈도)
+_RATE_LIMITER_REANALYZER = QuotaRateLimiter(
+    API_MAX_CALLS_PER_MINUTE_REANALYZER,
+    max_tokens_per_minute=API_MAX_TOKENS_PER_MINUTE_REANALYZER,
+    max_calls_per_day=API_MAX_CALLS_PER_DAY_REANALYZER,
+    safety_margin=API_QUOTA_SAFETY_MARGIN
+)
+
+# 재평가 생성 설정 (값이 바뀌지 않으므로 모듈 로드 시 한 번만 생성)
+REANALYSIS_GENERATION_CONFIG = types.GenerateContentConfig(
+    temperature=0.1,
+    max_output_tokens=REANALYSIS_MAX_OUTPUT_TOKENS,
+    top_p=0.9,
+    response_mime_type="application/json",
+)
+
+@functools.lru_cache(maxsize=4)
+def get_reanalysis_client(api_key):
+    """API 키별 Gemini 클라이언트를 한 번만 생성해 재사용합니다 (배치마다 클라이언트를 새로 만들지 않음)."""
+    return genai.Client(api_key=api_key)
+
+def _get_nested_int(prop, outer, inner):
+    """prop[outer][inner] 점수를 정수로 읽습니다. 구조가 다르거나 숫자로 변환할 수 없으면 0."""
+    values = prop.get(outer)
+    if not isinstance(values, dict):
+        return 0
+    return _to_int(values.get(inner, 0), 0)
 
 def calculate_percentile_scores(properties_list):
     """매물들의 점수를 백분율로 변환하여 더 명확한 순위를 만듭니다."""
     if not properties_list:
         return properties_list
     
-    # 각 카테고리별 점수 수집
-    location_scores = []
-    building_scores = []
-    convenience_scores = []
-    price_scores = []
-    total_scores = []
-    
-    for prop in properties_list:
-        try:
-            if 'location_accessibility' in prop and isinstance(prop['location_accessibility'], dict):
-                loc_total = prop['location_accessibility'].get('location_total', 0)
-                location_scores.append(int(loc_total) if isinstance(loc_total, (str, int, float)) else 0)
-            else:
-                location_scores.append(0)
-                
-            if 'building_quality' in prop and isinstance(prop['building_quality'], dict):
-                building_total = prop['building_quality'].get('building_total', 0)
-                building_scores.append(int(building_total) if isinstance(building_total, (str, int, float)) else 0)
-            else:
-                building_scores.append(0)
-                
-            if 'living_convenience' in prop and isinstance(prop['living_convenience'], dict):
-                conv_total = prop['living_convenience'].get('convenience_total', 0)
-                convenience_scores.append(int(conv_total) if isinstance(conv_total, (str, int, float)) else 0)
-            else:
-                convenience_scores.append(0)
-                
-            if 'price_value' in prop and isinstance(prop['price_value'], dict):
-                price_total = prop['price_value'].get('price_total', 0)
-                price_scores.append(int(price_total) if isinstance(price_total, (str, int, float)) else 0)
-            else:
-                price_scores.append(0)
-                
-            total_score = prop.get('total_score', 0)
-            total_scores.append(int(total_score) if isinstance(total_score, (str, int, float)) else 0)
-        except:
-            location_scores.append(0)
-            building_scores.append(0)
-            convenience_scores.append(0)
-            price_scores.append(0)
-            total_scores.append(0)
-    
-    # 각 점수별 백분율 계산
-    def calculate_percentile(scores):
-        sorted_scores = sorted(scores)
-        percentiles = {}
-        for score in set(scores):
-            rank = sorted_scores.index(score) + 1
-            percentile = (rank / len(sorted_scores)) * 100
-            percentiles[score] = round(percentile, 1)
-        return percentiles
+    # 카테고리별 점수를 (매물 수, 5) 행렬로 모아 한 번에 백분율 계산
+    # 순위는 정렬된 점수에서 처음 나타나는 위치 + 1 (동점은 같은 순위)
+    scores = np.array([
+        (
+            _get_nested_int(prop, 'location_accessibility', 'location_total'),
+            _get_nested_int(prop, 'building_quality', 'building_total'),
+            _get_nested_int(prop, 'living_convenience', 'convenience_total'),
+            _get_nested_int(prop, 'price_value', 'price_total'),
+            _to_int(prop.get('total_score', 0), 0),
+        )
+        for prop in properties_list
+    ], dtype=np.int64)
+    sorted_scores = np.sort(scores, axis=0)
+    ranks = np.empty_like(scores)
+    for column in range(scores.shape[1]):
+        ranks[:, column] = np.searchsorted(sorted_scores[:, column], scores[:, column], side='left') + 1
+    percentiles = np.round(ranks / len(properties_list) * 100, 1)
     
-    location_percentiles = calculate_percentile(location_scores)
-    building_percentiles = calculate_percentile(building_scores)
-    convenience_percentiles = calculate_percentile(convenience_scores)
-    price_percentiles = calculate_percentile(price_scores)
-    total_percentiles = calculate_percentile(total_scores)
+    # 종합 백분율 점수 계산 (가중 평균)
+    weighted_percentiles = np.round(percentiles[:, :4] @ _PERCENTILE_WEIGHTS, 2)
     
     # 백분율 정보를 각 매물에 추가
-    for i, prop in enumerate(properties_list):
+    for prop, row, weighted_percentile in zip(properties_list, percentiles.tolist(), weighted_percentiles.tolist()):
         prop['percentile_scores'] = {
-            'location_percentile': location_percentiles.get(location_scores[i], 0),
-            'building_percentile': building_percentiles.get(building_scores[i], 0),
-            'convenience_percentile': convenience_percentiles.get(convenience_scores[i], 0),
-            'price_percentile': price_percentiles.get(price_scores[i], 0),
-            'total_percentile': total_percentiles.get(total_scores[i], 0)
+            'location_percentile': row[0],
+            'building_percentile': row[1],
+            'convenience_percentile': row[2],
+            'price_percentile': row[3],
+            'total_percentile': row[4]
         }
-        
-        # 종합 백분율 점수 계산 (가중 평균)
-        weighted_percentile = (
-            prop['percentile_scores']['location_percentile'] * 0.4 +
-            prop['percentile_scores']['building_percentile'] * 0.3 +
-            prop['percentile_scores']['convenience_percentile'] * 0.15 +
-            prop['percentile_scores']['price_percentile'] * 0.15
-        )
-        prop['weighted_percentile_score'] = round(weighted_percentile, 2)
+        prop['weighted_percentile_score'] = weighted_percentile
     
     return properties_list
 
-def reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A", total_batches="N/A"):
-    """매물 배치를 재평가하고 백분율 기반 순위 조정을 수행합니다."""
-    if not properties_batch_data:
-        logging.warning(f"재평가할 매물 데이터가 없습니다 (배치 {batch_number}/{total_batches}).")
-        return []
+def _float_to_int(value):
+    return int(value) if math.isfinite(value) else None
 
-    if not api_key:
-        logging.error(f"Google AI API 키가 없습니다 (배치 {batch_number}/{total_batches}).")
-        # API 키가 없어도 백분율 계산은 수행
-        return calculate_percentile_scores(properties_batch_data)
+def _str_to_int(value):
+    text = value.strip()
+    if text.isdigit():
+        return int(text)
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return int(number) if math.isfinite(number) else None
+
+# 점수 값의 타입별 정수 변환 함수 (type(value) 한 번의 딕셔너리 조회로 분기, 변환 실패 시 None)
+_INT_COERCERS = {
+    int: int,
+    bool: int,
+    float: _float_to_int,
+    str: _str_to_int,
+}
+
+def _to_int(value, default=None):
+    """
+    점수 값을 정수로 변환합니다. 타입별 변환 함수 표로 분기해서 정상적인 입력에서는 예외를 발생시키지 않습니다.
     
-    # API 키에서 개행문자 및 공백 제거
-    api_key = api_key.strip()
-        
-    batch_hidx_list = [str(prop.get('hidx')) for prop in properties_batch_data if prop.get('hidx') is not None]
-    batch_hidx_set = set(batch_hidx_list)
+    Returns:
+        int: 변환된 정수, 변환할 수 없으면 default
+    """
+    coerce = _INT_COERCERS.get(type(value))
+    if coerce is None:
+        return default
+    result = coerce(value)
+    return default if result is None else result
+
+def _stream_reanalysis_response(client, prompt_text, generation_config):
+    """
+    재평가 응답을 스트리밍으로 받으면서 최상위 배열의 원소 객체가 완성될 때마다 바로 파싱합니다.
+    원소를 하나 이상 파싱한 배열이 닫히면 남은 응답을 기다리지 않고 스트림을 끊습니다
+    (JSON 앞 설명 문구의 '[...]'처럼 원소 없이 닫힌 괄호에서는 끊지 않음). 파싱에 실패한 원소는 건너뛰며,
+    해당 매물은 이후 병합 단계에서 누락 매물로 처리되어 원본 데이터를 유지합니다.
     
-    if not batch_hidx_list:
-        logging.warning(f"재평가할 매물 데이터에 유효한 hidx가 없습니다 (배치 {batch_number}/{total_batches}).")
-        return calculate_percentile_scores(properties_batch_data)
+    Returns:
+        tuple: (응답 텍스트, 파싱된 매물 객체 리스트, 응답이 잘렸는지 여부)
+    """
+    stream = client.models.generate_content_stream(
+        model=GEMINI_MODEL_REANALYZER,
+        contents=[{"role": "user", "parts": [{"text": prompt_text}]}],
+        config=generation_config
+    )
+    scanner = JsonStreamScanner()
+    pieces = []
+    items = []
+    try:
+        for chunk in stream:
+            text = chunk.text
+            if not text:
+                continue
+            for element in scanner.feed(text):
+                try:
+                    items.append(orjson.loads(element))
+                except orjson.JSONDecodeError as e:
+                    logging.warning(f"스트리밍 응답의 매물 객체 파싱 실패 (원본 유지): {e}")
+            if scanner.done and scanner.is_array and items:
+                pieces.append(text[:scanner.end_index + 1])
+                break
+            pieces.append(text)
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+    # 최상위가 배열이 아니었으면 (단일 객체 등) 기존 텍스트 추출 경로에서 처리
+    if not scanner.is_array:
+        items = []
+    # JSON이 시작됐는데 닫히지 않고 스트림이 끝났으면 출력 토큰 한도에 걸려 잘린 것
+    truncated = scanner.started and not scanner.done
+    return ''.join(pieces), items, truncated
 
-    logging.info(f"Gemini API 배치 재평가 시작 (배치 {batch_number}/{total_batches}, 모델: {GEMINI_MODEL_REANALYZER}, 매물 수: {len(properties_batch_data)})")
-    logging.info(f"현재 배치 hidx 목록: {', '.join(batch_hidx_list[:20])}{'...' if len(batch_hidx_list) > 20 else ''}")
+def _format_reanalysis_table(properties):
+    """재평가 대상 매물을 'hidx|loc|bld|conv|price|total|summary' 형식의 표로 만듭니다 (JSON보다 입력 토큰이 훨씬 적음)."""
+    lines = [_REANALYSIS_TABLE_HEADER]
+    for prop in properties:
+        cells = [str(prop.get('hidx'))]
+        for category, key in _REANALYSIS_TABLE_COLUMNS:
+            values = prop.get(category)
+            cells.append(str(values.get(key, '')) if isinstance(values, dict) else '')
+        cells.append(str(prop.get('total_score', '')))
+        summary = prop.get('summary')
+        cells.append(str(summary.get('recommendation', '')) if isinstance(summary, dict) else '')
+        lines.append('|'.join(cell.translate(_TABLE_CELL_CLEAN) for cell in cells))
+    return '\n'.join(lines)
+
+def _reanalysis_cache_key(prop):
+    """재평가 프롬프트에 들어가는 입력(점수, 추천 의견)과 프롬프트 버전으로 캐시 키를 만듭니다 (캐시를 사용하지 않으면 None)."""
+    if not REANALYSIS_CACHE_DIR:
+        return None
+    key_fields = {field: prop.get(field) for field in _REANALYSIS_KEY_FIELDS}
+    key_fields['hidx'] = str(key_fields['hidx'])  # 정수/문자열 hidx가 같은 키를 갖도록
+    summary = prop.get('summary')
+    key_fields['recommendation'] = summary.get('recommendation') if isinstance(summary, dict) else None
+    return make_cache_key(GEMINI_MODEL_REANALYZER, REANALYSIS_PROMPT_VERSION, key_fields)
 
+@functools.lru_cache(maxsize=1)
+def _get_reanalysis_cache():
+    """재평가 캐시 DB를 처음 사용할 때 한 번만 엽니다."""
+    return SqliteCache(os.path.join(REANALYSIS_CACHE_DIR, REANALYSIS_CACHE_DB_NAME))
+
+def _score_change(old_score, new_score):
+    """재평가 전후 총점 차이 (숫자로 변환할 수 없으면 None)"""
     try:
-        # API 호출 지연 처리
-        global last_api_call_time_reanalyzer
-        current_time = time.time()
-        elapsed_since_last_call = current_time - last_api_call_time_reanalyzer
-        
-        if elapsed_since_last_call < API_MIN_DELAY_SECONDS_REANALYZER:
-            sleep_time = API_MIN_DELAY_SECONDS_REANALYZER - elapsed_since_last_call
-            logging.info(f"API 속도 제한 준수를 위해 {sleep_time:.2f}초 대기 중...")
-            time.sleep(sleep_time)
-        
-        client = genai.Client(api_key=api_key)
-        
-        # 더 구체적이고 명확한 프롬프트 작성 (인코딩 문제 해결)
-        prompt_text = f"""
+        return abs(float(new_score) - float(old_score))
+    except (ValueError, TypeError):
+        return None
+
+def snapshot_scores(properties):
+    """
+    라운드 간 수렴 여부를 비교할 수 있도록 현재 총점을 hidx별로 저장합니다.
+    재평가는 매물 딕셔너리를 직접 갱신하므로 라운드를 시작하기 전에 호출해야 합니다.
+
+    Returns:
+        dict: {hidx(str): total_score}
+    """
+    return {str(prop['hidx']): prop.get('total_score') for prop in properties if prop.get('hidx') is not None}
+
+def measure_convergence(previous_scores, properties, reanalyzed_hidxs=None):
+    """
+    이전 라운드 대비 총점 변화의 평균으로 배치의 수렴 여부를 판단합니다.
+    API 오류 등으로 원본 데이터를 그대로 돌려받은 매물은 변화가 0이므로, reanalyzed_hidxs가 주어지면
+    실제로 새 점수를 받은 매물만 계산에 포함합니다 (해당 매물이 없으면 수렴하지 않은 것으로 판단).
+
+    Args:
+        previous_scores (dict): snapshot_scores로 저장한 이전 라운드 총점
+        properties (list): 이번 라운드 재평가 결과
+        reanalyzed_hidxs (set, optional): 이번 라운드에 새 점수를 받은 매물의 hidx(str)
+
+    Returns:
+        dict: {'mean_delta': 평균 총점 변화, 'converged': 평균 변화가 CONVERGENCE_THRESHOLD 미만인지 여부}
+    """
+    deltas = []
+    for prop in properties:
+        if prop.get('hidx') is None:
+            continue
+        if reanalyzed_hidxs is not None and str(prop['hidx']) not in reanalyzed_hidxs:
+            continue
+        new_score = prop.get('total_score')
+        delta = _score_change(previous_scores.get(str(prop['hidx']), new_score), new_score)
+        if delta is not None:
+            deltas.append(delta)
+    if not deltas:
+        return {'mean_delta': None, 'converged': False}
+    mean_delta = sum(deltas) / len(deltas)
+    return {'mean_delta': mean_delta, 'converged': mean_delta < CONVERGENCE_THRESHOLD}
+
+def reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A", total_batches="N/A", reanalyzed_hidxs=None):
+    """
+    매물 배치를 재평가하고 백분율 기반 순위 조정을 수행합니다.
+    같은 점수로 이미 재평가되어 수렴한 매물은 캐시된 결과를 쓰고, 나머지만 API로 재평가합니다.
+    reanalyzed_hidxs(set)가 주어지면 새 점수를 받은 매물(캐시 포함)의 hidx를 추가합니다.
+    """
+    if not properties_batch_data or not api_key or not REANALYSIS_CACHE_DIR:
+        return _reanalyze_property_batch(properties_batch_data, api_key, batch_number, total_batches, reanalyzed_hidxs)
+    
+    # 배치 전체의 캐시 키를 한 번의 쿼리로 조회
+    cache_keys = [_reanalysis_cache_key(prop) if prop.get('hidx') is not None else None for prop in properties_batch_data]
+    cached_items = _get_reanalysis_cache().get_many(cache_keys)
+    
+    cached_properties = []
+    pending_properties = []
+    for prop, cache_key in zip(properties_batch_data, cache_keys):
+        cached_item = cached_items.get(cache_key) if cache_key else None
+        if cached_item is None:
+            pending_properties.append(prop)
+        else:
+            prop.update(cached_item)
+            cached_properties.append(prop)
+    
+    if not cached_properties:
+        return _reanalyze_property_batch(properties_batch_data, api_key, batch_number, total_batches, reanalyzed_hidxs)
+    
+    if reanalyzed_hidxs is not None:
+        reanalyzed_hidxs.update(str(prop['hidx']) for prop in cached_properties)
+    
+    logging.info(f"캐시된 재평가 결과 사용 (배치 {batch_number}/{total_batches}): {len(cached_properties)}개, API 재평가 대상: {len(pending_properties)}개")
+    reanalyzed_properties = []
+    if pending_properties:
+        reanalyzed_properties = _reanalyze_property_batch(pending_properties, api_key, batch_number, total_batches, reanalyzed_hidxs) or pending_properties
+    
+    # 백분율은 배치 전체 기준으로 다시 계산
+    return calculate_percentile_scores(cached_properties + reanalyzed_properties)
+
+def _build_reanalysis_prompt(properties_batch_data, batch_hidx_list):
+    """재평가 프롬프트를 만듭니다 (API 호출과 분리된 순수 문자열 생성, 매물 표 + 응답 형식 안내)."""
+    return f"""
 다음 {len(properties_batch_data)}개 매물을 재평가해주세요. 각 매물의 hidx는 절대 변경하지 마세요.
 
-매물 데이터:
-{json.dumps(properties_batch_data, ensure_ascii=False, indent=1)}
+매물 데이터 (한 줄에 한 매물, '|'로 구분):
+- loc: 위치 및 접근성 (40점 만점), bld: 건물 및 시설 품질 (30점 만점), conv: 옵션 및 생활 편의성 (15점 만점)
+- price: 가격 경쟁력 (15점 만점), total: 총점 (100점 만점), summary: 초기 분석의 추천 의견
+{_format_reanalysis_table(properties_batch_data)}
 
 요구사항:
 1. 모든 매물을 빠짐없이 처리하세요
@@ -160,214 +340,206 @@ def reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A",
 
 응답 형식 (예시):
 ```json
-[
-  {{
-    "hidx": "원본hidx그대로",
-    "total_score": 85,
-    "location_accessibility": {{"location_total": 35}},
-    "building_quality": {{"building_total": 25}},
-    "living_convenience": {{"convenience_total": 12}},
-    "price_value": {{"price_total": 13}},
-    "reanalysis_comment": "재평가 완료"
-  }}
-]
+[{{"hidx":"원본hidx그대로","total_score":85,"location_accessibility":{{"location_total":35}},"building_quality":{{"building_total":25}},"living_convenience":{{"convenience_total":12}},"price_value":{{"price_total":13}},"reanalysis_comment":"재평가 완료"}}]
 ```
 
 처리할 hidx 목록: {', '.join(batch_hidx_list)}
 """
-        
-        generation_config = types.GenerateContentConfig(
-            temperature=0.1,
-            max_output_tokens=30000,  # 응답 잘림 방지를 위해 증가
-            top_p=0.9,
-        )
-        
-        MAX_RETRY = 3
-        retry_count = 0
-        response_text = None
-        
-        while retry_count < MAX_RETRY:
-            try:
-                logging.info(f"Gemini API 요청 시작 (모델: {GEMINI_MODEL_REANALYZER}, 시도: {retry_count + 1})")
-                
-                response = client.models.generate_content(
-                    model=GEMINI_MODEL_REANALYZER, 
-                    contents=[{"role": "user", "parts": [{"text": prompt_text}]}],
-                    config=generation_config
-                )
-                
-                if response and hasattr(response, 'text') and response.text:
-                    response_text = response.text.strip()
-                    logging.info(f"Gemini API로부터 배치 재평가 결과 수신 (배치 {batch_number}/{total_batches}).")
-                    logging.debug(f"API 응답 길이: {len(response_text)} 문자")
-                    logging.debug(f"API 응답 시작 부분 (200자): {response_text[:200]}")
-                    
-                    # API 응답에서 hidx 개수 확인
-                    hidx_count_in_response = len(re.findall(r'"hidx"\s*:\s*"[^"]*"', response_text))
-                    logging.info(f"API 응답에서 발견된 hidx 개수: {hidx_count_in_response}, 요청한 매물 수: {len(properties_batch_data)}")
-                    
-                    break
-                else:
-                    logging.warning(f"Gemini API 응답이 비어있음 (배치 {batch_number}/{total_batches}, 시도 {retry_count + 1}).")
-                    retry_count += 1
-                    if retry_count < MAX_RETRY:
-                        wait_time = 2 ** retry_count
-                        logging.info(f"빈 응답으로 인한 재시도 전 {wait_time}초 대기...")
-                        time.sleep(wait_time)
-            
-            except Exception as e:
-                error_message = str(e)
-                logging.error(f"Gemini API 호출 중 오류 (배치 {batch_number}/{total_batches}, 시도 {retry_count + 1}): {error_message}")
+
+def _call_reanalysis_api(client, prompt_text, batch_size, batch_number="N/A", total_batches="N/A"):
+    """
+    재평가 프롬프트로 Gemini API를 호출합니다. 빈 응답과 오류는 최대 MAX_RETRY번까지 다시 시도합니다.
+    
+    Returns:
+        tuple: (응답 텍스트 또는 None, 스트리밍 중 파싱한 매물 객체 리스트, 출력 토큰 한도에서 잘렸는지 여부)
+    """
+    MAX_RETRY = 3
+    retry_count = 0
+    response_text = None
+    streamed_items = []
+    truncated = False
+    estimated_prompt_tokens = len(prompt_text) // CHARS_PER_TOKEN_ESTIMATE
+
+    while retry_count < MAX_RETRY:
+        try:
+            logging.info(f"Gemini API 요청 시작 (모델: {GEMINI_MODEL_REANALYZER}, 시도: {retry_count + 1})")
+
+            # 공유 속도 제한기로 할당량 확인 (여유가 있으면 바로 호출, 한도에 닿으면 윈도가 빌 때까지 대기)
+            _RATE_LIMITER_REANALYZER.acquire(estimated_prompt_tokens)
+
+            # 스트리밍으로 받으면서 완성된 매물 객체를 바로 파싱 (배열이 닫히면 스트림 종료)
+            response_text, streamed_items, truncated = _stream_reanalysis_response(client, prompt_text, REANALYSIS_GENERATION_CONFIG)
+
+            if response_text:
+                response_text = response_text.strip()
+                logging.info(f"Gemini API로부터 배치 재평가 결과 수신 (배치 {batch_number}/{total_batches}).")
+                logging.debug(f"API 응답 길이: {len(response_text)} 문자")
+                logging.debug(f"API 응답 시작 부분 (200자): {response_text[:200]}")
+
+                # API 응답에서 hidx 개수 확인
+                hidx_count_in_response = response_text.count('"hidx"')
+                logging.info(f"API 응답에서 발견된 hidx 개수: {hidx_count_in_response}, 요청한 매물 수: {batch_size}")
+
+                break
+            else:
+                logging.warning(f"Gemini API 응답이 비어있음 (배치 {batch_number}/{total_batches}, 시도 {retry_count + 1}).")
                 retry_count += 1
-                
                 if retry_count < MAX_RETRY:
-                    if "429" in error_message or "RESOURCE_EXHAUSTED" in error_message:
-                        # 할당량 초과 시 더 긴 대기
-                        wait_time = 60 + (retry_count * 30)
-                        logging.warning(f"할당량 제한 (배치 {batch_number}/{total_batches}). {wait_time}초 후 재시도.")
-                        time.sleep(wait_time)
-                    else:
-                        wait_time = 2 ** retry_count
-                        logging.info(f"오류 후 재시도 전 {wait_time}초 대기...")
-                        time.sleep(wait_time)
-                
-        last_api_call_time_reanalyzer = time.time()
+                    wait_time = 2 ** retry_count
+                    logging.info(f"빈 응답으로 인한 재시도 전 {wait_time}초 대기...")
+                    time.sleep(wait_time)
+
+        except Exception as e:
+            error_message = str(e)
+            logging.error(f"Gemini API 호출 중 오류 (배치 {batch_number}/{total_batches}, 시도 {retry_count + 1}): {error_message}")
+            retry_count += 1
+
+            if retry_count < MAX_RETRY:
+                if "429" in error_message or "RESOURCE_EXHAUSTED" in error_message:
+                    # 할당량 초과 시 더 긴 대기
+                    wait_time = 60 + (retry_count * 30)
+                    logging.warning(f"할당량 제한 (배치 {batch_number}/{total_batches}). {wait_time}초 후 재시도.")
+                    _RATE_LIMITER_REANALYZER.cooldown(wait_time)
+                else:
+                    wait_time = 2 ** retry_count
+                    logging.info(f"오류 후 재시도 전 {wait_time}초 대기...")
+                    time.sleep(wait_time)
+    
+    return response_text, streamed_items, truncated
+
+def _reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A", total_batches="N/A", reanalyzed_hidxs=None):
+    """매물 배치를 API로 재평가하고 백분율 기반 순위 조정을 수행합니다."""
+    if not properties_batch_data:
+        logging.warning(f"재평가할 매물 데이터가 없습니다 (배치 {batch_number}/{total_batches}).")
+        return []
+
+    if not api_key:
+        logging.error(f"Google AI API 키가 없습니다 (배치 {batch_number}/{total_batches}).")
+        # API 키가 없어도 백분율 계산은 수행
+        return calculate_percentile_scores(properties_batch_data)
+    
+    # API 키에서 개행문자 및 공백 제거
+    api_key = api_key.strip()
+        
+    # hidx는 여기서 한 번만 문자열로 맞춰 두고, 이후 비교/조회에서는 그대로 사용 (한 번의 순회로 조회용 맵까지 생성)
+    initial_batch_map = {}
+    for prop in properties_batch_data:
+        hidx = prop.get('hidx')
+        if hidx is None:
+            continue
+        hidx = str(hidx)
+        prop['hidx'] = hidx
+        initial_batch_map[hidx] = prop
+    batch_hidx_list = list(initial_batch_map)
+    batch_hidx_set = initial_batch_map.keys()
+    
+    if not batch_hidx_list:
+        logging.warning(f"재평가할 매물 데이터에 유효한 hidx가 없습니다 (배치 {batch_number}/{total_batches}).")
+        return calculate_percentile_scores(properties_batch_data)
+
+    logging.info(f"Gemini API 배치 재평가 시작 (배치 {batch_number}/{total_batches}, 모델: {GEMINI_MODEL_REANALYZER}, 매물 수: {len(properties_batch_data)})")
+    logging.info(f"현재 배치 hidx 목록: {', '.join(batch_hidx_list[:20])}{'...' if len(batch_hidx_list) > 20 else ''}")
+
+    try:
+        client = get_reanalysis_client(api_key)
+        
+        prompt_text = _build_reanalysis_prompt(properties_batch_data, batch_hidx_list)
+        response_text, streamed_items, truncated = _call_reanalysis_api(
+            client, prompt_text, len(properties_batch_data), batch_number, total_batches
+        )
         
         if not response_text:
             logging.error(f"Gemini API 응답을 받지 못함 (배치 {batch_number}/{total_batches}). 백분율 계산만 수행.")
             return calculate_percentile_scores(properties_batch_data)
+        
+        # 응답이 출력 토큰 한도에서 잘렸으면 배치를 반으로 나눠 각각 다시 재평가
+        if truncated and len(properties_batch_data) > 1:
+            mid = len(properties_batch_data) // 2
+            hidx_count_in_response = response_text.count('"hidx"')
+            logging.warning(f"재평가 응답이 잘림 (배치 {batch_number}/{total_batches}, 응답 hidx {hidx_count_in_response}/{len(properties_batch_data)}개). "
+                            f"배치를 {mid}개, {len(properties_batch_data) - mid}개로 나눠 다시 재평가합니다.")
+            first_half = _reanalyze_property_batch(properties_batch_data[:mid], api_key, f"{batch_number}a", total_batches, reanalyzed_hidxs)
+            second_half = _reanalyze_property_batch(properties_batch_data[mid:], api_key, f"{batch_number}b", total_batches, reanalyzed_hidxs)
+            return calculate_percentile_scores(first_half + second_half)
 
         # JSON 추출 및 파싱 (강화된 로직)
         try:
             json_str = None
             reanalyzed_list = None
             
-            # 1. 마크다운 JSON 블록 추출 시도
-            json_match = re.search(r"```json\s*([\s\S]*?)\s*```", response_text, re.DOTALL | re.IGNORECASE)
-            if json_match:
-                json_str = json_match.group(1).strip()
-                logging.info(f"마크다운 JSON 블록 추출 성공 (배치 {batch_number}/{total_batches})")
-            
-            # 2. 일반 마크다운 블록 추출 시도
-            if not json_str:
-                json_match = re.search(r"```\s*([\s\S]*?)\s*```", response_text, re.DOTALL)
-                if json_match:
-                    potential_json = json_match.group(1).strip()
-                    if potential_json.startswith('[') and potential_json.endswith(']'):
-                        json_str = potential_json
-                        logging.info(f"일반 마크다운 블록에서 JSON 추출 (배치 {batch_number}/{total_batches})")
-            
-            # 3. 직접 JSON 배열 찾기 (마크다운 없음)
-            if not json_str:
-                json_match = re.search(r'\[\s*\{[\s\S]*?\}\s*\]', response_text, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0).strip()
-                    logging.info(f"직접 JSON 배열 추출 (배치 {batch_number}/{total_batches})")
-            
-            # 4. 단일 객체 형태일 경우 배열로 변환
-            if not json_str:
-                json_match = re.search(r'\{\s*"hidx"\s*:\s*"([^"]+)"[^}]*\}' , response_text, re.DOTALL)
+            if streamed_items:
+                # 스트리밍 중 완성된 배열 원소를 이미 파싱했으면 텍스트 추출/수정 단계를 건너뜀
+                reanalyzed_list = streamed_items
+                logging.info(f"스트리밍 중 JSON 객체 파싱 완료 (배치 {batch_number}/{total_batches}): {len(reanalyzed_list)}개 항목")
+            else:
+                # 마크다운 JSON 블록 또는 JSON 배열을 찾아 엄격하게 파싱
+                json_match = _JSON_FENCE_RE.search(response_text)
                 if json_match:
-                    single_obj = json_match.group(0).strip()
-                    json_str = f"[{single_obj}]"
-                    logging.info(f"단일 객체를 배열로 변환 (배치 {batch_number}/{total_batches})")
-            
-            if not json_str:
-                logging.error(f"JSON 블록을 찾을 수 없음 (배치 {batch_number}/{total_batches}).")
-                logging.debug(f"원본 응답 (처음 1000자): {response_text[:1000]}")
-                return calculate_percentile_scores(properties_batch_data)
-            
-            # JSON 파싱 시도
-            try:
-                reanalyzed_list = json.loads(json_str)
-                logging.info(f"JSON 파싱 성공 (배치 {batch_number}/{total_batches}): {len(reanalyzed_list)}개 항목")
-            except json.JSONDecodeError as e:
-                logging.warning(f"JSON 파싱 실패, 수동 수정 시도 (배치 {batch_number}/{total_batches}): {e}")
-                
-                # 5. 일반적인 JSON 오류 수정
-                fixed_json = json_str
-                
-                # 후행 쉼표 제거
-                fixed_json = re.sub(r',(\s*[}\]])', r'\1', fixed_json)
-                        
-                # 속성명에 따옴표 추가
-                fixed_json = re.sub(r'(\w+):', r'"\1":', fixed_json)
-                
-                # 문자열 값 따옴표 수정
-                fixed_json = re.sub(r':\s*([^",\[\]{}]+)(?=\s*[,}\]])', r': "\1"', fixed_json)
-                
-                # 숫자는 따옴표 제거
-                fixed_json = re.sub(r':\s*"(\d+)"', r': \1', fixed_json)
-                fixed_json = re.sub(r':\s*"(\d+\.\d+)"', r': \1', fixed_json)
+                    json_str = json_match.group(1).strip()
+                else:
+                    json_match = _JSON_ARRAY_RE.search(response_text)
+                    if json_match:
+                        json_str = json_match.group(0).strip()
                 
-                try:
-                    reanalyzed_list = json.loads(fixed_json)
-                    logging.info(f"수정된 JSON 파싱 성공 (배치 {batch_number}/{total_batches})")
-                except json.JSONDecodeError as fix_e:
-                    logging.error(f"JSON 수정 후에도 파싱 실패 (배치 {batch_number}/{total_batches}): {fix_e}")
-                        
-                    # 6. 마지막 시도: 정규식으로 개별 객체 추출
+                if json_str:
                     try:
-                        logging.info(f"정규식으로 개별 객체 추출 시도 (배치 {batch_number}/{total_batches})")
-                        individual_objects = []
-                        
-                        # hidx가 포함된 객체들을 개별적으로 찾기
-                        object_pattern = r'\{\s*"hidx"\s*:\s*"([^"]+)"[^}]*\}'
-                        matches = re.finditer(object_pattern, response_text, re.DOTALL)
-                        
-                        for match in matches:
-                            obj_str = match.group(0)
-                            try:
-                                obj = json.loads(obj_str)
-                                individual_objects.append(obj)
-                            except:
-                                # 개별 객체도 파싱 실패하면 기본값 생성
-                                hidx = match.group(1)
-                                individual_objects.append({
-                                    "hidx": hidx,
-                                    "total_score": 50,
-                                    "reanalysis_comment": "JSON 파싱 실패로 기본값 사용"
-                                })
-                        
-                        if individual_objects:
-                            reanalyzed_list = individual_objects
-                            logging.info(f"정규식으로 {len(individual_objects)}개 객체 추출 성공")
-                        else:
-                            logging.error(f"모든 JSON 파싱 시도 실패 (배치 {batch_number}/{total_batches})")
-                            return calculate_percentile_scores(properties_batch_data)
-                    except Exception as regex_e:
-                        logging.error(f"정규식 추출도 실패 (배치 {batch_number}/{total_batches}): {regex_e}")
+                        reanalyzed_list = orjson.loads(json_str)
+                        logging.info(f"JSON 파싱 성공 (배치 {batch_number}/{total_batches}): {len(reanalyzed_list)}개 항목")
+                    except orjson.JSONDecodeError as e:
+                        logging.warning(f"JSON 파싱 실패, json_repair로 복구 시도 (배치 {batch_number}/{total_batches}): {e}")
+                
+                if reanalyzed_list is None:
+                    # 후행 쉼표, 따옴표 누락, 잘린 응답, 마크다운 감싸기 등을 한 번에 복구
+                    repaired = json_repair.loads(response_text)
+                    if isinstance(repaired, dict):
+                        repaired = [repaired]
+                    if not isinstance(repaired, list) or not repaired:
+                        logging.error(f"JSON 복구 실패 (배치 {batch_number}/{total_batches}).")
+                        logging.debug(f"원본 응답 (처음 1000자): {response_text[:1000]}")
                         return calculate_percentile_scores(properties_batch_data)
+                    reanalyzed_list = [item for item in repaired if isinstance(item, dict)]
+                    logging.info(f"json_repair로 JSON 복구 성공 (배치 {batch_number}/{total_batches}): {len(reanalyzed_list)}개 항목")
             
             # 결과 검증 및 병합 (강화된 로직)
-            initial_batch_map = {str(prop['hidx']): prop for prop in properties_batch_data if 'hidx' in prop}
             final_properties = []
             processed_hidxs = set()
+            converged_items = {}  # 캐시에 저장할 수렴한 결과 (병합 후 한 트랜잭션으로 저장)
             
             logging.info(f"초기 배치 매물 수: {len(initial_batch_map)}, API 응답 항목 수: {len(reanalyzed_list)}")
             
             for item in reanalyzed_list:
-                hidx = str(item.get('hidx', ''))
+                hidx = item.get('hidx', '')
+                if not isinstance(hidx, str):  # 모델이 따옴표 없이 숫자로 돌려준 경우만 변환
+                    hidx = str(hidx)
                 logging.debug(f"처리 중인 hidx: {hidx}")
                 
                 if hidx in batch_hidx_set and hidx not in processed_hidxs:
                     if hidx in initial_batch_map:
-                        # 점수 정수 변환
-                        for key in ['total_score']:
-                            if key in item:
-                                try:
-                                    item[key] = int(float(item[key]))
-                                except (ValueError, TypeError):
-                                    logging.warning(f"hidx {hidx}의 {key} 값 변환 실패: {item[key]}")
+                        # 점수 정수 변환 (변환할 수 없는 값은 그대로 두고 경고)
+                        if 'total_score' in item:
+                            score = _to_int(item['total_score'])
+                            if score is None:
+                                logging.warning(f"hidx {hidx}의 total_score 값 변환 실패: {item['total_score']}")
+                            else:
+                                item['total_score'] = score
                         
-                        for category in ['location_accessibility', 'building_quality', 'living_convenience', 'price_value']:
-                            if category in item and isinstance(item[category], dict):
-                                for sub_key in item[category]:
-                                    if 'total' in sub_key or 'score' in sub_key:
-                                        try:
-                                            item[category][sub_key] = int(float(item[category][sub_key]))
-                                        except (ValueError, TypeError):
-                                            logging.warning(f"hidx {hidx}의 {category}.{sub_key} 값 변환 실패: {item[category][sub_key]}")
+                        for category in _SCORE_CATEGORIES:
+                            values = item.get(category)
+                            if not isinstance(values, dict):
+                                continue
+                            for sub_key, value in values.items():
+                                if 'total' in sub_key or 'score' in sub_key:
+                                    score = _to_int(value)
+                                    if score is None:
+                                        logging.warning(f"hidx {hidx}의 {category}.{sub_key} 값 변환 실패: {value}")
+                                    else:
+                                        values[sub_key] = score
+                        
+                        # 점수 변화가 수렴 임계값 미만이면 같은 입력에 대해 재사용할 수 있도록 캐시
+                        cache_key = _reanalysis_cache_key(initial_batch_map[hidx])
+                        score_change = _score_change(initial_batch_map[hidx].get('total_score'), item.get('total_score'))
+                        if cache_key and score_change is not None and score_change < CONVERGENCE_THRESHOLD:
+                            converged_items[cache_key] = item
                         
                         initial_batch_map[hidx].update(item)
                         final_properties.append(initial_batch_map[hidx])
@@ -394,6 +566,11 @@ def reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A",
             if missing_count > 0:
                 logging.warning(f"총 {missing_count}개 매물이 API 응답에서 누락됨")
             
+            if converged_items:
+                _get_reanalysis_cache().put_many(converged_items)
+            if reanalyzed_hidxs is not None:
+                reanalyzed_hidxs.update(processed_hidxs)
+            
             # 백분율 점수 계산
             final_properties = calculate_percentile_scores(final_properties)
             
@@ -410,6 +587,45 @@ def reanalyze_property_batch(properties_batch_data, api_key, batch_number="N/A",
         logging.exception("상세 예외 정보:")
         return calculate_percentile_scores(properties_batch_data)
 
+def reanalyze_property_batches(batches, api_key, max_workers=MAX_CONCURRENT_REANALYSES, batch_label_prefix="", reanalyzed_hidxs=None):
+    """
+    여러 재평가 배치를 스레드 풀에서 동시에 재평가합니다.
+    호출 간격과 할당량 초과 시 대기는 공유 속도 제한기가 모든 스레드에 걸쳐 맞춥니다.
+    
+    Args:
+        batches (iterable): 매물 데이터 리스트들 (배치 단위, 제너레이터도 가능)
+        api_key (str): Google AI API 키
+        max_workers (int): 동시에 요청할 최대 배치 수
+        batch_label_prefix (str): 로그의 배치 번호 앞에 붙일 문자열 (예: 라운드 번호 "2-")
+        reanalyzed_hidxs (set, optional): 새 점수를 받은 매물의 hidx를 모을 집합 (measure_convergence에 전달)
+        
+    Returns:
+        list: 입력 배치 순서와 같은 순서의 재평가 결과 리스트 (결과를 받지 못한 배치는 원본 데이터)
+    """
+    batches = [batch for batch in batches if batch]
+    if not batches:
+        return []
+    
+    total_batches = f"{batch_label_prefix}{len(batches)}"
+    
+    def reanalyze_one(numbered_batch):
+        batch_number, batch = numbered_batch
+        batch_number = f"{batch_label_prefix}{batch_number}"
+        logging.info(f"재평가 배치 {batch_number}/{total_batches} 처리 중 ({len(batch)}개 매물)")
+        try:
+            result = reanalyze_property_batch(batch, api_key, batch_number=batch_number, total_batches=total_batches,
+                                              reanalyzed_hidxs=reanalyzed_hidxs)
+        except Exception as e:
+            logging.error(f"재평가 배치 {batch_number}/{total_batches} 처리 중 오류: {e}")
+            result = None
+        if not result:
+            logging.warning(f"재평가 배치 {batch_number}/{total_batches}에서 결과를 받지 못했습니다. 해당 배치 원본 데이터 사용.")
+            return batch
+        return result
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        return list(executor.map(reanalyze_one, enumerate(batches, 1)))
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
@@ -433,9 +649,9 @@ if __name__ == "__main__":
     api_key_env = os.getenv("GEMINI_API_KEY")
     if api_key_env:
         result = reanalyze_property_batch(sample_properties, api_key_env, "1", "1")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     else:
         logging.warning("GEMINI_API_KEY 환경변수가 설정되지 않았습니다.")
         result = calculate_percentile_scores(sample_properties)
         print("백분율 계산 결과:")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
@@ -1,56 +1,190 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+import lxml.html
+from lxml import etree
 import logging
+import os
 import re
-import json
+import html
+import orjson
+import concurrent.futures
+import threading
+import functools
+from types import MappingProxyType
+from file_cache import make_cache_key, load_bytes, save_bytes
+
+logger = logging.getLogger(__name__)
 
 DETAIL_PAGE_BASE_URL = "https://www.peterpanz.com/house/{hidx}"
+# 상세 페이지용 lxml HTML 파서 설정 (페이지가 UTF-8이므로 인코딩 추측 없이 바로 디코딩, 주석은 트리에 넣지 않음)
+HTML_PARSER_OPTIONS = {'encoding': 'utf-8', 'remove_comments': True}
+_thread_local = threading.local()  # 파서 인스턴스는 스레드마다 따로 사용 (같은 파서를 여러 스레드가 쓰면 파싱이 직렬화됨)
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36',
     'Accept-Language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': ACCEPT_ENCODING,  # urllib3가 해제할 수 있는 압축 방식만 요청 (brotli 설치 시 br 포함)
 }
+REQUEST_TIMEOUT = (3.05, 10)  # (연결, 읽기) 타임아웃(초)
+
+# 페이지 <script> 안의 'var aptInfo = {...};' JSON (HTML 원문 바이트에서 바로 검색)
+_APT_INFO_RE = re.compile(rb'var\s+aptInfo\s*=\s*(\{.*?\})\s*;', re.DOTALL)
+
+# <head>의 og meta 태그를 트리 검색 없이 찾기 위한 정규식 (속성 순서와 무관하게 매칭)
+_OG_META_PROPERTIES = ('og:latitude', 'og:longitude', 'og:title', 'og:description')
+_META_TAG_RE = re.compile(rb'<meta\s[^>]*>', re.IGNORECASE)
+_META_ATTR_RE = re.compile(rb'([\w:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+
+# 상세 설명/층수 정리용 정규식 (모듈 로드 시 한 번만 컴파일)
+_RE_WS = re.compile(r'[\s\u200b]+')  # 공백 + ZWSP 연속 구간 (ZWJ는 제외)
+_RE_DIGITS = re.compile(r'\d+', re.ASCII)
+_BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def _has_class(cls):
+    """요소의 class 속성에 cls가 (공백으로 구분된 단어로) 들어 있는지 확인하는 XPath 조건식"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+# 자주 쓰는 XPath (lxml로 모듈 로드 시 한 번만 컴파일, 호출마다 경로 문자열을 다시 해석하지 않음)
+_XP_META = etree.XPath("//meta[starts-with(@property, 'og:')]")
+_XP_SELLER_INFO = etree.XPath(f"//*[{_has_class('info-section')} and {_has_class('section-4')}]")
+_XP_PROFILE_NAME = etree.XPath(f".//*[{_has_class('profile-info')}]//strong")
+_XP_PROFILE_TYPE = etree.XPath(f".//*[{_has_class('profile-info')}]//em")
+_XP_AGENCY_SECTION = etree.XPath(f"//div/p[{_has_class('agency-name')}]")
+_XP_AGENCY_NAME = etree.XPath(f".//p[{_has_class('agency-name')}]")
+_XP_AGENCY_INFO_UL = etree.XPath(f".//*[{_has_class('agency-info')}]//ul")
+_XP_LI = etree.XPath(".//li")
+_XP_SPAN_TH = etree.XPath(f".//span[{_has_class('th')}]")
+_XP_SPAN_TD = etree.XPath(f".//span[{_has_class('td')}]")
+_XP_AGENT_FALLBACK = etree.XPath(
+    f"//*[{_has_class('agent-info')} or {_has_class('broker-info')} or {_has_class('realtor-info')}]"
+)
+_XP_AGENT_FALLBACK_NAME = etree.XPath(f".//*[{_has_class('agent-name')} or {_has_class('name')} or self::strong]")
+_XP_AGENT_FALLBACK_CONTACT = etree.XPath(
+    f".//*[{_has_class('agent-contact')} or {_has_class('contact')} or {_has_class('phone')}]"
+)
+_XP_AGENT_FALLBACK_OFFICE = etree.XPath(
+    f".//*[{_has_class('agent-office')} or {_has_class('office')} or {_has_class('company')}]"
+)
+_XP_OPTION_DD = etree.XPath(".//dl//dd")
+_XP_OPTION_ITEMS = etree.XPath(f".//*[self::li or {_has_class('option-item')}]")
+_XP_TR = etree.XPath(".//tr")
+_XP_TABLE_CELLS = etree.XPath(".//*[self::td or self::th]")
+_XP_CONTAINER_ITEMS = etree.XPath(f".//*[self::li or {_has_class('item')} or self::span or self::div]")
+_XP_DETAIL_TH = etree.XPath(f"//div[{_has_class('detail-table-th')}]")
+_XP_DETAIL_TD = etree.XPath(f"following-sibling::div[{_has_class('detail-table-td')}][1]")
+_XP_DESCRIPTION = etree.XPath("//div[@id='description-text']")
+
+# 옵션 영역 후보 (우선순위: detail-option-table > option-section 류 > option-table 류 > 일반 컨테이너)
+_OPTION_CONTAINER_CLASSES = ('options', 'facility', 'amenities', 'option-list', 'option-items')
+_XP_OPTION_SECTIONS = etree.XPath('//*[{}]'.format(' or '.join(
+    _has_class(cls) for cls in
+    ('detail-option-table', 'option-section', 'facility-section', 'additional-option', 'option-table')
+    + _OPTION_CONTAINER_CLASSES
+)))
+
+# 상세 표에서 찾을 항목명 (항목명 칸 텍스트에 포함되어 있으면 일치)
+_DETAIL_TABLE_LABELS = ('사용승인일', '해당층/전체층')
+
+# 상세 페이지 HTML 디스크 캐시 설정 (디렉토리를 지정한 경우에만 사용, 재실행 시 이미 받은 페이지 요청 생략)
+DETAIL_PAGE_CACHE_DIR = os.getenv('PETERPANZ_DETAIL_CACHE_DIR')
+DETAIL_PAGE_CACHE_TTL_SEC = float(os.getenv('PETERPANZ_DETAIL_CACHE_TTL_SEC', 60 * 60))
+
+# 프로세스 안에서 캐시할 상세 페이지 파싱 결과 수 (재시도/중복 매물은 다시 요청하지 않음)
+DETAIL_CACHE_SIZE = 4096
+
+# 여러 상세 페이지를 동시에 파싱할 때 기본 최대 작업자 수 (세션 커넥션 풀 크기 이하로 유지)
+MAX_WORKERS_DETAIL_FETCH = 16
+
+# 상세 페이지 요청 간 TCP/TLS 연결을 재사용하기 위한 세션 (keep-alive + 커넥션 풀, 여러 스레드에서 공유)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+def _parse_html_tree(html_bytes):
+    """HTML 원문(바이트)을 lxml 트리로 파싱합니다. 현재 스레드의 파서를 재사용합니다."""
+    parser = getattr(_thread_local, 'html_parser', None)
+    if parser is None:
+        parser = _thread_local.html_parser = lxml.html.HTMLParser(**HTML_PARSER_OPTIONS)
+    return lxml.html.fromstring(html_bytes, parser=parser)
+
+def _first(xpath, node):
+    """컴파일된 XPath로 node에서 처음 찾은 요소를 반환합니다 (없으면 None)."""
+    found = xpath(node)
+    return found[0] if found else None
 
-def _extract_apt_info_json(soup):
-    """HTML 내부의 <script> 태그에서 aptInfo JSON 데이터를 추출합니다."""
+def _extract_apt_info_json(html_bytes):
+    """HTML 원문(바이트)에서 aptInfo JSON 데이터를 추출합니다. <script> 태그를 순회하지 않고 정규식 한 번으로 찾습니다."""
     try:
-        script_tags = soup.find_all("script")
-        for script in script_tags:
-            if script.string and "var aptInfo = {" in script.string:
-                # 'var aptInfo = ' 부분을 제거하고, 세미콜론까지 잘라냄
-                json_str = script.string.split("var aptInfo = ", 1)[1]
-                json_str = json_str.rsplit("};", 1)[0] + "}" # 끝의 세미콜론과 불필요한 부분 제거
-                apt_info = json.loads(json_str)
-                logging.info("aptInfo JSON 데이터 추출 성공")
-                return apt_info
+        match = _APT_INFO_RE.search(html_bytes)
+        if match:
+            apt_info = orjson.loads(match.group(1))  # 바이트를 그대로 넘김 (디코딩 없이 파싱)
+            logger.info("aptInfo JSON 데이터 추출 성공")
+            return apt_info
     except Exception as e:
-        logging.warning(f"aptInfo JSON 추출 또는 파싱 실패: {e}")
+        logger.warning("aptInfo JSON 추출 또는 파싱 실패: %s", e)
     return None
 
-def _extract_meta_tags(soup):
-    """HTML의 meta 태그에서 위경도와 기타 메타 데이터를 추출합니다."""
+def _whitespace_replacement(match):
+    """_RE_WS로 찾은 공백 구간을 줄바꿈이 있으면 줄바꿈 하나로, 없으면 스페이스 하나로 바꿉니다."""
+    return '\n' if '\n' in match.group(0) else ' '
+
+def _clean_description(raw: str) -> str:
+    """
+    매물 설명 텍스트의 공백을 정리합니다 (HTML 설명과 aptInfo 설명 공통).
+    공백/ZWSP 구간은 줄바꿈이 있으면 줄바꿈 하나, 없으면 스페이스 하나로 바꾸고 ZWJ는 유지합니다.
+    """
+    return _RE_WS.sub(_whitespace_replacement, raw).strip()
+
+def _find_og_meta_contents(html_bytes):
+    """<head> 영역의 og:latitude/longitude/title/description meta 태그 content 값을 정규식으로 찾습니다."""
+    head_end = html_bytes.find(b'</head>')
+    head = html_bytes[:head_end] if head_end != -1 else html_bytes
+    contents = {}
+    for tag_match in _META_TAG_RE.finditer(head):
+        attrs = {name.lower(): value for name, _, value in _META_ATTR_RE.findall(tag_match.group(0))}
+        og_property = attrs.get(b'property', b'').decode('utf-8', 'replace')
+        if og_property in _OG_META_PROPERTIES and og_property not in contents and b'content' in attrs:
+            contents[og_property] = {'content': html.unescape(attrs[b'content'].decode('utf-8', 'replace'))}
+    return contents
+
+def _extract_meta_tags(tree, html_bytes=None):
+    """HTML의 meta 태그에서 위경도와 기타 메타 데이터를 추출합니다. 원문 바이트가 있으면 정규식으로 먼저 찾습니다."""
     meta_data = {}
     
+    # 정규식으로 찾지 못한 경우에만 파싱된 트리에서 검색
+    og_metas = _find_og_meta_contents(html_bytes) if html_bytes else {}
+    if not og_metas:
+        og_metas = {}
+        for meta in _XP_META(tree):
+            og_metas.setdefault(meta.get('property'), {'content': meta.get('content')})
+    
     # 위도, 경도 정보 (og:latitude, og:longitude)
-    latitude_meta = soup.find('meta', property='og:latitude')
-    longitude_meta = soup.find('meta', property='og:longitude')
+    latitude_meta = og_metas.get('og:latitude')
+    longitude_meta = og_metas.get('og:longitude')
     
     if latitude_meta and latitude_meta.get('content'):
         try:
             meta_data['latitude'] = float(latitude_meta['content'])
-            logging.info(f"  위도 (HTML meta): {meta_data['latitude']}")
+            logger.info("  위도 (HTML meta): %s", meta_data['latitude'])
         except (ValueError, TypeError):
-            logging.warning(f"위도 변환 실패: {latitude_meta['content']}")
+            logger.warning("위도 변환 실패: %s", latitude_meta['content'])
     
     if longitude_meta and longitude_meta.get('content'):
         try:
             meta_data['longitude'] = float(longitude_meta['content'])
-            logging.info(f"  경도 (HTML meta): {meta_data['longitude']}")
+            logger.info("  경도 (HTML meta): %s", meta_data['longitude'])
         except (ValueError, TypeError):
-            logging.warning(f"경도 변환 실패: {longitude_meta['content']}")
+            logger.warning("경도 변환 실패: %s", longitude_meta['content'])
     
     # 기타 메타 데이터 추출 (title, description 등)
-    title_meta = soup.find('meta', property='og:title')
-    desc_meta = soup.find('meta', property='og:description')
+    title_meta = og_metas.get('og:title')
+    desc_meta = og_metas.get('og:description')
     
     if title_meta and title_meta.get('content'):
         meta_data['title'] = title_meta['content']
@@ -60,7 +194,7 @@ def _extract_meta_tags(soup):
     
     return meta_data
 
-def _extract_agent_info(soup, apt_info=None, property_hidx=None):
+def _extract_agent_info(tree, apt_info=None, property_hidx=None):
     """매물 등록자 정보(중개사 또는 직거래 판매자)를 추출합니다."""
     agent_info = {
         'name': None,
@@ -80,49 +214,44 @@ def _extract_agent_info(soup, apt_info=None, property_hidx=None):
         
         if agent_info['user_type'] == '중개사':
             # 중개사 정보 (agent_name, agent_contact, company_name 등이 있을 수 있음)
-            for key in ['agent_name', 'agent_contact', 'company_name', 'phone']:
-                if apt_info.get(key):
-                    if 'name' in key:
-                        agent_info['name'] = apt_info[key]
-                    elif 'contact' in key or 'phone' in key:
-                        agent_info['contact'] = apt_info[key]
-                    elif 'company' in key or 'office' in key:
-                        agent_info['office'] = apt_info[key]
+            # 뒤에 확인하던 키가 앞의 키를 덮어쓰던 기존 순서 유지: company_name > agent_name, phone > agent_contact
+            agent_info['name'] = apt_info.get('company_name') or apt_info.get('agent_name') or None
+            agent_info['contact'] = apt_info.get('phone') or apt_info.get('agent_contact') or None
         else: # '세입자' 또는 user_type_from_apt가 None일 경우 포함
             # 직거래 판매자 정보
-            agent_info['name'] = apt_info.get('user_name', apt_info.get('author_name'))
-            agent_info['contact'] = apt_info.get('user_phone', apt_info.get('phone'))
+            agent_info['name'] = apt_info.get('user_name') or apt_info.get('author_name')
+            agent_info['contact'] = apt_info.get('user_phone') or apt_info.get('phone')
             
             # aptInfo 구조 내 다른 필드도 확인
-            if agent_info['name'] is None and apt_info.get('author'):
+            if agent_info['name'] is None:
                 auth_data = apt_info.get('author')
-                if isinstance(auth_data, dict):
+                if auth_data and isinstance(auth_data, dict):
                     agent_info['name'] = auth_data.get('name')
     
     # 2. HTML 측면 영역(Sidebar)에서 중개사/판매자 정보 추출 (우선순위 2 - aptInfo에 없을 경우)
     if agent_info['name'] is None or agent_info['contact'] is None:
         try:
             # 판매자 정보 영역
-            seller_info_div = soup.select_one('.info-section.section-4')
-            if seller_info_div:
+            seller_info_div = _first(_XP_SELLER_INFO, tree)
+            if seller_info_div is not None:
                 # 이름
-                name_elem = seller_info_div.select_one('.profile-info strong')
-                if name_elem:
-                    agent_info['name'] = name_elem.text.strip()
-                    logging.info(f"  직거래 판매자 이름 (HTML Sidebar): {agent_info['name']}")
+                name_elem = _first(_XP_PROFILE_NAME, seller_info_div)
+                if name_elem is not None:
+                    agent_info['name'] = name_elem.text_content().strip()
+                    logger.info("  직거래 판매자 이름 (HTML Sidebar): %s", agent_info['name'])
                 
                 # 유형 (임대인, 임차인 등)
-                type_elem = seller_info_div.select_one('.profile-info em')
-                if type_elem:
-                    agent_info['user_detail'] = type_elem.text.strip()
-                    logging.info(f"  직거래 판매자 구분 (HTML Sidebar): {agent_info['user_detail']}")
+                type_elem = _first(_XP_PROFILE_TYPE, seller_info_div)
+                if type_elem is not None:
+                    agent_info['user_detail'] = type_elem.text_content().strip()
+                    logger.info("  직거래 판매자 구분 (HTML Sidebar): %s", agent_info['user_detail'])
                     
                     # 유형이 있다면 일반적으로 직거래(세입자)임
                     if agent_info['user_type'] is None:
                         agent_info['user_type'] = '세입자'
         
         except Exception as e:
-            logging.warning(f"HTML에서 판매자 정보 추출 중 오류: {e}")
+            logger.warning("HTML에서 판매자 정보 추출 중 오류: %s", e)
     
     # 3. 중개사 정보 전용 영역에서 추출 (우선순위 3)
     # user_type이 명시적으로 '중개사'이거나, 아직 결정되지 않았고, 이름이나 사무실 정보가 없을 때
@@ -130,62 +259,62 @@ def _extract_agent_info(soup, apt_info=None, property_hidx=None):
        (agent_info['name'] is None or agent_info['office'] is None):
         try:
             # 중개사 정보 영역 (제공된 HTML 구조 기반)
-            agent_section = soup.select_one('div > p.agency-name') 
-            if agent_section: # p.agency-name 태그의 부모 div를 agent_section으로 간주
-                agent_section_container = agent_section.parent
+            agent_section = _first(_XP_AGENCY_SECTION, tree)
+            if agent_section is not None: # p.agency-name 태그의 부모 div를 agent_section으로 간주
+                agent_section_container = agent_section.getparent()
 
                 # 사무소명
-                office_name_elem = agent_section_container.select_one('p.agency-name')
-                if office_name_elem:
-                    agent_info['office'] = office_name_elem.text.strip()
-                    logging.info(f"  중개사무소명 (HTML) 찾음: {agent_info['office']}")
+                office_name_elem = _first(_XP_AGENCY_NAME, agent_section_container)
+                if office_name_elem is not None:
+                    agent_info['office'] = office_name_elem.text_content().strip()
+                    logger.info("  중개사무소명 (HTML) 찾음: %s", agent_info['office'])
 
                 # 대표자 및 대표번호
-                agency_info_ul = agent_section_container.select_one('.agency-info ul')
-                if agency_info_ul:
-                    list_items = agency_info_ul.select('li')
+                agency_info_ul = _first(_XP_AGENCY_INFO_UL, agent_section_container)
+                if agency_info_ul is not None:
+                    list_items = _XP_LI(agency_info_ul)
                     for item in list_items:
-                        th_span = item.select_one('span.th')
-                        td_span = item.select_one('span.td')
-                        if th_span and td_span:
-                            th_text = th_span.text.strip()
-                            td_text = td_span.text.strip()
+                        th_span = _first(_XP_SPAN_TH, item)
+                        td_span = _first(_XP_SPAN_TD, item)
+                        if th_span is not None and td_span is not None:
+                            th_text = th_span.text_content().strip()
+                            td_text = td_span.text_content().strip()
                             if th_text == '대표자':
                                 agent_info['name'] = td_text
-                                logging.info(f"  중개사 대표자명 (HTML) 찾음: {agent_info['name']}")
+                                logger.info("  중개사 대표자명 (HTML) 찾음: %s", agent_info['name'])
                             elif th_text == '대표번호':
                                 agent_info['contact'] = td_text
-                                logging.info(f"  중개사 대표번호 (HTML) 찾음: {agent_info['contact']}")
+                                logger.info("  중개사 대표번호 (HTML) 찾음: %s", agent_info['contact'])
                 
                 # 중개사 정보가 있으면 user_type을 '중개사'로 설정
                 if agent_info['name'] or agent_info['office']:
                     agent_info['user_type'] = '중개사'
                 else: # 기존 .agent-info 등 클래스 기반 탐색
-                    agent_section_fallback = soup.select_one('.agent-info, .broker-info, .realtor-info')
-                    if agent_section_fallback:
-                        agent_name_elem = agent_section_fallback.select_one('.agent-name, .name, strong')
-                        if agent_name_elem:
-                            agent_info['name'] = agent_name_elem.text.strip()
-                            logging.info(f"  중개사 이름 (HTML fallback) 찾음: {agent_info['name']}")
+                    agent_section_fallback = _first(_XP_AGENT_FALLBACK, tree)
+                    if agent_section_fallback is not None:
+                        agent_name_elem = _first(_XP_AGENT_FALLBACK_NAME, agent_section_fallback)
+                        if agent_name_elem is not None:
+                            agent_info['name'] = agent_name_elem.text_content().strip()
+                            logger.info("  중개사 이름 (HTML fallback) 찾음: %s", agent_info['name'])
                         
-                        agent_contact_elem = agent_section_fallback.select_one('.agent-contact, .contact, .phone')
-                        if agent_contact_elem:
-                            agent_info['contact'] = agent_contact_elem.text.strip()
-                            logging.info(f"  중개사 연락처 (HTML fallback) 찾음: {agent_info['contact']}")
+                        agent_contact_elem = _first(_XP_AGENT_FALLBACK_CONTACT, agent_section_fallback)
+                        if agent_contact_elem is not None:
+                            agent_info['contact'] = agent_contact_elem.text_content().strip()
+                            logger.info("  중개사 연락처 (HTML fallback) 찾음: %s", agent_info['contact'])
                         
-                        agent_office_elem = agent_section_fallback.select_one('.agent-office, .office, .company')
-                        if agent_office_elem:
-                            agent_info['office'] = agent_office_elem.text.strip()
-                            logging.info(f"  중개사무소명 (HTML fallback) 찾음: {agent_info['office']}")
+                        agent_office_elem = _first(_XP_AGENT_FALLBACK_OFFICE, agent_section_fallback)
+                        if agent_office_elem is not None:
+                            agent_info['office'] = agent_office_elem.text_content().strip()
+                            logger.info("  중개사무소명 (HTML fallback) 찾음: %s", agent_info['office'])
 
                         if agent_info['name'] or agent_info['office']:
                              agent_info['user_type'] = '중개사'
 
             if not (agent_info['name'] or agent_info['office'] or agent_info['contact']): # 위에서 못찾았으면 fallback
-                logging.warning(f"  중개사 정보 (HTML)를 새로운 구조 또는 fallback에서 찾을 수 없습니다 {f'(hidx: {property_hidx})' if property_hidx else ''}")
+                logger.warning("  중개사 정보 (HTML)를 새로운 구조 또는 fallback에서 찾을 수 없습니다 %s", f'(hidx: {property_hidx})' if property_hidx else '')
 
         except Exception as e:
-            logging.warning(f"HTML에서 중개사 정보 추출 중 오류: {e}")
+            logger.warning("HTML에서 중개사 정보 추출 중 오류: %s", e)
     
     # 사용자 유형이 아직 None이면 '정보 없음'으로 설정
     if agent_info['user_type'] is None:
@@ -193,97 +322,198 @@ def _extract_agent_info(soup, apt_info=None, property_hidx=None):
         
     return agent_info
 
-def _extract_options(soup, property_hidx=None):
+def _classify_option_sections(tree):
+    """
+    옵션 영역 후보를 합친 XPath로 문서에서 한 번만 찾은 뒤, 영역 종류별로 나눕니다.
+    
+    Returns:
+        dict: {영역 종류: 문서 순서대로의 요소 리스트}
+    """
+    sections = {'detail-option-table': [], 'option-section': [], 'option-table': [], 'container': []}
+    for element in _XP_OPTION_SECTIONS(tree):
+        classes = (element.get('class') or '').split()
+        if 'detail-option-table' in classes:
+            sections['detail-option-table'].append(element)
+        if any(cls in classes for cls in ('option-section', 'facility-section', 'additional-option')):
+            sections['option-section'].append(element)
+        if 'option-table' in classes or (element.tag == 'table' and 'options' in classes):
+            sections['option-table'].append(element)
+        if any(cls in classes for cls in _OPTION_CONTAINER_CLASSES):
+            sections['container'].append(element)
+    return sections
+
+def _extract_options(tree, property_hidx=None):
     """매물의 옵션 정보를 추출합니다."""
     options = []
     
     try:
+        sections = _classify_option_sections(tree)
+        
         # 옵션 정보 추출 시도 1: detail-option-table 클래스 (실제 사이트 구조에 맞춤)
-        option_table = soup.select_one('.detail-option-table')
-        if option_table:
+        if sections['detail-option-table']:
+            option_table = sections['detail-option-table'][0]
             # DD 태그에 옵션 텍스트가 있음
-            option_items = option_table.select('dl dd')
+            option_items = _XP_OPTION_DD(option_table)
             for item in option_items:
-                option_text = item.text.strip()
+                option_text = item.text_content().strip()
                 if option_text:
                     options.append(option_text)
-            logging.info(f"  옵션 {len(options)}개 추출 성공 (detail-option-table): {', '.join(options)}")
+            logger.info("  옵션 %s개 추출 성공 (detail-option-table): %s", len(options), ', '.join(options))
             return options
             
         # 옵션 정보 추출 시도 2: 기존 방식
-        option_section = soup.select_one('.option-section, .facility-section, .additional-option')
-        if option_section:
+        if sections['option-section']:
+            option_section = sections['option-section'][0]
             # 옵션 항목들 추출
-            option_items = option_section.select('li, .option-item')
+            option_items = _XP_OPTION_ITEMS(option_section)
             for item in option_items:
-                option_text = item.text.strip()
+                option_text = item.text_content().strip()
                 if option_text:
                     options.append(option_text)
-            logging.info(f"  옵션 {len(options)}개 추출 성공 (option-section): {', '.join(options)}")
+            logger.info("  옵션 %s개 추출 성공 (option-section): %s", len(options), ', '.join(options))
             return options
             
         # 옵션 정보 추출 시도 3: 테이블 형식
-        option_table = soup.select_one('.option-table, table.options')
-        if option_table:
-            rows = option_table.select('tr')
+        if sections['option-table']:
+            option_table = sections['option-table'][0]
+            rows = _XP_TR(option_table)
             for row in rows:
-                cols = row.select('td, th')
+                cols = _XP_TABLE_CELLS(row)
                 for col in cols:
-                    option_text = col.text.strip()
+                    option_text = col.text_content().strip()
                     if option_text and option_text not in ["옵션", "시설", "기타"]:
                         options.append(option_text)
             
             if options:
-                logging.info(f"  옵션 {len(options)}개 추출 성공 (option-table): {', '.join(options)}")
+                logger.info("  옵션 %s개 추출 성공 (option-table): %s", len(options), ', '.join(options))
                 return options
         
         # 추가적인 시도: 다른 일반적인 옵션 컨테이너 찾기
-        option_containers = soup.select('.options, .facility, .amenities, .option-list, .option-items')
-        for container in option_containers:
-            items = container.select('li, .item, span, div')
+        for container in sections['container']:
+            items = _XP_CONTAINER_ITEMS(container)
             for item in items:
-                option_text = item.text.strip()
+                option_text = item.text_content().strip()
                 if option_text and len(option_text) < 50:  # 텍스트가 너무 길지 않은 경우만 추출
                     options.append(option_text)
             
             if options:
-                logging.info(f"  옵션 {len(options)}개 추출 성공 (추가 컨테이너): {', '.join(options)}")
+                logger.info("  옵션 %s개 추출 성공 (추가 컨테이너): %s", len(options), ', '.join(options))
                 return options
                 
-        logging.info(f"  옵션 (HTML) 섹션을 찾을 수 없습니다 {f'(hidx: {property_hidx})' if property_hidx else ''}")
+        logger.info("  옵션 (HTML) 섹션을 찾을 수 없습니다 %s", f'(hidx: {property_hidx})' if property_hidx else '')
     except Exception as e:
-        logging.warning(f"옵션 정보 추출 중 오류: {e}")
+        logger.warning("옵션 정보 추출 중 오류: %s", e)
     
     return options
 
+def _find_detail_table_cells(tree):
+    """
+    상세 표(div.detail-table-th / div.detail-table-td)를 한 번 순회해 _DETAIL_TABLE_LABELS 항목의 값 칸을 찾습니다.
+    
+    Returns:
+        dict: {항목명: 값 칸 태그 (없으면 None)} (항목명 칸을 찾은 항목만 포함, 같은 항목은 처음 나온 칸 사용)
+    """
+    cells = {}
+    for th in _XP_DETAIL_TH(tree):
+        th_text = th.text_content().strip()
+        for label in _DETAIL_TABLE_LABELS:
+            if label in th_text and label not in cells:
+                cells[label] = _first(_XP_DETAIL_TD, th)
+        if len(cells) == len(_DETAIL_TABLE_LABELS):
+            break
+    return cells
+
+def _fetch_detail_page(url):
+    """
+    상세 페이지 HTML 원문(바이트)을 가져옵니다. 디스크 캐시가 켜져 있으면 유효 시간 안의 캐시를 먼저 사용합니다.
+    요청 실패 시 requests.exceptions.RequestException을 그대로 전달합니다.
+    """
+    cache_key = make_cache_key(url) if DETAIL_PAGE_CACHE_DIR else None
+    if cache_key:
+        body = load_bytes(DETAIL_PAGE_CACHE_DIR, cache_key, max_age_sec=DETAIL_PAGE_CACHE_TTL_SEC, ext='html')
+        if body is not None:
+            logger.info("HTML 상세 페이지 캐시 사용: %s", url)
+            return body
+    
+    response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    body = response.content
+    if cache_key:
+        save_bytes(DETAIL_PAGE_CACHE_DIR, cache_key, body, ext='html')
+    return body
+
+# 진행 중인 상세 페이지 요청 (hidx -> Future, 같은 hidx 동시 요청을 하나로 합침)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+class _DetailParseFailed(Exception):
+    """상세 페이지 파싱 실패 (lru_cache가 실패 결과를 캐시하지 않도록 예외로 전달)"""
+
+@functools.lru_cache(maxsize=DETAIL_CACHE_SIZE)
+def _parse_property_details_cached(hidx):
+    parsed_data = _parse_property_details(hidx)
+    if not parsed_data:
+        raise _DetailParseFailed(hidx)
+    return MappingProxyType(parsed_data)  # 캐시된 결과가 바뀌지 않도록 읽기 전용으로 보관
+
 def parse_property_details(hidx):
     """
     매물 상세 페이지(HTML)를 파싱하여 추가 정보를 추출합니다.
+    같은 hidx의 성공한 결과는 프로세스 안에서 캐시해 다시 요청/파싱하지 않습니다 (실패는 캐시하지 않음).
+    여러 스레드가 같은 hidx를 동시에 요청하면 실제 요청은 한 번만 보내고 결과를 함께 사용합니다.
     
     Args:
         hidx (str): 매물 고유 ID
         
     Returns:
-        dict: 파싱된 상세 정보
+        dict: 파싱된 상세 정보 (호출자가 수정해도 캐시에 영향이 없는 복사본)
     """
+    hidx = str(hidx)
+    # 같은 hidx를 다른 스레드가 이미 요청 중이면 새로 요청하지 않고 그 결과를 기다림
+    with _inflight_lock:
+        future = _inflight.get(hidx)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[hidx] = concurrent.futures.Future()
+    
+    if is_owner:
+        try:
+            future.set_result(_parse_property_details_cached(hidx))
+        except _DetailParseFailed:
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _inflight_lock:
+                del _inflight[hidx]
+    
+    details = future.result()
+    return dict(details) if details is not None else {}
+
+def _parse_property_details(hidx):
+    """매물 상세 페이지를 요청하고 파싱합니다. 실패하면 빈 딕셔너리를 반환합니다."""
     url = DETAIL_PAGE_BASE_URL.format(hidx=hidx)
-    logging.info(f"HTML 상세 페이지 파싱 시작: {url}")
+    logger.info("HTML 상세 페이지 파싱 시작: %s", url)
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
+        # 원문 바이트를 한 번만 받아 두고 정규식 검색과 트리 파싱에 그대로 공유 (response.text 디코딩 없음)
+        body = _fetch_detail_page(url)
         
-        # HTML 파싱
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # HTML 파싱 (lxml 트리를 한 번만 만들고 모든 추출 함수가 공유)
+        tree = _parse_html_tree(body)
         
         # 결과를 저장할 딕셔너리
         parsed_data = {}
         
         # 1. aptInfo JSON 추출 (가장 많은 정보가 담겨있음)
-        apt_info = _extract_apt_info_json(soup)
+        apt_info = _extract_apt_info_json(body)
+        # aptInfo 안의 하위 info 블록 (딕셔너리인 경우만 사용)
+        info_block = apt_info.get('info') if apt_info else None
+        if not isinstance(info_block, dict):
+            info_block = None
         
         # 2. meta 태그에서 위경도 및 기타 메타 데이터 추출
-        meta_data = _extract_meta_tags(soup)
+        meta_data = _extract_meta_tags(tree, body)
         if meta_data:
             if 'latitude' in meta_data:
                 parsed_data['parsed_latitude'] = meta_data['latitude']
@@ -293,58 +523,35 @@ def parse_property_details(hidx):
                 parsed_data['parsed_title'] = meta_data['title']
         
         # 상세 설명 추출 (HTML #description-text 우선)
-        description_html_element = soup.select_one('div#description-text')
+        description_html_element = _first(_XP_DESCRIPTION, tree)
         final_description = None
-        if description_html_element:
-            lines = []
-            current_line_segments = []
-            # description_html_element의 자식 노드들을 직접 순회
-            for content_node in description_html_element.contents:
-                if isinstance(content_node, str):  # NavigableString (텍스트 노드)
-                    current_line_segments.append(str(content_node))
-                elif content_node.name == 'br':
-                    lines.append("".join(current_line_segments))
-                    current_line_segments = []
-                elif hasattr(content_node, 'get_text'):  # 다른 태그 (e.g., <span class="emoji">)
-                    # 태그 내부 텍스트 추출 시 ZWJ 등 유니코드 문자 보존
-                    current_line_segments.append(content_node.get_text(separator=''))
-
-            if current_line_segments:  # 마지막 줄 처리
-                lines.append("".join(current_line_segments))
-
-            description_text_raw = "\n".join(lines)
-
-            # 후속 공백 및 줄바꿈 처리
-            # 1. 유니코드 ZWSP(\u200b) 및 기타 일반 공백들을 단일 스페이스로 변환. ZWJ(\u200d)는 건드리지 않음.
-            processed_text = re.sub(r'[\s\u200b]+', ' ', description_text_raw)
-            # 2. 여러 줄바꿈 및 줄바꿈 주변의 공백 정리
-            processed_text = re.sub(r' *\n *', '\n', processed_text)
-            # 3. 문자열 양 끝의 공백 및 줄바꿈 최종 제거
-            final_description = processed_text.strip()
+        if description_html_element is not None:
+            # <br> 뒤에 줄바꿈 문자를 붙인 뒤 텍스트를 한 번에 추출 (구분자 없이 이어 붙여 ZWJ 이모지 등 유니코드 문자 보존)
+            for br_tag in description_html_element.iter('br'):
+                br_tag.tail = '\n' + (br_tag.tail or '')
+            description_text_raw = description_html_element.text_content()
+
+            final_description = _clean_description(description_text_raw)
             
-            logging.info(f"  매물 설명 (HTML #description-text, contents) 일부: {final_description[:200]}...")
+            logger.info("  매물 설명 (HTML #description-text, contents) 일부: %s...", final_description[:200])
         
         # HTML #description-text에 내용이 없거나, 해당 요소가 없는 경우 aptInfo 사용
         if not final_description and apt_info:
             description_apt = apt_info.get('description') or apt_info.get('content')
-            if not description_apt and apt_info.get('info') and isinstance(apt_info['info'], dict):
-                description_apt = apt_info['info'].get('description') or apt_info['info'].get('subject')
+            if not description_apt and info_block:
+                description_apt = info_block.get('description') or info_block.get('subject')
             
             if description_apt:
-                # apt_info에서 가져온 설명도 HTML 포함 가능성 있으므로 정리
-                temp_soup = BeautifulSoup(description_apt, 'html.parser')
-                for br_tag in temp_soup.find_all('br'):
-                    br_tag.replace_with('\n')
-                description_apt_cleaned = temp_soup.get_text(strip=True)
-                final_description = re.sub(r'[\s\u200b]+', ' ', description_apt_cleaned)
-                final_description = re.sub(r'( ?\n ?)+', '\n', final_description).strip()
-                logging.info(f"  매물 설명 (aptInfo) 일부: {final_description[:200]}...")
+                # apt_info에서 가져온 설명도 HTML 포함 가능성 있으므로 정리 (<br>은 줄바꿈, 나머지 태그는 제거, 엔티티 해제)
+                description_apt_cleaned = html.unescape(_TAG_RE.sub('', _BR_RE.sub('\n', str(description_apt))))
+                final_description = _clean_description(description_apt_cleaned)
+                logger.info("  매물 설명 (aptInfo) 일부: %s...", final_description[:200])
 
         if final_description:
             parsed_data['parsed_description'] = final_description
         elif meta_data and 'description' in meta_data: # 최후의 보루로 meta 태그 description 사용
             parsed_data['parsed_description'] = meta_data['description'].strip()
-            logging.info(f"  매물 설명 (meta tag) 일부: {meta_data['description'][:200]}...")
+            logger.info("  매물 설명 (meta tag) 일부: %s...", meta_data['description'][:200])
 
         # 3. aptInfo에서 데이터 추출 (상세 설명은 위에서 처리)
         if apt_info:
@@ -353,12 +560,12 @@ def parse_property_details(hidx):
             
             # 욕실 수
             bathroom_count = apt_info.get('bathroom_count')
-            if bathroom_count is None and apt_info.get('info') and isinstance(apt_info['info'], dict):
-                bathroom_count = apt_info['info'].get('bathroom_count')
+            if bathroom_count is None and info_block:
+                bathroom_count = info_block.get('bathroom_count')
             
             if bathroom_count:
                 parsed_data['parsed_bathroom_count'] = bathroom_count
-                logging.info(f"  욕실 수 (aptInfo): {bathroom_count}")
+                logger.info("  욕실 수 (aptInfo): %s", bathroom_count)
             
             # 사용자 타입 및 중개사/판매자 정보
             user_type_from_apt = apt_info.get('user_type')
@@ -374,14 +581,14 @@ def parse_property_details(hidx):
                 
                 if seller_name:
                     parsed_data['parsed_agent_name'] = seller_name
-                    logging.info(f"  직거래 판매자 이름 (aptInfo): {seller_name}")
+                    logger.info("  직거래 판매자 이름 (aptInfo): %s", seller_name)
                 
                 if seller_contact:
                     parsed_data['parsed_agent_contact'] = seller_contact
-                    logging.info(f"  직거래 판매자 연락처 (aptInfo): {seller_contact}")
+                    logger.info("  직거래 판매자 연락처 (aptInfo): %s", seller_contact)
             
             # 중개사 정보
-            agent_info = _extract_agent_info(soup, apt_info, hidx)
+            agent_info = _extract_agent_info(tree, apt_info, hidx)
             
             if agent_info['user_type']:
                 parsed_data['parsed_user_type'] = agent_info['user_type']
@@ -398,61 +605,80 @@ def parse_property_details(hidx):
         # 4. HTML 파싱으로 추가 정보 추출 (aptInfo에 없는 정보)
         
         # 사용승인일 정보 추출 (새로운 로직)
+        # 상세 표의 항목명(th) 칸을 한 번만 순회해 필요한 항목의 값(td) 칸을 모아 둠
+        detail_table_cells = _find_detail_table_cells(tree)
+        
         try:
-            approval_date_th = soup.find(lambda tag: tag.name == 'div' and tag.get('class') == ['detail-table-th'] and "사용승인일" in tag.text.strip())
-            if approval_date_th:
-                approval_date_td = approval_date_th.find_next_sibling('div', class_='detail-table-td')
-                if approval_date_td:
-                    approval_date_text = approval_date_td.text.strip()
+            if '사용승인일' in detail_table_cells:
+                approval_date_td = detail_table_cells['사용승인일']
+                if approval_date_td is not None:
+                    approval_date_text = approval_date_td.text_content().strip()
                     parsed_data['parsed_approval_date'] = approval_date_text
-                    logging.info(f"  사용승인일 (HTML): {approval_date_text}")
+                    logger.info("  사용승인일 (HTML): %s", approval_date_text)
             else:
-                logging.info(f"  사용승인일 정보 (HTML)를 찾을 수 없습니다.")
+                logger.info("  사용승인일 정보 (HTML)를 찾을 수 없습니다.")
         except Exception as e:
-            logging.warning(f"HTML에서 사용승인일 정보 추출 중 오류: {e}")
+            logger.warning("HTML에서 사용승인일 정보 추출 중 오류: %s", e)
 
         # 층/전체 층수 정보 추출 (새로운 로직)
         try:
-            floor_info_th = soup.find(lambda tag: tag.name == 'div' and tag.get('class') == ['detail-table-th'] and "해당층/전체층" in tag.text)
-            if floor_info_th:
-                floor_info_td = floor_info_th.find_next_sibling('div', class_='detail-table-td')
-                if floor_info_td:
-                    floor_text = floor_info_td.text.strip()
+            if '해당층/전체층' in detail_table_cells:
+                floor_info_td = detail_table_cells['해당층/전체층']
+                if floor_info_td is not None:
+                    floor_text = floor_info_td.text_content().strip()
                     if '/' in floor_text:
                         current_floor_str, total_floor_str = floor_text.split('/', 1)
                         parsed_data['parsed_floor'] = current_floor_str.strip()
                         # "층" 문자 제거 및 숫자만 추출 시도
-                        total_floor_numeric = re.search(r'\d+', total_floor_str)
+                        total_floor_numeric = _RE_DIGITS.search(total_floor_str)
                         if total_floor_numeric:
                             parsed_data['parsed_total_floor'] = int(total_floor_numeric.group(0))
                         else:
                             parsed_data['parsed_total_floor'] = total_floor_str.strip()
-                        logging.info(f"  층/전체층 (HTML): {parsed_data['parsed_floor']}/{parsed_data['parsed_total_floor']}")
+                        logger.info("  층/전체층 (HTML): %s/%s", parsed_data['parsed_floor'], parsed_data['parsed_total_floor'])
                     else:
                         # 형식에 맞지 않는 경우 일단 현재 층 정보로만 기록
                         parsed_data['parsed_floor'] = floor_text
-                        logging.info(f"  층 정보만 (HTML): {parsed_data['parsed_floor']}")
+                        logger.info("  층 정보만 (HTML): %s", parsed_data['parsed_floor'])
             else:
-                logging.info(f"  층/전체층 정보 (HTML)를 찾을 수 없습니다.")
+                logger.info("  층/전체층 정보 (HTML)를 찾을 수 없습니다.")
         except Exception as e:
-            logging.warning(f"HTML에서 층/전체층 정보 추출 중 오류: {e}")
+            logger.warning("HTML에서 층/전체층 정보 추출 중 오류: %s", e)
             
         # 옵션 정보 추출
-        options = _extract_options(soup, hidx)
+        options = _extract_options(tree, hidx)
         if options:
             parsed_data['parsed_options'] = options
             parsed_data['parsed_options_string'] = ', '.join(options)
         
-        logging.info(f"HTML 상세 페이지 파싱 완료: {url}")
+        logger.info("HTML 상세 페이지 파싱 완료: %s", url)
         return parsed_data
     
     except requests.exceptions.RequestException as e:
-        logging.error(f"HTML 파싱 요청 중 오류 발생: {e}")
+        logger.error("HTML 파싱 요청 중 오류 발생: %s", e)
     except Exception as e:
-        logging.error(f"HTML 파싱 중 예기치 않은 오류 발생: {e} (URL: {url})")
+        logger.error("HTML 파싱 중 예기치 않은 오류 발생: %s (URL: %s)", e, url)
     
     return {}
 
+def parse_property_details_many(hidxs, max_workers=MAX_WORKERS_DETAIL_FETCH):
+    """
+    여러 매물 상세 페이지를 스레드 풀에서 동시에 요청하고 파싱합니다 (세션 커넥션 풀 공유).
+    
+    Args:
+        hidxs (iterable): 매물 고유 ID 목록
+        max_workers (int): 동시에 요청할 최대 스레드 수
+        
+    Returns:
+        dict: {hidx: 파싱된 상세 정보} (실패한 매물은 빈 딕셔너리)
+    """
+    hidxs = list(dict.fromkeys(hidxs))
+    if not hidxs:
+        return {}
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(hidxs))) as executor:
+        return dict(zip(hidxs, executor.map(parse_property_details, hidxs)))
+
 if __name__ == "__main__":
     # 테스트 실행
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
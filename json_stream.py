@@ -0,0 +1,81 @@
+"""
+스트리밍 JSON 응답 추적 유틸리티
+
+Gemini 스트리밍 응답처럼 조각으로 들어오는 JSON 텍스트를 이어 받으면서,
+최상위 값이 닫히는 위치와 (최상위가 배열인 경우) 완성된 원소 객체를 바로 알려줍니다.
+전체 응답을 기다리지 않고 파싱을 시작하거나, JSON이 끝난 뒤 스트림을 끊을 때 사용합니다.
+"""
+
+class JsonStreamScanner:
+    """
+    JSON 텍스트 조각을 순서대로 받아 괄호 깊이를 추적합니다.
+    문자열 안의 괄호와 이스케이프 문자는 깊이 계산에서 제외하고, 첫 '{' 또는 '[' 이전의 텍스트
+    (마크다운 코드 블록 표시 등)는 무시합니다.
+
+    Attributes:
+        is_array (bool): 최상위 값이 배열인지 여부
+        end_index (int): 최상위 값을 닫는 문자의 (마지막으로 받은) 조각 내 위치, 아직 닫히지 않았으면 -1
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.is_array = False
+        self.end_index = -1
+        self._element_parts = None  # 여러 조각에 걸친 배열 원소 객체의 앞부분
+
+    @property
+    def done(self):
+        """최상위 값이 닫혔는지 여부"""
+        return self.end_index != -1
+
+    def feed(self, text):
+        """
+        새 조각을 추적합니다. 최상위 값이 닫힌 뒤의 텍스트는 무시합니다.
+
+        Args:
+            text (str): 새로 받은 응답 조각
+
+        Returns:
+            list: 이번 조각에서 완성된 최상위 배열 원소 객체들의 JSON 텍스트
+        """
+        elements = []
+        if self.done:
+            return elements
+        element_start = 0 if self._element_parts is not None else None
+
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                # JSON 시작 전 텍스트의 따옴표는 무시 (짝이 맞지 않는 따옴표가 여는 괄호를 가리지 않도록)
+                if self.started:
+                    self.in_string = True
+            elif ch == '{' or ch == '[':
+                if not self.started:
+                    self.started = True
+                    self.is_array = ch == '['
+                elif self.is_array and self.depth == 1 and ch == '{':
+                    element_start = i
+                    self._element_parts = []
+                self.depth += 1
+            elif (ch == '}' or ch == ']') and self.started:
+                self.depth -= 1
+                if self.depth == 1 and element_start is not None:
+                    elements.append(''.join(self._element_parts) + text[element_start:i + 1])
+                    self._element_parts = None
+                    element_start = None
+                elif self.depth == 0:
+                    self.end_index = i
+                    return elements
+
+        if element_start is not None:
+            self._element_parts.append(text[element_start:])
+        return elements
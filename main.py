@@ -1,21 +1,22 @@
 import logging
 import os
 from dotenv import load_dotenv
-import concurrent.futures # 병렬 처리를 위해 추가
-import time # 요청 간 간격 조절을 위해 추가
-import math # 배치 수 계산을 위해 추가
+import concurrent.futures
+import orjson
+import numpy as np
 
-from api_caller import fetch_property_list
-from html_parser import parse_property_details
-from gemini_analyzer import analyze_property_with_gemini
-from gemini_reanalyzer import reanalyze_property_batch, REANALYSIS_BATCH_SIZE # 수정된 함수 및 배치 크기 임포트
+# 환경 변수 로드 (.env 파일 사용) - api_caller가 임포트 시점에 환경 변수를 읽으므로 모듈 임포트 전에 로드
+load_dotenv()
+
+from api_caller import fetch_property_pages, extract_properties, MAX_WORKERS_PAGE_FETCH
+from html_parser import parse_property_details, parse_property_details_many
+from gemini_analyzer import analyze_property_with_gemini, analyze_properties_with_gemini, AnalysisFailed, mark_analysis_failed, ANALYSIS_BATCH_SIZE, MAX_CONCURRENT_ANALYSES
+from gemini_reanalyzer import reanalyze_property_batches, REANALYSIS_BATCH_SIZE # 수정된 함수 및 배치 크기 임포트
 from excel_writer import save_to_excel
 
 # 로그 설정
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
 
-# 환경 변수 로드 (.env 파일 사용)
-load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # 광화문 좌표 (예시)
@@ -26,10 +27,42 @@ MAX_WORKERS_HTML_PARSING = 25 # 동시에 요청할 스레드 수를 25로 조
 
 # 초기 분석 배치 처리 설정
 INITIAL_ANALYSIS_BATCH_SIZE = 60  # 한 번에 처리할 매물 수 (기존 BATCH_SIZE 이름 변경)
-BATCH_PAUSE_SEC = 0.5  # 배치 사이의 대기 시간을 0.5초로 단축
 
-# 재평가 배치 크기 증가
-REANALYSIS_BATCH_SIZE = 100  # 재평가 배치 크기를 100으로 줄여서 API 제한 준수
+# 초기 분석 결과를 배치마다 이어 쓰는 중간 저장 파일 (한 줄에 매물 하나, 실행할 때마다 새로 작성)
+INITIAL_ANALYSIS_CHECKPOINT_FILE = "peterpanz_initial_analysis.jsonl"
+
+def append_jsonl(file, records):
+    """레코드들을 JSON Lines 형식으로 파일에 이어 쓰고 바로 디스크로 내보냅니다 (직렬화할 수 없는 값은 문자열로 저장)."""
+    file.write(b''.join(
+        orjson.dumps(record, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+        for record in records
+    ))
+    file.flush()
+
+def rank_descending(items, key):
+    """
+    key 값을 매물마다 한 번만 계산해 numpy 안정 정렬로 내림차순 정렬하고, 각 매물에 순위('rank')를 매깁니다 (값이 같으면 원래 순서 유지).
+    순위는 정렬 순서의 역순열로 구하므로 정렬된 리스트를 다시 돌지 않습니다.
+    
+    Args:
+        items (list): 정렬할 매물 리스트
+        key (callable): 매물 하나를 받아 숫자 정렬 키를 반환하는 함수
+        
+    Returns:
+        list: 내림차순으로 정렬된 새 리스트
+    """
+    keys = np.fromiter((key(item) for item in items), dtype=np.float64, count=len(items))
+    order = np.argsort(-keys, kind='stable')
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(1, len(order) + 1)
+    for item, rank in zip(items, ranks.tolist()):
+        item['rank'] = rank
+    return [items[i] for i in order]
+
+def assign_ranks_in_order(items):
+    """정렬에 실패했을 때 현재 순서대로 순위('rank')를 매깁니다."""
+    for i, item in enumerate(items):
+        item['rank'] = i + 1
 
 def process_single_property(api_property_info, gemini_api_key, gwanghwamun_coords):
     """단일 매물에 대한 모든 처리(HTML 파싱, Gemini 분석)를 실행합니다."""
@@ -53,7 +86,11 @@ def process_single_property(api_property_info, gemini_api_key, gwanghwamun_coord
         
         # Gemini 분석
         if gemini_api_key:
-            analyzed_data = analyze_property_with_gemini(combined_data, gemini_api_key, gwanghwamun_coords)
+            try:
+                analyzed_data = analyze_property_with_gemini(combined_data, gemini_api_key, gwanghwamun_coords)
+            except AnalysisFailed as e:
+                logging.warning(f"Gemini 분석 실패: hidx={hidx}, 오류: {e}")
+                return mark_analysis_failed(combined_data, e)
             if analyzed_data:
                 return analyzed_data
             else:
@@ -68,45 +105,58 @@ def process_single_property(api_property_info, gemini_api_key, gwanghwamun_coord
         return api_property_info  # 최소한 API 정보는 반환
     
 def process_property_batch(properties_batch_data, gemini_api_key, gwanghwamun_coords):
-    """초기 분석을 위한 배치 단위 매물 처리."""
+    """초기 분석을 위한 배치 단위 매물 처리. HTML 파싱이 끝난 매물부터 묶음 단위로 바로 Gemini 분석을 시작합니다."""
     processed_results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS_HTML_PARSING) as executor:
-        hidx_to_property = {prop.get('hidx'): prop for prop in properties_batch_data if prop.get('hidx')}
-        futures_html = {executor.submit(parse_property_details, hidx): hidx for hidx in hidx_to_property.keys()}
-        
-        parsed_details_map = {}
-        for future in concurrent.futures.as_completed(futures_html):
+    hidx_to_property = {prop.get('hidx'): prop for prop in properties_batch_data if prop.get('hidx')}
+    if not gemini_api_key:
+        parsed_details_map = parse_property_details_many(hidx_to_property.keys(), max_workers=MAX_WORKERS_HTML_PARSING)
+        return [{**property_info, **parsed_details_map.get(hidx, {})} for hidx, property_info in hidx_to_property.items()]
+    
+    # HTML 파싱과 Gemini 분석을 파이프라인으로 처리: 파싱이 끝난 매물부터 ANALYSIS_BATCH_SIZE개씩 묶어 바로 분석 요청
+    # (두 단계의 스레드 풀을 따로 두어 Gemini 대기가 HTML 요청 동시성을 막지 않도록 함)
+    combined_by_hidx = {}
+    analyzed_by_hidx = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS_HTML_PARSING) as html_executor, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ANALYSES) as gemini_executor:
+        html_futures = {html_executor.submit(parse_property_details, hidx): hidx for hidx in hidx_to_property}
+        analysis_futures = []
+        pending_hidxs, pending_properties = [], []
+        for future in concurrent.futures.as_completed(html_futures):
+            hidx = html_futures[future]
             try:
-                hidx = futures_html[future]
-                result = future.result()
-                parsed_details_map[hidx] = result if result else {}
+                parsed_details = future.result()
             except Exception as e:
-                logging.error(f"HTML 파싱 중 오류: {e} (hidx={futures_html[future]})")
-                parsed_details_map[futures_html[future]] = {}
-        
-        futures_analysis = []
-        for hidx, property_info in hidx_to_property.items():
-            combined_data = {**property_info, **parsed_details_map.get(hidx, {})}
-            if gemini_api_key:
-                future = executor.submit(analyze_property_with_gemini, combined_data, gemini_api_key, gwanghwamun_coords)
-                futures_analysis.append((future, combined_data))
-            else:
-                processed_results.append(combined_data)
+                logging.error(f"HTML 파싱 중 오류 (hidx={hidx}): {e}")
+                parsed_details = {}
+            combined_by_hidx[hidx] = {**hidx_to_property[hidx], **(parsed_details or {})}
+            pending_hidxs.append(hidx)
+            pending_properties.append(combined_by_hidx[hidx])
+            if len(pending_properties) >= ANALYSIS_BATCH_SIZE:
+                analysis_futures.append((pending_hidxs, gemini_executor.submit(
+                    analyze_properties_with_gemini, pending_properties, gemini_api_key, gwanghwamun_coords
+                )))
+                pending_hidxs, pending_properties = [], []
+        if pending_properties:
+            analysis_futures.append((pending_hidxs, gemini_executor.submit(
+                analyze_properties_with_gemini, pending_properties, gemini_api_key, gwanghwamun_coords
+            )))
         
-        for i, (future, combined_data_fallback) in enumerate(futures_analysis):
+        for chunk_hidxs, future in analysis_futures:
             try:
-                result = future.result()
-                if result:
-                    if 'images' in result and isinstance(result['images'], dict) and 'S' in result['images']:
-                        result['images_S_length'] = len(result['images']['S'])
-                    processed_results.append(result)
-                    logging.info(f"Gemini 초기 분석 완료 ({i+1}/{len(futures_analysis)}): hidx={result.get('hidx')}")
-                else:
-                    processed_results.append(combined_data_fallback)
-                    logging.warning(f"Gemini 초기 분석 결과 없음: hidx={combined_data_fallback.get('hidx')}")
+                analyzed_by_hidx.update(zip(chunk_hidxs, future.result()))
             except Exception as e:
-                processed_results.append(combined_data_fallback)
-                logging.error(f"Gemini 초기 분석 중 오류: {e} (hidx={combined_data_fallback.get('hidx')})")
+                logging.error(f"Gemini 분석 중 오류 ({len(chunk_hidxs)}개 매물, HTML 파싱 결과 사용): {e}")
+    
+    # 입력 순서대로 결과 정리 (분석 결과가 없는 매물은 HTML 파싱까지 합친 데이터 사용)
+    analyzed_batch = [analyzed_by_hidx.get(hidx) or combined_by_hidx[hidx] for hidx in hidx_to_property]
+    for i, result in enumerate(analyzed_batch):
+        if 'images' in result and isinstance(result['images'], dict) and 'S' in result['images']:
+            result['images_S_length'] = len(result['images']['S'])
+        processed_results.append(result)
+        if 'ai_analysis_error' in result:
+            logging.warning(f"Gemini 초기 분석 실패 ({i+1}/{len(analyzed_batch)}): hidx={result.get('hidx')}, 오류: {result['ai_analysis_error']}")
+        else:
+            logging.info(f"Gemini 초기 분석 완료 ({i+1}/{len(analyzed_batch)}): hidx={result.get('hidx')}")
     return processed_results
 
 def main():
@@ -117,31 +167,49 @@ def main():
     total_pages = 55 # 최대 페이지 수
     max_items_to_fetch = 1200 # 전체 매물(약 1100개) 가져오기 위해 충분히 큰 값으로 설정
 
-    for page in range(1, total_pages + 1):
+    # MAX_WORKERS_PAGE_FETCH개 페이지씩 동시에 조회하고, 결과는 페이지 순서대로 확인 (마지막 페이지를 지나면 다음 묶음은 요청하지 않음)
+    fetching_done = False
+    for wave_start in range(1, total_pages + 1, MAX_WORKERS_PAGE_FETCH):
         if len(all_properties_from_api) >= max_items_to_fetch:
             logging.info(f"최대 {max_items_to_fetch}개 매물까지 조회 완료.")
             break
-        logging.info(f"페이지 {page}/{total_pages} 조회 중...")
+        wave_pages = range(wave_start, min(wave_start + MAX_WORKERS_PAGE_FETCH, total_pages + 1))
+        logging.info(f"페이지 {wave_pages[0]}-{wave_pages[-1]}/{total_pages} 조회 중...")
         # 페이지당 20개씩 가져오도록 설정
-        api_response = fetch_property_list(page_index=page, page_size=20) 
-        
-        if "error" in api_response: 
-            logging.error(f"API 요청 실패 (페이지 {page}): {api_response['error']}"); 
-            continue
-        
-        page_properties = []
-        if 'houses' in api_response:
-            for category in api_response['houses'].keys():
-                if category in api_response['houses'] and 'image' in api_response['houses'][category]:
-                    page_properties.extend(api_response['houses'][category]['image'])
-        
-        if not page_properties: 
-            logging.warning(f"페이지 {page}에서 조회된 매물이 없습니다."); 
-            if page > 1: break  # 더 가져올게 없으면 중단
-            continue
+        for page, api_response in fetch_property_pages(wave_pages, page_size=20):
+            if len(all_properties_from_api) >= max_items_to_fetch:
+                logging.info(f"최대 {max_items_to_fetch}개 매물까지 조회 완료.")
+                fetching_done = True
+                break
+            
+            if "error" in api_response: 
+                logging.error(f"API 요청 실패 (페이지 {page}): {api_response['error']}"); 
+                continue
+            
+            page_properties = extract_properties(api_response)
+            
+            if not page_properties: 
+                logging.warning(f"페이지 {page}에서 조회된 매물이 없습니다."); 
+                if page > 1:  # 더 가져올게 없으면 중단
+                    fetching_done = True
+                    break
+                continue
+            
+            all_properties_from_api.extend(page_properties)
+            logging.info(f"페이지 {page}에서 {len(page_properties)}개 매물 조회됨 (누적: {len(all_properties_from_api)})")
         
-        all_properties_from_api.extend(page_properties)
-        logging.info(f"페이지 {page}에서 {len(page_properties)}개 매물 조회됨 (누적: {len(all_properties_from_api)})")
+        if fetching_done:
+            break
+
+    # 페이지 사이에 중복된 매물 제거 (조회 중 새 매물이 올라오면 목록이 밀려 같은 hidx가 다시 나올 수 있음, 처음 나온 항목 유지)
+    unique_properties = {}
+    for prop in all_properties_from_api:
+        hidx = prop.get('hidx')
+        if hidx and hidx not in unique_properties:
+            unique_properties[hidx] = prop
+    if len(unique_properties) < len(all_properties_from_api):
+        logging.info(f"중복되거나 hidx가 없는 매물 {len(all_properties_from_api) - len(unique_properties)}개 제외")
+    all_properties_from_api = list(unique_properties.values())
 
     if not all_properties_from_api: logging.error("조회된 매물이 없습니다."); return
     logging.info(f"총 {len(all_properties_from_api)}개 매물 API로부터 조회 완료.")
@@ -151,18 +219,19 @@ def main():
     # 초기 분석 (기존 로직 활용)
     initially_analyzed_properties = []
     logging.info(f"매물을 {INITIAL_ANALYSIS_BATCH_SIZE}개 단위로 초기 분석 배치 처리합니다.")
-    for i in range(0, len(all_properties_from_api), INITIAL_ANALYSIS_BATCH_SIZE):
-        batch_start_idx = i
-        batch_end_idx = min(i + INITIAL_ANALYSIS_BATCH_SIZE, len(all_properties_from_api))
-        current_batch_data = all_properties_from_api[batch_start_idx:batch_end_idx]
-        
-        logging.info(f"초기 분석 배치 처리 ({batch_start_idx+1}-{batch_end_idx}/{len(all_properties_from_api)})...")
-        batch_results = process_property_batch(current_batch_data, GEMINI_API_KEY, GWANGHWAMUN_COORDINATES)
-        initially_analyzed_properties.extend(batch_results)
-        
-        if batch_end_idx < len(all_properties_from_api):
-            logging.info(f"{BATCH_PAUSE_SEC}초 대기 후 다음 초기 분석 배치...")
-            time.sleep(BATCH_PAUSE_SEC)
+    # 배치가 끝날 때마다 결과를 JSONL 파일에 바로 기록 (중간에 중단되어도 완료된 배치의 분석 결과는 남음)
+    with open(INITIAL_ANALYSIS_CHECKPOINT_FILE, 'wb') as checkpoint_file:
+        for i in range(0, len(all_properties_from_api), INITIAL_ANALYSIS_BATCH_SIZE):
+            batch_start_idx = i
+            batch_end_idx = min(i + INITIAL_ANALYSIS_BATCH_SIZE, len(all_properties_from_api))
+            current_batch_data = all_properties_from_api[batch_start_idx:batch_end_idx]
+            
+            logging.info(f"초기 분석 배치 처리 ({batch_start_idx+1}-{batch_end_idx}/{len(all_properties_from_api)})...")
+            batch_results = process_property_batch(current_batch_data, GEMINI_API_KEY, GWANGHWAMUN_COORDINATES)
+            initially_analyzed_properties.extend(batch_results)
+            append_jsonl(checkpoint_file, batch_results)
+            # 배치 사이 고정 대기 없음 (Gemini 호출 간격/할당량은 gemini_analyzer의 공유 속도 제한기가 조절)
+    logging.info(f"초기 분석 중간 결과를 '{INITIAL_ANALYSIS_CHECKPOINT_FILE}' 파일에 기록했습니다.")
 
     if not initially_analyzed_properties: logging.error("초기 분석된 매물이 없습니다."); return
     logging.info(f"성공적으로 초기 분석된 매물 수: {len(initially_analyzed_properties)}")
@@ -175,15 +244,13 @@ def main():
 
     # 재평가 전에 초기 분석 결과 정렬 및 엑셀 저장
     try:
-        sorted_initially_analyzed = sorted(initially_analyzed_properties, key=get_score_for_sort, reverse=True)
+        sorted_initially_analyzed = rank_descending(initially_analyzed_properties, get_score_for_sort)
         logging.info("초기 분석 매물을 총점 기준으로 내림차순 정렬했습니다.")
     except Exception as e:
         sorted_initially_analyzed = initially_analyzed_properties 
+        assign_ranks_in_order(sorted_initially_analyzed)
         logging.error(f"초기 분석 총점 기준 정렬 중 오류: {e}. 정렬되지 않은 결과 사용.")
     
-    for i, prop in enumerate(sorted_initially_analyzed):
-        prop['rank'] = i + 1
-    
     initial_output_file = "peterpanz_initial_analysis.xlsx"
     save_to_excel(sorted_initially_analyzed, initial_output_file)
     logging.info(f"초기 분석 결과를 '{initial_output_file}' 파일로 저장했습니다.")
@@ -195,53 +262,28 @@ def main():
         logging.info(f"초기 분석 완료. 매물을 {REANALYSIS_BATCH_SIZE}개 단위로 전체 재평가를 시작합니다...")
         logging.info(f"재평가는 초기 분석된 모든 매물({len(initially_analyzed_properties)}개)에 대해 수행됩니다.")
         
-        num_reanalysis_batches = math.ceil(len(initially_analyzed_properties) / REANALYSIS_BATCH_SIZE)
-        
-        for batch_idx in range(num_reanalysis_batches):
-            reanalysis_batch_start_idx = batch_idx * REANALYSIS_BATCH_SIZE
-            reanalysis_batch_end_idx = min((batch_idx + 1) * REANALYSIS_BATCH_SIZE, len(initially_analyzed_properties))
-            current_reanalysis_batch_data = initially_analyzed_properties[reanalysis_batch_start_idx:reanalysis_batch_end_idx]
-            
-            if not current_reanalysis_batch_data: # 혹시 모를 빈 배치 방지
-                logging.warning(f"재평가 배치 {batch_idx+1}/{num_reanalysis_batches} 데이터가 비어있어 건너뜁니다.")
-                continue
-
-            logging.info(f"재평가 배치 {batch_idx+1}/{num_reanalysis_batches} 처리 중 ({len(current_reanalysis_batch_data)}개 매물)...")
-            
-            # 각 배치 재평가
-            reanalyzed_batch_result = reanalyze_property_batch(
-                current_reanalysis_batch_data, 
-                GEMINI_API_KEY, 
-                batch_number=str(batch_idx+1),
-                total_batches=str(num_reanalysis_batches)
-            )
-            
-            if reanalyzed_batch_result:
-                final_reanalyzed_properties.extend(reanalyzed_batch_result)
-                logging.info(f"재평가 배치 {batch_idx+1}/{num_reanalysis_batches} 완료. {len(reanalyzed_batch_result)}개 결과 추가됨.")
-            else:
-                logging.warning(f"재평가 배치 {batch_idx+1}/{num_reanalysis_batches}에서 결과를 받지 못했습니다. 해당 배치 원본 데이터 사용.")
-                final_reanalyzed_properties.extend(current_reanalysis_batch_data)
-            
-            # 다음 재평가 배치 전 지연 (API 속도 제한 및 부하 분산)
-            if batch_idx < num_reanalysis_batches - 1:
-                reanalyzer_batch_pause_sec = 15  # 재평가 배치 간 간격을 15초로 대폭 증가
-                logging.info(f"{reanalyzer_batch_pause_sec}초 대기 후 다음 재평가 배치 처리...")
-                time.sleep(reanalyzer_batch_pause_sec)
+        # 재평가 배치들을 스레드 풀에서 동시에 처리 (할당량/429 대기는 gemini_reanalyzer의 공유 속도 제한기가 조절)
+        reanalysis_batches = [
+            initially_analyzed_properties[start_idx:start_idx + REANALYSIS_BATCH_SIZE]
+            for start_idx in range(0, len(initially_analyzed_properties), REANALYSIS_BATCH_SIZE)
+        ]
+        for batch_idx, reanalyzed_batch_result in enumerate(reanalyze_property_batches(reanalysis_batches, GEMINI_API_KEY)):
+            final_reanalyzed_properties.extend(reanalyzed_batch_result)
+            logging.info(f"재평가 배치 {batch_idx+1}/{len(reanalysis_batches)} 완료. {len(reanalyzed_batch_result)}개 결과 추가됨.")
         
         # 재평가 후 누락된 매물이 있는지 확인하고 원본으로 채우기
+        # (hidx 문자열 변환은 매물마다 한 번만 하고, 누락 매물은 초기 분석 순서대로 hidx 맵에서 바로 찾음)
+        initial_by_hidx = {str(prop.get('hidx')): prop for prop in initially_analyzed_properties if prop.get('hidx')}
         reanalyzed_hidxs = {str(prop.get('hidx')) for prop in final_reanalyzed_properties if prop.get('hidx')}
-        initial_hidxs = {str(prop.get('hidx')) for prop in initially_analyzed_properties if prop.get('hidx')}
-        missing_hidxs = initial_hidxs - reanalyzed_hidxs
+        missing_properties = [prop for hidx, prop in initial_by_hidx.items() if hidx not in reanalyzed_hidxs]
         
-        if missing_hidxs:
-            logging.warning(f"재평가 과정에서 {len(missing_hidxs)}개 매물이 누락되었습니다. 해당 매물은 초기 분석 결과를 사용합니다.")
-            for prop in initially_analyzed_properties:
-                if str(prop.get('hidx')) in missing_hidxs:
-                    # 누락 정보 추가
-                    prop['ai_reanalysis_error'] = prop.get('ai_reanalysis_error', "") + "; 최종 재평가 결과에서 누락됨"
-                    prop['reanalysis_comment'] = prop.get('reanalysis_comment', "") + "; 최종 재평가 결과에서 누락되어 초기 분석 데이터 사용"
-                    final_reanalyzed_properties.append(prop)  # 누락된 원본 추가
+        if missing_properties:
+            logging.warning(f"재평가 과정에서 {len(missing_properties)}개 매물이 누락되었습니다. 해당 매물은 초기 분석 결과를 사용합니다.")
+            for prop in missing_properties:
+                # 누락 정보 추가
+                prop['ai_reanalysis_error'] = prop.get('ai_reanalysis_error', "") + "; 최종 재평가 결과에서 누락됨"
+                prop['reanalysis_comment'] = prop.get('reanalysis_comment', "") + "; 최종 재평가 결과에서 누락되어 초기 분석 데이터 사용"
+                final_reanalyzed_properties.append(prop)  # 누락된 원본 추가
         
         logging.info(f"전체 매물 재평가 완료. 최종 매물 수: {len(final_reanalyzed_properties)}")
         properties_for_excel = final_reanalyzed_properties
@@ -274,18 +316,16 @@ def main():
         has_percentile_scores = any(prop.get('weighted_percentile_score') is not None for prop in properties_for_excel)
         
         if has_percentile_scores:
-            sorted_properties = sorted(properties_for_excel, key=get_weighted_percentile_for_sort, reverse=True)
+            sorted_properties = rank_descending(properties_for_excel, get_weighted_percentile_for_sort)
             logging.info("매물을 백분율 점수 기준으로 내림차순 정렬했습니다.")
         else:
-            sorted_properties = sorted(properties_for_excel, key=get_score_for_sort, reverse=True)
+            sorted_properties = rank_descending(properties_for_excel, get_score_for_sort)
             logging.info("매물을 총점 기준으로 내림차순 정렬했습니다.")
     except Exception as e:
         sorted_properties = properties_for_excel 
+        assign_ranks_in_order(sorted_properties)
         logging.error(f"정렬 중 오류: {e}. 정렬되지 않은 결과 사용.")
     
-    for i, prop in enumerate(sorted_properties):
-        prop['rank'] = i + 1
-    
     final_output_file = "peterpanz_analysis_result.xlsx"
     save_to_excel(sorted_properties, final_output_file)
     
@@ -0,0 +1,136 @@
+"""
+스레드 간에 공유되는 API 호출 속도 제한 유틸리티
+
+여러 작업자 스레드가 같은 API를 호출할 때, 호출 간격이나 할당량(분당 요청/토큰, 일일 요청)을
+전역적으로 맞추고 429(할당량 초과) 응답을 받으면 모든 스레드가 함께 쉬도록 합니다.
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+class RateLimiter:
+    """
+    분당 최대 호출 수와 최소 호출 간격을 지키도록 호출 시점을 배정하는 속도 제한기입니다.
+
+    호출 시점(slot)을 잠금 안에서 예약만 하고 실제 대기는 잠금 밖에서 하므로,
+    한 스레드가 기다리는 동안 다른 스레드가 막히지 않습니다.
+    """
+
+    def __init__(self, max_calls_per_minute, min_interval_sec=0.0):
+        """
+        Args:
+            max_calls_per_minute (int): 분당 최대 호출 수
+            min_interval_sec (float): 연속 호출 사이 최소 간격(초)
+        """
+        self.interval_sec = max(60.0 / max_calls_per_minute, min_interval_sec)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._cooldown_until = 0.0
+
+    def acquire(self):
+        """다음 호출 시점까지 대기합니다. 대기 중 쿨다운이 걸리면 쿨다운이 끝난 뒤로 다시 예약합니다."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot, self._cooldown_until)
+                self._next_slot = slot + self.interval_sec
+
+            if slot > now:
+                time.sleep(slot - now)
+
+            with self._lock:
+                if time.monotonic() >= self._cooldown_until:
+                    return
+
+    def cooldown(self, seconds):
+        """
+        할당량 초과(429) 등으로 모든 호출을 일정 시간 멈춥니다. 이미 더 긴 쿨다운이 걸려 있으면 유지합니다.
+
+        Args:
+            seconds (float): 호출을 멈출 시간(초)
+        """
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._cooldown_until:
+                self._cooldown_until = until
+                logging.warning(f"API 호출을 {seconds:.1f}초 동안 일시 중지합니다 (모든 작업자 공통).")
+
+class QuotaRateLimiter:
+    """
+    분당 요청 수(RPM), 분당 토큰 수(TPM), 일일 요청 수(RPD)를 슬라이딩 윈도로 추적하는 속도 제한기입니다.
+
+    고정 간격으로 호출을 늘어놓는 RateLimiter와 달리, 할당량에 여유가 있으면 기다리지 않고 바로 호출하고
+    한도(안전 여유 적용)에 닿았을 때만 가장 오래된 기록이 윈도에서 빠질 때까지 대기합니다.
+    """
+
+    MINUTE_SEC = 60.0
+    DAY_SEC = 86400.0
+
+    def __init__(self, max_calls_per_minute, max_tokens_per_minute=None, max_calls_per_day=None, safety_margin=0.9):
+        """
+        Args:
+            max_calls_per_minute (int): 분당 최대 호출 수
+            max_tokens_per_minute (int, optional): 분당 최대 토큰 수 (None이면 추적하지 않음)
+            max_calls_per_day (int, optional): 일일 최대 호출 수 (None이면 추적하지 않음)
+            safety_margin (float): 각 한도에 곱할 안전 비율 (0.9면 한도의 90%까지만 사용)
+        """
+        self.rpm_limit = max(1, int(max_calls_per_minute * safety_margin))
+        self.tpm_limit = int(max_tokens_per_minute * safety_margin) if max_tokens_per_minute else None
+        self.rpd_limit = max(1, int(max_calls_per_day * safety_margin)) if max_calls_per_day else None
+        self._lock = threading.Lock()
+        self._minute_calls = deque()  # (호출 시각, 추정 토큰 수)
+        self._minute_tokens = 0
+        self._day_calls = deque()  # 호출 시각
+        self._cooldown_until = 0.0
+
+    def _wait_time(self, now, estimated_tokens):
+        """잠금 안에서 호출 가능 여부를 확인합니다. 바로 호출할 수 있으면 0, 아니면 기다려야 할 시간(초)."""
+        while self._minute_calls and now - self._minute_calls[0][0] >= self.MINUTE_SEC:
+            self._minute_tokens -= self._minute_calls.popleft()[1]
+        while self._day_calls and now - self._day_calls[0] >= self.DAY_SEC:
+            self._day_calls.popleft()
+
+        wait = self._cooldown_until - now
+        if len(self._minute_calls) >= self.rpm_limit:
+            wait = max(wait, self._minute_calls[0][0] + self.MINUTE_SEC - now)
+        if (self.tpm_limit is not None and self._minute_calls
+                and self._minute_tokens + estimated_tokens > self.tpm_limit):
+            # 윈도가 비어 있으면 추정 토큰이 한도보다 커도 호출 (영원히 기다리지 않도록)
+            wait = max(wait, self._minute_calls[0][0] + self.MINUTE_SEC - now)
+        if self.rpd_limit is not None and len(self._day_calls) >= self.rpd_limit:
+            wait = max(wait, self._day_calls[0] + self.DAY_SEC - now)
+        return wait
+
+    def acquire(self, estimated_tokens=0):
+        """
+        할당량 안에서 호출할 수 있을 때까지 대기한 뒤 이번 호출을 기록합니다.
+
+        Args:
+            estimated_tokens (int): 이번 호출의 추정 토큰 수 (TPM 계산용)
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._wait_time(now, estimated_tokens)
+                if wait <= 0:
+                    self._minute_calls.append((now, estimated_tokens))
+                    self._minute_tokens += estimated_tokens
+                    if self.rpd_limit is not None:
+                        self._day_calls.append(now)
+                    return
+            time.sleep(wait)
+
+    def cooldown(self, seconds):
+        """
+        할당량 초과(429) 등으로 모든 호출을 일정 시간 멈춥니다. 이미 더 긴 쿨다운이 걸려 있으면 유지합니다.
+
+        Args:
+            seconds (float): 호출을 멈출 시간(초)
+        """
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._cooldown_until:
+                self._cooldown_until = until
+                logging.warning(f"API 호출을 {seconds:.1f}초 동안 일시 중지합니다 (모든 작업자 공통).")
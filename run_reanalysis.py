@@ -1,14 +1,11 @@
 import os
 import logging
 import json
-import pandas as pd
+import re
+import math
 import numpy as np
 import random
-import time
-from gemini_reanalyzer import reanalyze_property_batch, REANALYSIS_BATCH_SIZE, NUM_REANALYSIS_ROUNDS, CONVERGENCE_THRESHOLD
-
-# 설정값들
-REANALYSIS_BATCH_SIZE = 15  # 한 번에 재평가할 매물 수 (API 안정성 향상을 위해 감소)
+from gemini_reanalyzer import reanalyze_property_batches, snapshot_scores, measure_convergence, REANALYSIS_BATCH_SIZE, NUM_REANALYSIS_ROUNDS, CONVERGENCE_THRESHOLD
 
 # 로깅 설정
 logging.basicConfig(
@@ -20,6 +17,50 @@ logging.basicConfig(
     ]
 )
 
+# 엑셀 열 이름 -> 매물 필드 이름 매핑
+_FIELD_MAPPING = {
+    '매물 ID': 'hidx',
+    '총점 (100점)': 'total_score',
+    '주소': 'address',
+    '보증금': 'deposit',
+    '추천 대상 및 종합 의견': 'recommendation'
+}
+
+# 중첩 구조로 옮길 엑셀 열 (gemini_reanalyzer.py 구조에 맞게 조정, location_accessibility, building_quality 등)
+_NESTED_FIELDS = {
+    'location_accessibility': {
+        '광화문 접근성 (15점)': 'gwanghwamun_score',
+        '주변 편의시설 (15점)': 'amenities_score',
+        '교통 편의성 (10점)': 'transportation_score',
+        '위치/접근성 총점 (40점)': 'location_total'
+    },
+    'building_quality': {
+        '건물 상태 (15점)': 'condition_score',
+        '공간 효율성 (10점)': 'space_score',
+        '층수/향 (5점)': 'floor_score',
+        '건물/시설 총점 (30점)': 'building_total'
+    },
+    'living_convenience': {
+        '가전제품 (8점)': 'appliances_score',
+        '가구/시설 (7점)': 'furniture_score',
+        '생활 편의성  총점 (15점)': 'convenience_total'
+    },
+    'price_value': {
+        '시세 대비 가격 (10점)': 'market_score',
+        '관리비/추가비용 (5점)': 'extra_cost_score',
+        '가격 경쟁력 총점 (15 점)': 'price_total'
+    },
+    'credibility': {
+        '허위매물 가능성': 'fake_possibility',
+        '신뢰도 평가': 'credibility_comment'
+    }
+}
+_NESTED_FIELD_KEYS = {category: frozenset(field_map) for category, field_map in _NESTED_FIELDS.items()}
+
+# 관리비 정리용 (모듈 로드 시 한 번만 생성)
+_MAINTENANCE_UNKNOWN_KEYWORDS = ('확인 불가', '정보 없음', '미제공', '없음')
+_MAINTENANCE_NUMBER_RE = re.compile(r'\d+')
+
 def process_nested_structure(row_dict):
     """엑셀에서 읽은 플랫한 구조를 중첩 구조로 변환"""
     result = {}
@@ -40,51 +81,14 @@ def process_nested_structure(row_dict):
             result[key] = value
     
     # 특정 필드 매핑
-    field_mapping = {
-        '매물 ID': 'hidx',
-        '총점 (100점)': 'total_score',
-        '주소': 'address',
-        '보증금': 'deposit',
-        '추천 대상 및 종합 의견': 'recommendation'
-    }
-    
-    for old_key, new_key in field_mapping.items():
+    for old_key, new_key in _FIELD_MAPPING.items():
         if old_key in row_dict:
             result[new_key] = row_dict[old_key]
     
-    # 특정 중첩 구조 처리 (gemini_reanalyzer.py 구조에 맞게 조정)
-    # location_accessibility, building_quality 등 구조화
-    nested_fields = {
-        'location_accessibility': {
-            '광화문 접근성 (15점)': 'gwanghwamun_score',
-            '주변 편의시설 (15점)': 'amenities_score',
-            '교통 편의성 (10점)': 'transportation_score',
-            '위치/접근성 총점 (40점)': 'location_total'
-        },
-        'building_quality': {
-            '건물 상태 (15점)': 'condition_score',
-            '공간 효율성 (10점)': 'space_score',
-            '층수/향 (5점)': 'floor_score',
-            '건물/시설 총점 (30점)': 'building_total'
-        },
-        'living_convenience': {
-            '가전제품 (8점)': 'appliances_score',
-            '가구/시설 (7점)': 'furniture_score',
-            '생활 편의성  총점 (15점)': 'convenience_total'
-        },
-        'price_value': {
-            '시세 대비 가격 (10점)': 'market_score',
-            '관리비/추가비용 (5점)': 'extra_cost_score',
-            '가격 경쟁력 총점 (15 점)': 'price_total'
-        },
-        'credibility': {
-            '허위매물 가능성': 'fake_possibility',
-            '신뢰도 평가': 'credibility_comment'
-        }
-    }
-    
-    for category, field_map in nested_fields.items():
-        if any(field in row_dict for field in field_map):
+    # 특정 중첩 구조 처리
+    row_keys = row_dict.keys()
+    for category, field_map in _NESTED_FIELDS.items():
+        if _NESTED_FIELD_KEYS[category] & row_keys:
             result[category] = {}
             for excel_field, api_field in field_map.items():
                 if excel_field in row_dict and row_dict[excel_field] is not None:
@@ -98,16 +102,15 @@ def process_nested_structure(row_dict):
             maintenance_cost = row_dict['관리비']
             # 관리비 특별 처리: "확인 불가", "정보 없음" 등의 경우 별도 처리
             if isinstance(maintenance_cost, str):
-                if any(keyword in maintenance_cost for keyword in ['확인 불가', '정보 없음', '미제공', '없음']):
+                if any(keyword in maintenance_cost for keyword in _MAINTENANCE_UNKNOWN_KEYWORDS):
                     result['price']['maintenance_cost'] = "확인 불가"
                 elif maintenance_cost.strip() == '' or maintenance_cost.strip() == '0':
                     result['price']['maintenance_cost'] = "정보 없음"
                 else:
                     # 숫자 추출 시도
-                    import re
-                    numbers = re.findall(r'\d+', maintenance_cost)
-                    if numbers:
-                        result['price']['maintenance_cost'] = int(numbers[0]) * 10000  # 만원 단위를 원 단위로
+                    number_match = _MAINTENANCE_NUMBER_RE.search(maintenance_cost)
+                    if number_match:
+                        result['price']['maintenance_cost'] = int(number_match.group(0)) * 10000  # 만원 단위를 원 단위로
                     else:
                         result['price']['maintenance_cost'] = maintenance_cost
             elif isinstance(maintenance_cost, (int, float)):
@@ -128,27 +131,35 @@ def process_nested_structure(row_dict):
     
     return result
 
+def json_preview(data, max_chars):
+    """데이터를 JSON 문자열로 만들되 max_chars자까지만 직렬화합니다 (로그용, 전체 문자열을 만들지 않음)."""
+    parts = []
+    length = 0
+    for chunk in json.JSONEncoder(ensure_ascii=False).iterencode(data):
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= max_chars:
+            break
+    return ''.join(parts)[:max_chars]
+
 def load_properties_from_excel(excel_file):
     """엑셀 파일에서 매물 데이터 로드"""
+    import pandas as pd  # 엑셀 입출력 시에만 불러옴
     try:
-        df = pd.read_excel(excel_file)
+        df = pd.read_excel(excel_file, engine='openpyxl')
         logging.info(f"총 {len(df)} 개의 매물 데이터를 엑셀에서 로드했습니다.")
         
+        # 값 정리는 행마다 하지 않고 DataFrame 전체에 한 번에 적용
+        # 타임스탬프 열은 날짜 문자열로 변환
+        for column in df.select_dtypes(include=['datetime', 'datetimetz']).columns:
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+        # NaN/NaT 값은 빈 문자열로 변환 (JSON 직렬화를 위해)
+        df = df.astype(object).where(df.notna(), '')
+        
         # DataFrame을 JSON 형식의 리스트로 변환
         properties_data = []
         
-        for _, row in df.iterrows():
-            # NaN 값을 None으로 변환 (JSON 직렬화를 위해)
-            row_dict = row.where(~pd.isna(row), None).to_dict()
-            
-            # 숫자형 None을 빈 문자열로 변환 (필요한 경우)
-            row_dict = {k: ('' if v is None else v) for k, v in row_dict.items()}
-            
-            # 타임스탬프 처리
-            for key, value in row_dict.items():
-                if isinstance(value, (pd.Timestamp, pd.Period)):
-                    row_dict[key] = value.strftime('%Y-%m-%d')
-            
+        for row_number, row_dict in enumerate(df.to_dict('records'), start=1):
             # 중첩 구조 처리
             property_dict = process_nested_structure(row_dict)
             
@@ -159,8 +170,8 @@ def load_properties_from_excel(excel_file):
                 elif 'id' in property_dict:
                     property_dict['hidx'] = str(property_dict['id'])
                 else:
-                    logging.warning(f"행 {_+1}에 hidx 값이 없습니다. 인덱스를 hidx로 사용합니다.")
-                    property_dict['hidx'] = str(_ + 1)
+                    logging.warning(f"행 {row_number}에 hidx 값이 없습니다. 인덱스를 hidx로 사용합니다.")
+                    property_dict['hidx'] = str(row_number)
             
             # hidx가 문자열인지 확인
             if 'hidx' in property_dict and not isinstance(property_dict['hidx'], str):
@@ -175,22 +186,29 @@ def load_properties_from_excel(excel_file):
         return []
 
 def flatten_nested_dict(d, parent_key='', sep='_'):
-    """중첩된 딕셔너리를 플랫한 구조로 변환"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_nested_dict(v, new_key, sep=sep).items())
+    """중첩된 딕셔너리를 플랫한 구조로 변환 (재귀 호출 없이 반복자 스택으로 순회, 키 순서는 원래 순서 유지)"""
+    flat = {}
+    stack = [(parent_key, iter(d.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            new_key = f"{prefix}{sep}{k}" if prefix else k
+            if isinstance(v, dict):
+                # 하위 딕셔너리를 먼저 펼친 뒤 현재 딕셔너리의 남은 항목으로 돌아옴
+                stack.append((new_key, iter(v.items())))
+                break
+            flat[new_key] = v
         else:
-            items.append((new_key, v))
-    return dict(items)
+            stack.pop()
+    return flat
 
 def save_results_to_excel(reanalyzed_data, output_file):
     """재평가 결과를 엑셀 파일로 저장"""
+    import pandas as pd  # 엑셀 입출력 시에만 불러옴
     try:
         # 중첩 구조를 플랫하게 만들어 DataFrame으로 변환
         flattened_data = [flatten_nested_dict(item) for item in reanalyzed_data]
-        df = pd.DataFrame(flattened_data)
+        df = pd.DataFrame.from_records(flattened_data)
         
         # 결과 저장
         df.to_excel(output_file, index=False)
@@ -215,57 +233,46 @@ def calculate_weighted_average_scores(all_round_results):
     # hidx별로 결과 그룹화
     property_results = {}
     for round_idx, round_result in enumerate(all_round_results):
-        weight = (round_idx + 1) / len(all_round_results)  # 최신 라운드에 더 높은 가중치
-        
         for prop in round_result:
-            hidx = str(prop.get('hidx'))
-            if hidx not in property_results:
-                property_results[hidx] = {
-                    'scores': [],
-                    'weights': [],
-                    'properties': []
-                }
-            
-            property_results[hidx]['scores'].append(prop.get('total_score', 0))
-            property_results[hidx]['weights'].append(weight)
-            property_results[hidx]['properties'].append(prop)
+            data = property_results.setdefault(str(prop.get('hidx')), {'rounds': [], 'scores': [], 'properties': []})
+            data['rounds'].append(round_idx)
+            data['scores'].append(prop.get('total_score', 0))
+            data['properties'].append(prop)
     
-    # 가중 평균 계산
-    final_results = []
-    convergence_stats = {'converged': 0, 'total': 0, 'avg_variance': 0}
-    total_variance = 0
+    if not property_results:
+        return []
     
-    for hidx, data in property_results.items():
-        if not data['scores']:
-            continue
-            
-        # 가중 평균 점수 계산
-        weighted_score = np.average(data['scores'], weights=data['weights'])
-        
-        # 점수 분산 계산 (수렴도 측정)
-        variance = np.var(data['scores']) if len(data['scores']) > 1 else 0
-        total_variance += variance
-        
-        # 수렴 여부 판단
-        is_converged = variance <= CONVERGENCE_THRESHOLD
-        if is_converged:
-            convergence_stats['converged'] += 1
-        
-        convergence_stats['total'] += 1
-        
-        # 최신 속성 데이터 사용하되 점수는 가중 평균 적용
+    # 매물 x 라운드 점수 행렬(참여하지 않은 라운드는 NaN)로 가중 평균과 분산을 한 번에 계산
+    num_rounds = len(all_round_results)
+    round_weights = np.arange(1, num_rounds + 1) / num_rounds  # 최신 라운드에 더 높은 가중치
+    score_matrix = np.full((len(property_results), num_rounds), np.nan)
+    for row, data in enumerate(property_results.values()):
+        score_matrix[row, data['rounds']] = data['scores']
+    present = ~np.isnan(score_matrix)
+    
+    weighted_scores = np.nansum(score_matrix * round_weights, axis=1) / (present * round_weights).sum(axis=1)
+    variances = np.nanvar(score_matrix, axis=1)  # 점수 분산 (수렴도 측정, 한 라운드뿐이면 0)
+    converged_mask = variances <= CONVERGENCE_THRESHOLD
+    
+    # 최신 속성 데이터 사용하되 점수는 가중 평균 적용
+    final_results = []
+    for data, weighted_score, variance, is_converged in zip(
+            property_results.values(), weighted_scores.tolist(), variances.tolist(), converged_mask.tolist()):
         final_prop = data['properties'][-1].copy()
         final_prop['total_score'] = int(round(weighted_score))
         final_prop['score_variance'] = round(variance, 2)
         final_prop['score_rounds'] = data['scores']
         final_prop['is_converged'] = is_converged
         final_prop['reanalysis_comment'] = f"다중 라운드 재평가 완료 (라운드: {len(data['scores'])}, 분산: {variance:.2f})"
-        
         final_results.append(final_prop)
     
     # 수렴 통계 계산
-    convergence_stats['avg_variance'] = total_variance / max(convergence_stats['total'], 1)
-    convergence_stats['convergence_rate'] = convergence_stats['converged'] / max(convergence_stats['total'], 1) * 100
+    convergence_stats = {
+        'converged': int(converged_mask.sum()),
+        'total': len(final_results),
+        'avg_variance': float(variances.mean()),
+    }
+    convergence_stats['convergence_rate'] = convergence_stats['converged'] / convergence_stats['total'] * 100
     
     logging.info(f"점수 수렴 통계: {convergence_stats['converged']}/{convergence_stats['total']} 매물 수렴 "
                 f"(수렴률: {convergence_stats['convergence_rate']:.1f}%, 평균 분산: {convergence_stats['avg_variance']:.2f})")
@@ -297,7 +304,7 @@ def main():
     
     # 데이터 샘플 로깅 (디버깅용)
     if properties_data:
-        logging.info(f"첫 번째 매물 데이터 샘플: {json.dumps(properties_data[0], ensure_ascii=False)[:500]}...")
+        logging.info(f"첫 번째 매물 데이터 샘플: {json_preview(properties_data[0], 500)}...")
         
         # hidx가 있는지 확인
         hidx_count = sum(1 for prop in properties_data if 'hidx' in prop and prop['hidx'])
@@ -309,45 +316,48 @@ def main():
     for round_num in range(1, NUM_REANALYSIS_ROUNDS + 1):
         logging.info(f"\n=== 재평가 라운드 {round_num}/{NUM_REANALYSIS_ROUNDS} 시작 ===")
         
-        # 매물 순서 랜덤 셔플
-        current_properties = properties_data.copy()
-        random.shuffle(current_properties)
+        # 재평가가 매물 딕셔너리를 직접 갱신하므로 라운드 시작 전 점수를 저장해 두고 수렴 여부 비교에 사용
+        previous_scores = snapshot_scores(properties_data)
+        
+        # 매물 순서 랜덤 셔플 (셔플한 전체 복사본을 만들지 않고 인덱스 순열만 섞음)
+        total_properties = len(properties_data)
+        shuffled_indices = random.sample(range(total_properties), total_properties)
         logging.info(f"라운드 {round_num}: 매물 순서를 랜덤하게 셔플했습니다.")
         
-        # 배치 크기로 데이터 분할
-        total_properties = len(current_properties)
-        batches = [current_properties[i:i + REANALYSIS_BATCH_SIZE] 
-                   for i in range(0, total_properties, REANALYSIS_BATCH_SIZE)]
+        # 배치 크기로 데이터 분할 (배치는 재평가 함수가 꺼낼 때 하나씩 생성)
+        num_batches = math.ceil(total_properties / REANALYSIS_BATCH_SIZE)
+        batches = (
+            [properties_data[i] for i in shuffled_indices[start:start + REANALYSIS_BATCH_SIZE]]
+            for start in range(0, total_properties, REANALYSIS_BATCH_SIZE)
+        )
         
-        logging.info(f"라운드 {round_num}: 총 {total_properties}개 매물을 {len(batches)}개 배치로 처리합니다.")
+        logging.info(f"라운드 {round_num}: 총 {total_properties}개 매물을 {num_batches}개 배치로 처리합니다.")
         
-        # 각 배치 재평가 및 결과 수집
+        # 배치들을 스레드 풀에서 동시에 재평가 (호출 간격/할당량은 공유 속도 제한기가 맞춤)
+        # API 오류 등으로 원본을 그대로 돌려받은 매물이 수렴한 것으로 잡히지 않도록 새 점수를 받은 매물만 추적
+        reanalyzed_hidxs = set()
+        reanalyzed_batches = reanalyze_property_batches(batches, api_key, batch_label_prefix=f"{round_num}-",
+                                                        reanalyzed_hidxs=reanalyzed_hidxs)
+        
+        # 각 배치 결과 수집
         round_results = []
+        batch_converged = []
         
-        for i, batch in enumerate(batches):
-            batch_number = i + 1
-            logging.info(f"라운드 {round_num} - 배치 {batch_number}/{len(batches)} 처리 중 ({len(batch)}개 매물)")
-            
-            reanalyzed_batch = reanalyze_property_batch(
-                batch, 
-                api_key, 
-                batch_number=f"{round_num}-{batch_number}", 
-                total_batches=f"{round_num}-{len(batches)}"
-            )
-            
+        for batch_number, reanalyzed_batch in enumerate(reanalyzed_batches, 1):
             round_results.extend(reanalyzed_batch)
-            logging.info(f"라운드 {round_num} - 배치 {batch_number} 완료. 현재 라운드 {len(round_results)}개 매물 처리됨.")
-            
-            # 배치 간 지연
-            if i < len(batches) - 1:  # 마지막 배치가 아닌 경우
-                time.sleep(1)
+            result_meta = measure_convergence(previous_scores, reanalyzed_batch, reanalyzed_hidxs)
+            batch_converged.append(result_meta['converged'])
+            mean_delta = result_meta['mean_delta']
+            logging.info(f"라운드 {round_num} - 배치 {batch_number} 완료. 현재 라운드 {len(round_results)}개 매물 처리됨. "
+                         f"평균 점수 변화: {'N/A' if mean_delta is None else f'{mean_delta:.2f}'}")
         
         all_round_results.append(round_results)
         logging.info(f"라운드 {round_num} 완료. {len(round_results)}개 매물 처리됨.")
         
-        # 라운드 간 지연
-        if round_num < NUM_REANALYSIS_ROUNDS:
-            time.sleep(2)
+        # 모든 배치의 평균 점수 변화가 임계값 미만이면 남은 라운드 생략
+        if batch_converged and all(batch_converged):
+            logging.info(f"라운드 {round_num}: 모든 배치의 평균 점수 변화가 {CONVERGENCE_THRESHOLD} 미만으로 수렴하여 남은 라운드를 생략합니다.")
+            break
     
     # 가중 평균 점수 계산
     logging.info(f"\n=== 다중 라운드 결과 통합 중 ===")